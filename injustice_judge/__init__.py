@@ -1,4 +1,5 @@
 from typing import *
+from .classes2 import reset_hand_counts
 from .fetch import parse_game_link
 from .injustices import evaluate_game
 
@@ -9,6 +10,7 @@ from .injustices import evaluate_game
 async def analyze_game(link: str, specified_players: Set[int] = set(), look_for: Set[str] = {"injustice"}) -> List[str]:
     """Given a game link, fetch and parse the game into kyokus, then evaluate each kyoku"""
     # print(f"Analyzing game {link}:")
+    reset_hand_counts() # count the shanten calculations skipped for this game (see `hand_counts` in classes2.py)
     kyokus, game_metadata, players = await parse_game_link(link, specified_players)
 
     return [result for kyoku in kyokus for result in evaluate_game(kyoku, players, game_metadata.name, look_for)]
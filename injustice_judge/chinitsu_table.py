@@ -0,0 +1,107 @@
+import os
+import struct
+import zlib
+from typing import *
+
+from .constants import Shanten
+from .shanten_cache import encode_shanten, decode_shanten
+
+# This file implements the precomputed chinitsu table, which holds the
+#   results for every hand of 1/4/7/10/13 tiles in a single suit.
+#   Those are the slowest hands to calculate, since they have the most
+#   overlapping ways to break them down, but there are only 132,345 of them per suit.
+#
+# The table ships with the package as `chinitsu_table.bin`, built by
+#   `build_chinitsu_table` in shanten.py. `_calculate_shanten` and `get_tenpai_waits`
+#   look single-suit hands up here instead of calculating them.
+#
+# Every hand has a record, so records are found by the hand's index in the order
+#   of `get_single_suit_hands` (see `get_hand_index`) rather than by a key.
+#   Iishanten waits aren't always symmetric between suits (see `calculate_shanten`),
+#   so each suit gets its own records.
+#
+# File format (all little-endian), compressed with zlib:
+# - header: magic b"IJCT", format version (u32), number of records per suit (u32)
+# - records for suit 1, then suit 2, then suit 3, each:
+#   - shanten: round(shanten * 10000) (u16)
+#   - whether the shanten is an int rather than a float (u8), since chiitoitsu shanten are ints
+#   - waits (including any wait extensions of an iishanten hand), which can be outside the suit:
+#     same as in the persistent cache, bit (tile - 10) set for every tile in the waits (u64)
+#   - completing tiles, i.e. the waits of a (standard) tenpai hand (see `get_tenpai_waits`):
+#     bit n set for every tile numbered n that completes the hand (u16)
+
+HEADER = struct.Struct("<4sII")
+RECORD = struct.Struct("<HBQH")
+MAGIC = b"IJCT"
+FORMAT_VERSION = 1
+LENGTHS = (1, 4, 7, 10, 13)
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chinitsu_table.bin")
+
+# WAYS[i][n] is the number of ways to have n tiles numbered i to 9, at most 4 of each
+WAYS = [[0] * 15 for _ in range(11)]
+WAYS[10][0] = 1
+for i in range(9, 0, -1):
+    for n in range(15):
+        WAYS[i][n] = sum(WAYS[i+1][n-count] for count in range(min(4, n) + 1))
+# SKIPPED[i][n][count] is the number of hands that come before those with `count` of tile i,
+#   given n tiles numbered i to 9 (`get_single_suit_hands` goes from the highest count down)
+SKIPPED = [[[sum(WAYS[i+1][n-more] for more in range(count + 1, min(4, n) + 1)) for count in range(5)] for n in range(15)] for i in range(10)]
+LENGTH_OFFSETS = {length: sum(WAYS[1][shorter] for shorter in LENGTHS if shorter < length) for length in LENGTHS}
+NUM_RECORDS = sum(WAYS[1][length] for length in LENGTHS)
+
+def get_hand_index(hand: Tuple[int, ...]) -> int:
+    """Get the index of a single-suit hand among all hands of its suit, in the order of `get_single_suit_hands`"""
+    counts = [0] * 10
+    for tile in hand:
+        counts[tile % 10] += 1
+    remaining = len(hand)
+    index = LENGTH_OFFSETS[remaining]
+    for i in range(1, 10):
+        index += SKIPPED[i][remaining][counts[i]]
+        remaining -= counts[i]
+    return index
+
+def encode_record(shanten: Shanten, completing_tiles: Iterable[int]) -> bytes:
+    return RECORD.pack(*encode_shanten(shanten), sum(1 << (tile % 10) for tile in completing_tiles))
+
+def save_chinitsu_table(path: str, records: Iterable[bytes]) -> None:
+    """Write the table, given the encoded records for suits 1, 2, 3 in the order of `get_single_suit_hands`"""
+    data = b"".join(records)
+    assert len(data) == 3 * NUM_RECORDS * RECORD.size, f"expected {3 * NUM_RECORDS} records, got {len(data) // RECORD.size}"
+    with open(path, "wb") as file:
+        file.write(zlib.compress(HEADER.pack(MAGIC, FORMAT_VERSION, NUM_RECORDS) + data, 9))
+
+class ChinitsuTable:
+    """The precomputed results for every single-suit hand"""
+    def __init__(self, path: str = DEFAULT_PATH):
+        with open(path, "rb") as file:
+            self.data = zlib.decompress(file.read())
+        magic, version, num_records = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or num_records != NUM_RECORDS \
+           or len(self.data) != HEADER.size + 3 * NUM_RECORDS * RECORD.size:
+            raise ValueError(f"{path} is not a chinitsu table (format version {FORMAT_VERSION})")
+
+    def _record(self, hand: Tuple[int, ...]) -> Tuple[int, int, int, int]:
+        suit = hand[0] // 10
+        offset = HEADER.size + ((suit-1) * NUM_RECORDS + get_hand_index(hand)) * RECORD.size
+        return cast(Tuple[int, int, int, int], RECORD.unpack_from(self.data, offset))
+
+    def get(self, hand: Tuple[int, ...]) -> Shanten:
+        """Look up the shanten and waits of a normalized sorted single-suit hand"""
+        shanten, is_int, waits, _ = self._record(hand)
+        return decode_shanten(shanten, is_int, waits)
+
+    def get_completing_tiles(self, hand: Tuple[int, ...]) -> Set[int]:
+        """Look up every tile that completes a normalized sorted single-suit hand"""
+        *_, completing_tiles = self._record(hand)
+        suit = hand[0] // 10
+        return {10*suit + i for i in range(1, 10) if completing_tiles >> i & 1}
+
+def open_chinitsu_table(path: str = DEFAULT_PATH) -> Optional[ChinitsuTable]:
+    """Load the table at `path`, or return None (with a warning) if it's missing or unreadable"""
+    try:
+        return ChinitsuTable(path)
+    except (OSError, ValueError, zlib.error) as e:
+        import warnings
+        warnings.warn(f"not using the chinitsu table: {e}")
+        return None
@@ -3,9 +3,9 @@ from enum import IntEnum
 import functools
 from typing import *
 
-from .constants import PRED, SUCC, TOGGLE_RED_FIVE, YAOCHUUHAI
+from .constants import PRED, SUCC, SUCC2, TOGGLE_RED_FIVE, YAOCHUUHAI
 from .display import ph, pt, shanten_name
-from .utils import apply_delta_scores, get_waits, normalize_red_five, normalize_red_fives, sorted_hand, to_placement, try_remove_all_tiles
+from .utils import apply_delta_scores, get_waits, normalize_red_five, normalize_red_fives, remove_all_tiles, sorted_hand, to_placement, try_remove_all_tiles
 
 # This file and classes2.py contain most of the classes used in InjusticeJudge.
 # In this file, we have:
@@ -60,20 +60,44 @@ class CallInfo:
 add_group = lambda groups, group: tuple(sorted((*groups, tuple(sorted(group)))))
 
 # hand interpretations and yaku
-@dataclass
 class Interpretation:
     """A single interpretation of a single hand (decomposed into triplets, sequences, and pair)"""
+    # Interpretations are generated (and cached) by `generate_all_interpretations` below
+    #   and shared between everything that asks for them, so don't modify them.
+    __slots__ = ("hand", "ron_fu", "tsumo_fu", "sequences", "triplets", "pair", "calls")
     hand: Tuple[int, ...]                           # The non-decomposed part of the original hand
-    ron_fu: int = 20                                # ron fu using this interpretation of the hand (not rounded)
-    tsumo_fu: int = 22                              # tsumo fu using this interpretation of the hand (not rounded)
-    sequences: Tuple[Tuple[int, ...], ...] = ()     # Sequences taken from the original hand
-    triplets: Tuple[Tuple[int, ...], ...] = ()      # Triplets taken from the original hand
-    pair: Optional[Tuple[int, int]] = None          # A pair taken from the original hand
-    calls: Tuple[CallInfo, ...] = ()                # A frozen list of calls from the original hand
+    ron_fu: int                                     # ron fu using this interpretation of the hand (not rounded)
+    tsumo_fu: int                                   # tsumo fu using this interpretation of the hand (not rounded)
+    sequences: Tuple[Tuple[int, ...], ...]          # Sequences taken from the original hand
+    triplets: Tuple[Tuple[int, ...], ...]           # Triplets taken from the original hand
+    pair: Optional[Tuple[int, int]]                 # A pair taken from the original hand
+    calls: Tuple[CallInfo, ...]                     # A frozen list of calls from the original hand
+    def __init__(self,
+                 hand: Tuple[int, ...],
+                 ron_fu: int = 20,
+                 tsumo_fu: int = 22,
+                 sequences: Tuple[Tuple[int, ...], ...] = (),
+                 triplets: Tuple[Tuple[int, ...], ...] = (),
+                 pair: Optional[Tuple[int, int]] = None,
+                 calls: Tuple[CallInfo, ...] = ()):
+        self.hand = hand
+        self.ron_fu = ron_fu
+        self.tsumo_fu = tsumo_fu
+        self.sequences = sequences
+        self.triplets = triplets
+        self.pair = pair
+        self.calls = calls
     def unpack(self) -> Tuple[Any, ...]:
         return (self.hand, self.ron_fu, self.tsumo_fu, self.sequences, self.triplets, self.pair)
     def __hash__(self) -> int:
         return hash(self.unpack())
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Interpretation):
+            return NotImplemented
+        return (*self.unpack(), self.calls) == (*other.unpack(), other.calls)
+    def __repr__(self) -> str:
+        return f"Interpretation(hand={self.hand!r}, ron_fu={self.ron_fu!r}, tsumo_fu={self.tsumo_fu!r}, sequences={self.sequences!r}," \
+               f" triplets={self.triplets!r}, pair={self.pair!r}, calls={self.calls!r})"
     def __str__(self) -> str:
         full_hand = (*self.sequences, *self.triplets, self.pair, self.hand) if self.pair is not None else (*self.sequences, *self.triplets, self.hand)
         return " ".join(map(ph, full_hand)) + f" ron {self.ron_fu} tsumo {self.tsumo_fu}" + ("" if len(self.calls) == 0 else f" ({len(self.calls)} calls)")
@@ -81,151 +105,156 @@ class Interpretation:
         hand = tuple(normalize_red_fives(self.hand))
         return self.pair is not None and hand[0] == hand[1]
     def get_waits(self) -> Set[int]:
-        hand = tuple(normalize_red_fives(self.hand))
-        if len(hand) == 1: # tanki
-            return {hand[0]}
-        elif len(hand) == 2:
-            assert self.pair is not None
-            if hand[0] == hand[1]: # shanpon
-                return {hand[0]} # don't include pair as a wait
-            else: # ryanmen, kanchan, penchan
-                return get_waits(hand)
-        elif len(hand) == 13: # chiitoi or kokushi
-            ctr = Counter(hand)
-            if tuple(ctr.values()).count(2) == 6: # chiitoi
-                return {tile for tile, num in ctr.items() if num == 1}
-            elif set(hand).issubset(YAOCHUUHAI): # kokushi
-                kokushi_wait = YAOCHUUHAI - set(hand)
-                if len(kokushi_wait) == 1:
-                    return kokushi_wait
-                elif len(kokushi_wait) == 0: # 13-way wait
-                    return YAOCHUUHAI
-        return set()
-    def add_triplet(self, triplet: Tuple[int, int, int], call: bool = False, closed: bool = True, kan: bool = False) -> "Interpretation":
+        return get_interpretation_waits(self.hand, self.pair)
+
+def get_interpretation_waits(hand: Tuple[int, ...], pair: Optional[Tuple[int, int]]) -> Set[int]:
+    """Waits of the non-decomposed part `hand` of an interpretation (see `Interpretation.get_waits`)"""
+    hand = tuple(normalize_red_fives(hand))
+    if len(hand) == 1: # tanki
+        return {hand[0]}
+    elif len(hand) == 2:
+        assert pair is not None
+        if hand[0] == hand[1]: # shanpon
+            return {hand[0]} # don't include pair as a wait
+        else: # ryanmen, kanchan, penchan
+            return get_waits(hand)
+    elif len(hand) == 13: # chiitoi or kokushi
+        ctr = Counter(hand)
+        if tuple(ctr.values()).count(2) == 6: # chiitoi
+            return {tile for tile, num in ctr.items() if num == 1}
+        elif set(hand).issubset(YAOCHUUHAI): # kokushi
+            kokushi_wait = YAOCHUUHAI - set(hand)
+            if len(kokushi_wait) == 1:
+                return kokushi_wait
+            elif len(kokushi_wait) == 0: # 13-way wait
+                return YAOCHUUHAI
+    return set()
+
+# An interpretation while it's being generated: (hand, ron_fu, tsumo_fu, sequences, triplets, pair),
+#   which is the same as Interpretation.unpack() (so it hashes the same as the final Interpretation)
+InterpretationRecord = Tuple[Tuple[int, ...], int, int, Tuple[Tuple[int, ...], ...], Tuple[Tuple[int, ...], ...], Optional[Tuple[int, int]]]
+# (call type, call tiles), which is all of a call that matters for interpretations
+CallShape = Tuple[str, Tuple[int, ...]]
+
+def generate_all_interpretations(hand: Tuple[int, ...],
+                                 calls: Tuple[CallInfo, ...] = (),
+                                 yakuhai: Tuple[int, ...] = (),
+                                 is_closed_hand: bool = False) -> Tuple[Interpretation, ...]:
+    """
+    Remove all combinations of sequences, triplets, and pair from `hand` to arrive at
+    several Interpretations. Calculates fu obtained in the process, requiring you
+    pass in the yakuhai tiles. Doesn't take into account the fu obtained
+    by completing a triplet as a final wait (shanpon fu) -- that's taken
+    care of in `get_yaku_all` in yaku.py.
+    """
+    call_shapes = tuple((call.type, tuple(call.tiles)) for call in calls)
+    return tuple(Interpretation(*record, calls=calls) for record in _generate_all_interpretations(hand, call_shapes, yakuhai, is_closed_hand))
+
+@functools.lru_cache(maxsize=4096)
+def _generate_all_interpretations(hand: Tuple[int, ...],
+                                  call_shapes: Tuple[CallShape, ...],
+                                  yakuhai: Tuple[int, ...],
+                                  is_closed_hand: bool) -> Tuple[InterpretationRecord, ...]:
+    """
+    Cached helper for `generate_all_interpretations`, which works on InterpretationRecords.
+    Returns them in the order that a set of the resulting Interpretations iterates in.
+    """
+    def add_triplet(record: InterpretationRecord, triplet: Tuple[int, ...], call: bool = False, closed: bool = True, kan: bool = False) -> InterpretationRecord:
+        hand, ron_fu, tsumo_fu, sequences, triplets, pair = record
         triplet_fu = (4 if triplet[0] in YAOCHUUHAI else 2) * (2 if closed else 1) * (4 if kan else 1)
-        # print(f"add {triplet_fu} for closed triplet {ph(triplet)}, {ph(self.hand)}")
-        ret = Interpretation(self.hand if call else try_remove_all_tiles(self.hand, triplet),
-                             self.ron_fu + triplet_fu,
-                             self.tsumo_fu + triplet_fu,
-                             self.sequences,
-                             add_group(self.triplets, triplet),
-                             self.pair, calls=self.calls)
-        if not call and ret.hand == self.hand:
-            return self
-        return ret
-    def add_sequence(self, sequence: Tuple[int, int, int], call: bool = False) -> "Interpretation":
-        ret = Interpretation(self.hand if call else try_remove_all_tiles(self.hand, sequence),
-                             self.ron_fu,
-                             self.tsumo_fu,
-                             add_group(self.sequences, sequence),
-                             self.triplets,
-                             self.pair, calls=self.calls)
-        if not call and ret.hand == self.hand:
-            return self
-        return ret
-    def add_pair(self, pair: Tuple[int, int], yakuhai: Tuple[int, ...]) -> "Interpretation":
-        if self.pair is None:
-            yakuhai_fu = 2 * yakuhai.count(pair[0])
-            # print(f"add {yakuhai_fu} for yakuhai pair {ph(pair)}, {ph(self.hand)}")
-            ret = Interpretation(try_remove_all_tiles(self.hand, pair),
-                                 self.ron_fu + yakuhai_fu,
-                                 self.tsumo_fu + yakuhai_fu,
-                                 self.sequences, self.triplets,
-                                 pair, calls=self.calls)
-            if ret.hand == self.hand:
-                return self
-            return ret
-        return self
-    def add_wait_fu(self, yakuhai: Tuple[int, ...]) -> bool:
-        """return True if the final wait is valid"""
-        if len(self.hand) == 2 and self.pair is not None:
+        new_hand = hand if call else remove_all_tiles(hand, triplet)
+        if not call and new_hand == hand:
+            return record
+        return (new_hand, ron_fu + triplet_fu, tsumo_fu + triplet_fu, sequences, add_group(triplets, triplet), pair)
+    def add_sequence(record: InterpretationRecord, sequence: Tuple[int, ...], call: bool = False) -> InterpretationRecord:
+        hand, ron_fu, tsumo_fu, sequences, triplets, pair = record
+        new_hand = hand if call else remove_all_tiles(hand, sequence)
+        if not call and new_hand == hand:
+            return record
+        return (new_hand, ron_fu, tsumo_fu, add_group(sequences, sequence), triplets, pair)
+    def add_pair(record: InterpretationRecord, pair: Tuple[int, int]) -> InterpretationRecord:
+        hand, ron_fu, tsumo_fu, sequences, triplets, existing_pair = record
+        if existing_pair is not None:
+            return record
+        new_hand = remove_all_tiles(hand, pair)
+        if new_hand == hand:
+            return record
+        yakuhai_fu = 2 * yakuhai.count(pair[0])
+        return (new_hand, ron_fu + yakuhai_fu, tsumo_fu + yakuhai_fu, sequences, triplets, pair)
+    def add_wait_fu(record: InterpretationRecord) -> Optional[InterpretationRecord]:
+        """Add the fu for the final wait, or return None if the final wait is invalid"""
+        hand, ron_fu, tsumo_fu, sequences, triplets, pair = record
+        if len(hand) == 2 and pair is not None:
             # taatsu wait -- might be a single wait
-            is_shanpon = self.is_shanpon()
-            waits = self.get_waits()
+            normalized = tuple(normalize_red_fives(hand))
+            is_shanpon = normalized[0] == normalized[1]
+            waits = get_interpretation_waits(hand, pair)
             if is_shanpon or len(waits) > 0:
                 single_wait_fu = 2 if (len(waits) == 1 and not is_shanpon) else 0
-                self.ron_fu += single_wait_fu
-                self.tsumo_fu += single_wait_fu
-                # print(f"add {single_wait_fu} for single wait {ph(self.hand)}")
-                return True
-        elif len(self.hand) == 1:
+                return (hand, ron_fu + single_wait_fu, tsumo_fu + single_wait_fu, sequences, triplets, pair)
+        elif len(hand) == 1:
             # tanki wait -- is a single wait, and might be yakuhai
-            yakuhai_fu = 2 * yakuhai.count(self.hand[0])
-            self.ron_fu += yakuhai_fu + 2
-            self.tsumo_fu += yakuhai_fu + 2
-            # print(f"add 2 for single wait {pt(self.hand[0])}")
-            # print(f"add {yakuhai_fu} for yakuhai pair {pt(self.hand[0])}")
-            return True
-        return False
-    def generate_all_interpretations(self, yakuhai: Tuple[int, ...] = (), is_closed_hand: bool = False) -> Set["Interpretation"]:
-        """
-        From this Interpretation, remove all combinations of sequences,
-        triplets, and pair from self.hand to arrive at several
-        Interpretations. Calculates fu obtained in the process, requiring you
-        pass in the yakuhai tiles. Doesn't take into account the fu obtained
-        by completing a triplet as a final wait (shanpon fu) -- that's taken
-        care of in `get_yaku` in yaku.py.
+            yakuhai_fu = 2 * yakuhai.count(hand[0])
+            return (hand, ron_fu + yakuhai_fu + 2, tsumo_fu + yakuhai_fu + 2, sequences, triplets, pair)
+        return None
 
-        Note: calling this will reset self.ron_fu and self.tsumo_fu
-        """
+    base_record: InterpretationRecord = (hand, 20 + (10 if is_closed_hand else 0), 22, (), (), None)
+    base_interpretation = base_record
 
-        base_interpretation = self
-        self.ron_fu = 20 + (10 if is_closed_hand else 0)
-        self.tsumo_fu = 22
+    # the call info forces some sequences/triplets
+    for call_type, call_tiles in call_shapes:
+        if call_type == "chii":
+            base_interpretation = add_sequence(base_interpretation, call_tiles, call=True)
+        elif call_type == "pon":
+            base_interpretation = add_triplet(base_interpretation, call_tiles, call=True, closed=False)
+        elif "kan" in call_type:
+            base_interpretation = add_triplet(base_interpretation, call_tiles[:3], call=True, closed=(call_type == "ankan"), kan=True)
 
-        # the call info forces some sequences/triplets
-        for call in self.calls:
-            mktuple = lambda t: cast(Tuple[int, int, int], tuple(t))
-            if call.type == "chii":
-                base_interpretation = base_interpretation.add_sequence(mktuple(call.tiles), call=True)
-            elif call.type == "pon":
-                base_interpretation = base_interpretation.add_triplet(mktuple(call.tiles), call=True, closed=False)
-            elif "kan" in call.type: 
-                base_interpretation = base_interpretation.add_triplet(mktuple(call.tiles[:3]), call=True, closed=(call.type == "ankan"), kan=True)
+    # finally, iterate through all possible interpretations of the hand
+    interpretations: Set[InterpretationRecord] = set()
+    to_update: Set[InterpretationRecord] = {base_interpretation}
+    already_processed: Set[InterpretationRecord] = set()
 
-        # finally, iterate through all possible interpretations of the hand
-        interpretations: Set[Interpretation] = set()
-        to_update: Set[Interpretation] = {base_interpretation}
-        already_processed: Set[Interpretation] = set()
+    while len(to_update) > 0:
+        interpretation = to_update.pop()
+        # skip if we've already seen this one
+        if interpretation in already_processed:
+            continue
+        else:
+            already_processed.add(interpretation)
+        hand, _, _, sequences, triplets, _ = interpretation
+        # either output the interpretation, or recurse with smaller hands
+        if len(hand) <= 2:
+            final_interpretation = add_wait_fu(interpretation)
+            if final_interpretation is not None:
+                interpretations.add(final_interpretation)
+        else:
+            for tile in set(hand):
+                tile2 = normalize_red_five(tile) # non red version
+                nodes = [add_triplet(interpretation, (tile, tile2, tile2)),
+                         add_sequence(interpretation, (SUCC2[tile], SUCC[tile], tile)),
+                         add_pair(interpretation, (tile, tile2))]
+                to_update |= {n for n in nodes if n != interpretation}
 
-        while len(to_update) > 0:
-            interpretation = to_update.pop()
-            # skip if we've already seen this one
-            if interpretation in already_processed:
-                continue
-            else:
-                already_processed.add(interpretation)
-            # either output the interpretation, or recurse with smaller hands
-            if len(interpretation.hand) <= 2:
-                if interpretation.add_wait_fu(yakuhai):
-                    interpretations.add(interpretation)
-            else:
-                for tile in set(interpretation.hand):
-                    tile2 = normalize_red_five(tile) # non red version
-                    nodes = [interpretation.add_triplet((tile, tile2, tile2)),
-                             interpretation.add_sequence((SUCC[SUCC[tile]], SUCC[tile], tile)),
-                             interpretation.add_pair((tile, tile2), yakuhai=yakuhai)]
-                    to_update |= {n for n in nodes if n != interpretation}
+        # special case: aryanmen pinfu requires a single sequence remain unprocessed
+        if len(hand) == 1:
+            # check pinfu conditions
+            no_calls_except_kita = all(call_type == "kita" for call_type, _ in call_shapes)
+            all_sequences = len(sequences) == 4
+            no_yakuhai_pair = hand[0] not in yakuhai
+            if no_calls_except_kita and all_sequences and no_yakuhai_pair:
+                # interpret as aryanmen wait for pinfu
+                tanki = hand[0]
+                # look for sequences that form aryanmen with the tanki,
+                # where the ryanmen part is not penchan
+                for i, (t1,t2,t3) in enumerate(sequences):
+                    remaining_seqs = (*sequences[:i], *sequences[i+1:])
+                    if tanki == t1 and SUCC[t3] != 0:
+                        interpretations.add(((t2,t3), 30, 22, remaining_seqs, triplets, (tanki, tanki)))
+                    elif tanki == t3 and PRED[t1] != 0:
+                        interpretations.add(((t1,t2), 30, 22, remaining_seqs, triplets, (tanki, tanki)))
 
-            # special case: aryanmen pinfu requires a single sequence remain unprocessed
-            if len(interpretation.hand) == 1:
-                # check pinfu conditions
-                no_calls_except_kita = all(call.type == "kita" for call in self.calls)
-                all_sequences = len(interpretation.sequences) == 4
-                no_yakuhai_pair = interpretation.hand[0] not in yakuhai
-                if no_calls_except_kita and all_sequences and no_yakuhai_pair:
-                    # interpret as aryanmen wait for pinfu
-                    tanki = interpretation.hand[0]
-                    # look for sequences that form aryanmen with the tanki,
-                    # where the ryanmen part is not penchan
-                    for i, (t1,t2,t3) in enumerate(interpretation.sequences):
-                        remaining_seqs = (*interpretation.sequences[:i], *interpretation.sequences[i+1:])
-                        if tanki == t1 and SUCC[t3] != 0:
-                            interpretations.add(Interpretation((t2,t3), 30, 22, remaining_seqs, interpretation.triplets, (tanki, tanki), calls=self.calls))
-                        elif tanki == t3 and PRED[t1] != 0:
-                            interpretations.add(Interpretation((t1,t2), 30, 22, remaining_seqs, interpretation.triplets, (tanki, tanki), calls=self.calls))
-            
-        return interpretations if len(interpretations) > 0 else {self}
+    return tuple(interpretations) if len(interpretations) > 0 else (base_record,)
 
 @dataclass
 class GameRules:
@@ -1,13 +1,15 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, FrozenInstanceError
 from enum import IntEnum
 import functools
+import os
 from typing import *
+import weakref
 
 from .classes import CallInfo, Dir, GameRules, Interpretation
 from .constants import Event, Shanten, MANZU, PINZU, SOUZU, PRED, SUCC, DOUBLE_YAKUMAN, LIMIT_HANDS, PAO_YAKUMAN, TRANSLATE
 from .display import ph, pt, shanten_name
-from .utils import apply_delta_scores, calc_ko_oya_points, get_score, is_mangan, normalize_red_five, normalize_red_fives, sorted_hand, to_dora_indicator, try_remove_all_tiles
-from .shanten import calculate_shanten
+from .utils import apply_delta_scores, calc_ko_oya_points, get_score, is_mangan, normalize_red_five, normalize_red_fives, remove_all_tiles, sorted_hand, to_dora_indicator, to_tile_mask, TileCounts
+from .shanten import ShantenState, calculate_discard_shanten_numbers, calculate_shanten_incremental, calculate_shanten_number, get_shanten_state, update_shanten_state
 
 # These classes depend on shanten.py, which depends on classes.py, so we can't
 #   put these classes in classes.py.
@@ -20,69 +22,258 @@ from .shanten import calculate_shanten
 
 @functools.lru_cache(maxsize=2048)
 def _hidden_part(hand: Tuple[int], calls: Tuple[int]) -> Tuple[int, ...]:
-    """Cached helper for getting the hidden part of a hand, used below in __post_init__"""
-    ret = try_remove_all_tiles(hand, calls)
+    """Cached helper for getting the hidden part of a hand, used below in Hand.hidden_part"""
+    ret = remove_all_tiles(hand, calls)
     assert len(ret) + len(calls) == len(hand), f"with hand = {ph(hand)} and calls = {ph(calls)}, somehow hidden part is {ph(ret)}"
     return ret
 
 # main hand class
-@dataclass(frozen=True)
+_set = object.__setattr__
+
+# The same hand gets made many times, e.g. by postprocess_events and then again when
+#   flags.py replays the kyoku. So hands made by add/remove/add_call/kakan/kita are interned:
+#   if there's already a hand with the same tiles, calls, kita count and prev_shanten, that
+#   hand is returned instead (along with anything it has cached, like its shanten).
+#   Hands are only kept in the table as long as something else references them.
+# Set the environment variable `hand_interning=0` to turn this off.
+intern_hands: bool = os.getenv("hand_interning", "1") != "0"
+_interned_hands: "weakref.WeakValueDictionary[Tuple[Any, ...], Hand]" = weakref.WeakValueDictionary()
+
+def set_hand_interning(enabled: bool) -> None:
+    """Turn interning of hands (see `intern_hands`) on or off"""
+    global intern_hands
+    intern_hands = enabled
+    _interned_hands.clear()
+
+class HandCounts:
+    """
+    Counts the hands made that need a shanten calculation (1/4/7/10/13 tiles), and how many of
+    them actually calculated it, so we know how many calculations the lazy shanten skipped
+    """
+    __slots__ = ("hands", "shanten", "shanten_number")
+    def __init__(self) -> None:
+        self.hands = 0
+        self.shanten = 0         # hands that calculated shanten
+        self.shanten_number = 0  # hands that calculated shanten_number before (or without) shanten
+    @property
+    def skipped(self) -> int:
+        """Hands that never calculated shanten"""
+        return self.hands - self.shanten
+    def __str__(self) -> str:
+        return f"{self.hands} hands, shanten calculated for {self.shanten}, skipped for {self.skipped}," \
+               f" shanten number calculated for {self.shanten_number}"
+
+hand_counts = HandCounts()
+def reset_hand_counts() -> HandCounts:
+    """Start counting from zero (e.g. for a new game), returning the previous counts"""
+    global hand_counts
+    prev, hand_counts = hand_counts, HandCounts()
+    return prev
+
 class Hand:
     """Immutable object describing the state of a single hand"""
-    tiles: Tuple[int, ...]                                      # all tiles in the hand
-    calls: List[CallInfo] = field(default_factory=list)         # every call the hand has made, in order of appearance
-    ordered_calls: List[CallInfo] = field(default_factory=list) # every call the hand has made, in order of calling them
-    open_part: Tuple[int, ...] = ()                             # all tiles currently shown as a call
-    hidden_part: Tuple[int, ...] = ()                           # tiles - open_part
-    closed_part: Tuple[int, ...] = ()                           # hidden_part + any ankans
-    shanten: Shanten = (-1, ())                                 # shanten for the hand, or -1 if the hand is 14 tiles
-                                                                # (like when it's in the middle of a draw or call)
-    prev_shanten: Shanten = (-1, ())                            # shanten for the hand right before said draw or call
-    tiles_with_kans: Tuple[int, ...] = ()                       # all tiles in the hand including kans
-    best_discards: Tuple[int, ...] = ()                         # best discards for this hand (only for 14-tile hands)
-    kita_count: int = 0                                         # number of kita calls for this hand
-    
-    def __post_init__(self) -> None:
-        """You only need to provide `tiles` (and `calls`, if any), this calculates the rest"""
+    # Hands are made for every draw, discard and call, so they're kept small:
+    # - calls and ordered_calls are tuples, so add/remove share them with the original hand
+    #   instead of copying them
+    # - the parts derived from tiles and calls (open_part, hidden_part, closed_part, tiles_with_kans)
+    #   and shanten are calculated on first access, and hands with the same calls share their open_part
+    # - prev_shanten is also calculated on first access: until then the hand keeps a reference
+    #   to the hand it was made from (unless that hand's shanten was already known)
+    # - add/remove/add_call/kakan/kita return an existing equal hand if there is one (see `intern_hands`)
+    __slots__ = ("tiles", "calls", "ordered_calls", "kita_count",
+                 "shanten_state", "shanten_state_delta", "_prev_shanten", "_prev_hand",
+                 "_open_part", "_hidden_part", "_closed_part", "_tiles_with_kans",
+                 "_shanten", "_shanten_number", "_waits_mask", "__weakref__")
+    tiles: Tuple[int, ...]                              # all tiles in the hand
+    calls: Tuple[CallInfo, ...]                         # every call the hand has made, in order of appearance
+    ordered_calls: Tuple[CallInfo, ...]                 # every call the hand has made, in order of calling them
+    # open_part: Tuple[int, ...]                        # all tiles currently shown as a call (see the properties below)
+    # hidden_part: Tuple[int, ...]                      # tiles - open_part
+    # closed_part: Tuple[int, ...]                      # hidden_part + any ankans
+    # tiles_with_kans: Tuple[int, ...]                  # all tiles in the hand including kans
+    # shanten: Shanten                                  # shanten for the hand (see the `shanten` property below),
+                                                        # or prev_shanten if the hand is 14 tiles
+                                                        # (like when it's in the middle of a draw or call)
+    # prev_shanten: Shanten                             # shanten for the hand right before said draw or call
+    kita_count: int                                     # number of kita calls for this hand
+    shanten_state: Optional[ShantenState]               # per-suit decompositions of hidden_part, passed along
+                                                        # by add/remove so shanten can be calculated incrementally
+    shanten_state_delta: Tuple[Tuple[int, int], ...]    # pending (tile, +1 or -1) updates to shanten_state,
+                                                        # applied by get_shanten_state when it's needed
+    _prev_shanten: Optional[Shanten]                    # prev_shanten, or None if it's _prev_hand.shanten
+    _prev_hand: Optional["Hand"]                        # the hand we were made from, until prev_shanten is accessed
+    _open_part: Optional[Tuple[int, ...]]               # cached values of the properties below,
+    _hidden_part: Optional[Tuple[int, ...]]             # or None if they haven't been accessed yet
+    _closed_part: Optional[Tuple[int, ...]]
+    _tiles_with_kans: Optional[Tuple[int, ...]]
+    _shanten: Optional[Shanten]
+    _shanten_number: Optional[int]
+    _waits_mask: Optional[int]
+
+    def __init__(self,
+                 tiles: Iterable[int],
+                 calls: Iterable[CallInfo] = (),
+                 ordered_calls: Iterable[CallInfo] = (),
+                 prev_shanten: Shanten = (-1, ()),
+                 kita_count: int = 0,
+                 shanten_state: Optional[ShantenState] = None,
+                 shanten_state_delta: Tuple[Tuple[int, int], ...] = ()):
+        """You only need to provide `tiles` (and `calls`, if any), this calculates the rest on first access"""
         # sort the passed-in hand
-        super().__setattr__("tiles", sorted_hand(self.tiles))
-        # store all tiles visible on the table as calls (kans are stored as triplets)
-        super().__setattr__("open_part", tuple(tile for call in self.calls if call.type != "kita" for tile in call.tiles[:3]))
-        # store the hidden part (complement of open_part)
-        super().__setattr__("hidden_part", _hidden_part(self.tiles, self.open_part))
-        # store the passed-in hand, but don't represent kans as triplets
-        super().__setattr__("tiles_with_kans", (*self.hidden_part, *(tile for call in self.calls for tile in call.tiles)))
-        # store the closed part, which is the hidden part plus ankans
-        closed_part = self.hidden_part
-        for call in self.calls:
-            if call.type == "ankan":
-                closed_part = (*closed_part, call.tile, call.tile, call.tile)
-        super().__setattr__("closed_part", closed_part)
-        # if we just discarded, calculate shanten of the resulting hand
-        if len(self.tiles) in {1, 4, 7, 10, 13}:
-            super().__setattr__("shanten", calculate_shanten(self.hidden_part))
-        # if we just drew, set shanten to previous hand's shanten
-        elif len(self.tiles) in {2, 5, 8, 11, 14}: # this disables the below
-            super().__setattr__("shanten", self.prev_shanten)
-        # (disabled because expensive) calculate the best shanten obtainable from this 14-tile hand
-        elif len(self.tiles) in {2, 5, 8, 11, 14}:
-            best_shanten: Shanten = self.prev_shanten
-            best_discards: List[int] = []
-            for i, tile in enumerate(self.hidden_part):
-                if self.prev_shanten[0] < 2 and tile not in self.prev_shanten[1]:
-                    continue
-                hand = (*self.hidden_part[:i], *self.hidden_part[i+1:])
-                shanten = calculate_shanten(hand)
-                (s1, w1), (s2, w2) = shanten, best_shanten
-                if int(s1) < int(s2) or (int(s1) == int(s2) and len(w1) > len(w2)):
-                    best_shanten = shanten
-                    best_discards = []
-                if shanten == best_shanten:
-                    best_discards.append(tile)
-            super().__setattr__("shanten", best_shanten)
-            super().__setattr__("best_discards", sorted_hand(best_discards))
-        else:
-            assert False, f"passed a length {len(self.tiles)} hand to Hand"
+        self._init(sorted_hand(tiles), tuple(calls), tuple(ordered_calls), prev_shanten, None, kita_count, shanten_state, shanten_state_delta)
+
+    def _init(self,
+              tiles: Tuple[int, ...],
+              calls: Tuple[CallInfo, ...],
+              ordered_calls: Tuple[CallInfo, ...],
+              prev_shanten: Optional[Shanten],
+              prev_hand: Optional["Hand"],
+              kita_count: int,
+              shanten_state: Optional[ShantenState] = None,
+              shanten_state_delta: Tuple[Tuple[int, int], ...] = (),
+              open_part: Optional[Tuple[int, ...]] = None) -> None:
+        _set(self, "tiles", tiles)
+        _set(self, "calls", calls)
+        _set(self, "ordered_calls", ordered_calls)
+        _set(self, "_prev_shanten", prev_shanten)
+        _set(self, "_prev_hand", prev_hand)
+        _set(self, "kita_count", kita_count)
+        _set(self, "shanten_state", shanten_state)
+        _set(self, "shanten_state_delta", shanten_state_delta)
+        _set(self, "_open_part", open_part)
+        _set(self, "_hidden_part", None)
+        _set(self, "_closed_part", None)
+        _set(self, "_tiles_with_kans", None)
+        _set(self, "_shanten", None)
+        _set(self, "_shanten_number", None)
+        _set(self, "_waits_mask", None)
+        # if we just discarded, shanten of the resulting hand is calculated on first access
+        # if we just drew, shanten is the previous hand's shanten (also see `shanten` below)
+        assert len(tiles) in {1, 2, 4, 5, 7, 8, 10, 11, 13, 14}, f"passed a length {len(tiles)} hand to Hand"
+        if len(tiles) in {1, 4, 7, 10, 13}:
+            hand_counts.hands += 1
+
+    def _derive(self,
+                tiles: Tuple[int, ...],
+                calls: Tuple[CallInfo, ...],
+                ordered_calls: Tuple[CallInfo, ...],
+                prev_shanten: Optional[Shanten],
+                prev_hand: Optional["Hand"],
+                kita_count: int,
+                shanten_state: Optional[ShantenState] = None,
+                shanten_state_delta: Tuple[Tuple[int, int], ...] = ()) -> "Hand":
+        """
+        Make a new hand from already sorted `tiles`, sharing our open part if `calls` is unchanged.
+        Its prev_shanten is `prev_shanten`, or `prev_hand.shanten` (calculated on first access).
+        If there's already an interned hand with the same tiles, calls and prev_shanten, returns that instead
+        """
+        # don't keep a reference to the previous hand if we already know its shanten
+        if prev_hand is not None and prev_hand._shanten is not None:
+            prev_shanten, prev_hand = prev_hand._shanten, None
+        # (hands whose prev_shanten isn't known yet aren't interned, since that would calculate it)
+        key = (tiles, calls, ordered_calls, kita_count, prev_shanten) if intern_hands and prev_hand is None else None
+        if key is not None:
+            hand = _interned_hands.get(key)
+            if hand is not None:
+                # pass along our shanten state if it can use it
+                if hand._shanten is None and hand.shanten_state is None and shanten_state is not None:
+                    _set(hand, "shanten_state", shanten_state)
+                    _set(hand, "shanten_state_delta", shanten_state_delta)
+                return hand
+        hand = Hand.__new__(Hand)
+        hand._init(tiles, calls, ordered_calls, prev_shanten, prev_hand, kita_count, shanten_state, shanten_state_delta,
+                   self._open_part if calls is self.calls else None)
+        if key is not None:
+            _interned_hands[key] = hand
+        return hand
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise FrozenInstanceError(f"cannot assign to field {name!r}")
+    def __delattr__(self, name: str) -> None:
+        raise FrozenInstanceError(f"cannot delete field {name!r}")
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # cached values aren't pickled
+        return (Hand, (self.tiles, self.calls, self.ordered_calls, self.prev_shanten, self.kita_count))
+    def __eq__(self, other: object) -> bool:
+        # everything else is derived from these
+        if not isinstance(other, Hand):
+            return NotImplemented
+        return self is other or (self.tiles, self.calls, self.ordered_calls, self.prev_shanten, self.kita_count) \
+                             == (other.tiles, other.calls, other.ordered_calls, other.prev_shanten, other.kita_count)
+    def __repr__(self) -> str:
+        return f"Hand(tiles={self.tiles!r}, calls={self.calls!r}, ordered_calls={self.ordered_calls!r}, prev_shanten={self.prev_shanten!r}, kita_count={self.kita_count!r})"
+
+    @property
+    def prev_shanten(self) -> Shanten:
+        """Shanten for the hand right before said draw or call"""
+        if self._prev_shanten is None:
+            assert self._prev_hand is not None
+            _set(self, "_prev_shanten", self._prev_hand.shanten)
+            _set(self, "_prev_hand", None)
+        assert self._prev_shanten is not None
+        return self._prev_shanten
+    @property
+    def open_part(self) -> Tuple[int, ...]:
+        """All tiles visible on the table as calls (kans are stored as triplets)"""
+        if self._open_part is None:
+            _set(self, "_open_part", tuple(tile for call in self.calls if call.type != "kita" for tile in call.tiles[:3]))
+        assert self._open_part is not None
+        return self._open_part
+    @property
+    def hidden_part(self) -> Tuple[int, ...]:
+        """The hidden part (complement of open_part)"""
+        if self._hidden_part is None:
+            _set(self, "_hidden_part", _hidden_part(self.tiles, self.open_part) if len(self.calls) > 0 else self.tiles)
+        assert self._hidden_part is not None
+        return self._hidden_part
+    @property
+    def closed_part(self) -> Tuple[int, ...]:
+        """The closed part, which is the hidden part plus ankans"""
+        if self._closed_part is None:
+            closed_part = self.hidden_part
+            for call in self.calls:
+                if call.type == "ankan":
+                    closed_part = (*closed_part, call.tile, call.tile, call.tile)
+            _set(self, "_closed_part", closed_part)
+        assert self._closed_part is not None
+        return self._closed_part
+    @property
+    def tiles_with_kans(self) -> Tuple[int, ...]:
+        """The passed-in hand, but kans aren't represented as triplets"""
+        if self._tiles_with_kans is None:
+            _set(self, "_tiles_with_kans", (*self.hidden_part, *(tile for call in self.calls for tile in call.tiles)))
+        assert self._tiles_with_kans is not None
+        return self._tiles_with_kans
+
+    @property
+    def shanten(self) -> Shanten:
+        """Shanten and waits for the hand, calculated on first access"""
+        if self._shanten is None:
+            if len(self.tiles) in {1, 4, 7, 10, 13}:
+                hand_counts.shanten += 1
+                _set(self, "_shanten", calculate_shanten_incremental(self.hidden_part, self.get_shanten_state()))
+            else:
+                _set(self, "_shanten", self.prev_shanten)
+        assert self._shanten is not None
+        return self._shanten
+    @property
+    def waits_mask(self) -> int:
+        """The waits in self.shanten[1] as a tile mask (see `to_tile_mask`)"""
+        if self._waits_mask is None:
+            _set(self, "_waits_mask", to_tile_mask(self.shanten[1]))
+        assert self._waits_mask is not None
+        return self._waits_mask
+    @property
+    def shanten_number(self) -> int:
+        """Same as int(self.shanten[0]), but doesn't calculate the iishanten type or waits unless we already have them"""
+        if self._shanten_number is None:
+            if self._shanten is None and len(self.tiles) in {1, 4, 7, 10, 13}:
+                hand_counts.shanten_number += 1
+                _set(self, "_shanten_number", calculate_shanten_number(self.hidden_part))
+            else:
+                _set(self, "_shanten_number", int(self.shanten[0]))
+        assert self._shanten_number is not None
+        return self._shanten_number
 
     def to_str(self, doras: List[int] = [], uras: List[int] = []) -> str:
         to_str = lambda call: call.to_str(doras, uras)
@@ -93,31 +284,51 @@ class Hand:
     def __hash__(self) -> int:
         return hash((self.open_part, self.closed_part))
 
+    def get_shanten_state(self) -> ShantenState:
+        """Get the per-suit decompositions of the hidden part (see `update_shanten_state`)"""
+        if self.shanten_state is None:
+            _set(self, "shanten_state", get_shanten_state(normalize_red_fives(self.hidden_part)))
+            _set(self, "shanten_state_delta", ())
+        elif len(self.shanten_state_delta) > 0:
+            shanten_state = self.shanten_state
+            for tile, delta in self.shanten_state_delta:
+                shanten_state = update_shanten_state(shanten_state, tile, delta)
+            _set(self, "shanten_state", shanten_state)
+            _set(self, "shanten_state_delta", ())
+        assert self.shanten_state is not None
+        return self.shanten_state
+
+    def next_shanten_state_delta(self, tile: int, delta: int) -> Tuple[Tuple[int, int], ...]:
+        """Pending updates to pass to the hand resulting from adding `delta` copies of `tile`"""
+        return () if self.shanten_state is None else (*self.shanten_state_delta, (tile, delta))
+
     def add(self, tile: int) -> "Hand":
         """Immutable update for drawing a tile"""
-        return Hand((*self.tiles, tile), [*self.calls], [*self.ordered_calls], prev_shanten=self.shanten, kita_count=self.kita_count)
+        return self._derive(sorted_hand((*self.tiles, tile)), self.calls, self.ordered_calls, None, self, self.kita_count,
+                            self.shanten_state, self.next_shanten_state_delta(tile, 1))
     def add_call(self, call: CallInfo) -> "Hand":
         """Immutable update for calling a tile"""
-        return Hand(self.tiles, [*self.calls, call], [*self.ordered_calls, call], prev_shanten=self.shanten, kita_count=self.kita_count)
+        return self._derive(self.tiles, (*self.calls, call), (*self.ordered_calls, call), None, self, self.kita_count)
     def remove(self, tile: int) -> "Hand":
         """Immutable update for discarding a tile"""
+        # removing a tile keeps the hand sorted
         i = self.tiles.index(tile)
-        return Hand((*self.tiles[:i], *self.tiles[i+1:]), [*self.calls], [*self.ordered_calls], prev_shanten=self.shanten, kita_count=self.kita_count)
+        return self._derive((*self.tiles[:i], *self.tiles[i+1:]), self.calls, self.ordered_calls, None, self, self.kita_count,
+                            self.shanten_state, self.next_shanten_state_delta(tile, -1))
     def kakan(self, called_tile: int) -> Tuple[int, "Hand"]:
         """Immutable update for adding a tile to an existing pon call (kakan)"""
         # find the index of the existing pon
         pon_index = next((i for i, calls in enumerate(self.calls) if calls.type == "pon" and normalize_red_five(calls.tile) == normalize_red_five(called_tile)), None)
         assert pon_index is not None, f"unable to find previous pon of {called_tile} in calls: {self.calls}"
-        # clone the calls array, replacing the existing pon with a kakan call
-        calls_copy = [*self.calls]
+        # replace the existing pon with a kakan call
         pon_call = self.calls[pon_index]
-        calls_copy[pon_index] = CallInfo("kakan", pon_call.tile, pon_call.dir, (*pon_call.tiles, called_tile))
-        return pon_index, Hand(self.tiles, calls_copy, [*self.ordered_calls, calls_copy[pon_index]], prev_shanten=self.shanten, kita_count=self.kita_count)
+        kakan_call = CallInfo("kakan", pon_call.tile, pon_call.dir, (*pon_call.tiles, called_tile))
+        calls = (*self.calls[:pon_index], kakan_call, *self.calls[pon_index+1:])
+        return pon_index, self._derive(self.tiles, calls, (*self.ordered_calls, kakan_call), None, self, self.kita_count)
     def kita(self) -> "Hand":
         """Immutable update for adding kita"""
-        calls_copy = [*self.calls]
-        calls_copy.append(CallInfo("kita", 44, Dir.SELF, (44,)))
-        return Hand(self.tiles, calls_copy, [*self.ordered_calls, calls_copy[-1]], prev_shanten=self.prev_shanten, kita_count=self.kita_count+1)
+        kita_call = CallInfo("kita", 44, Dir.SELF, (44,))
+        return self._derive(self.tiles, (*self.calls, kita_call), (*self.ordered_calls, kita_call), self._prev_shanten, self._prev_hand, self.kita_count+1)
     def print_hand_details(self,
                            ukeire: int,
                            final_tile: Optional[int] = None,
@@ -133,15 +344,18 @@ class Hand:
         elif self.shanten[0] > 0:
             wait_string = f" ({shanten_name(self.shanten)})"
         return f"{self.to_str(doras, uras)}{win_string}{wait_string}"
-    def ukeire(self, visible: Iterable[int]) -> int:
+    def ukeire(self, visible: Union[Iterable[int], TileCounts]) -> int:
         """
-        Pass in all the visible tiles on board (not including hand).
+        Pass in all the visible tiles on board (not including hand), or their `TileCounts`.
         Return the ukeire of the hand, or 0 if the hand is not tenpai or iishanten.
         """
         shanten, waits = self.shanten
         if shanten >= 2:
             return 0
         wait_tiles = set(normalize_red_fives(waits))
+        if isinstance(visible, TileCounts):
+            hidden = list(normalize_red_fives(self.hidden_part))
+            return 4 * len(wait_tiles) - sum(visible.count(wait) + hidden.count(wait) for wait in wait_tiles)
         visible = list(normalize_red_fives(list(self.hidden_part) + list(visible)))
         return 4 * len(wait_tiles) - sum(visible.count(wait) for wait in wait_tiles)
     def get_majority_suit(self) -> Optional[Set[int]]:
@@ -165,7 +379,8 @@ class Hand:
             return {}
         if self.prev_shanten[0] >= 2:
             return {}
-        return {tile: hand for tile in self.hidden_part for hand in (self.remove(tile),) if hand.shanten[0] == 0}
+        shanten_numbers = calculate_discard_shanten_numbers(self.hidden_part)
+        return {tile: self.remove(tile) for tile in self.hidden_part if shanten_numbers[normalize_red_five(tile)] == 0}
     def possible_chiis(self, tile: int) -> Iterable[CallInfo]:
         # get all possible chii calls you can make with this hand
         chiis = ((PRED[PRED[tile]], PRED[tile]), (PRED[tile], SUCC[tile]), (SUCC[tile], SUCC[SUCC[tile]]))
@@ -385,6 +600,13 @@ class Draw:
     score_delta: List[int] # list of score differences for this round
     name: str              # name of the draw, e.g. "ryuukyoku"
 
+def get_undiscarded_part(call: CallInfo) -> List[int]:
+    """Get the part of the call that isn't already counted as part of the pond"""
+    ret = list(call.tiles)
+    if call.type not in {"ankan", "kita"}:
+        ret.remove(call.tile)
+    return ret
+
 @dataclass
 class Kyoku:
     """
@@ -439,6 +661,8 @@ class Kyoku:
     furiten: List[bool]                           = field(default_factory=list)
     # `num_dora_indicators_visible` keeps track of how many dora indicators are visible
     num_dora_indicators_visible: int              = 1
+    # `visible_counts` keeps track of how many of each tile are visible (the same tiles as `get_visible_tiles`)
+    visible_counts: TileCounts                    = field(default_factory=TileCounts)
     # `tiles_in_wall` keeps track of how tiles are left in the wall
     tiles_in_wall: int                            = 0
 
@@ -447,13 +671,7 @@ class Kyoku:
     def get_visible_tiles(self) -> List[int]:
         """Get all the currently visible tiles, used for ukeire calculations"""
         pond_tiles = [tile for seat in range(self.num_players) for tile in self.pond[seat]]
-        dora_indicators = [to_dora_indicator(dora, self.num_players) for dora in self.doras if dora not in {51,52,53}][:self.num_dora_indicators_visible]
-        def get_undiscarded_part(call):
-            # get the part of the call that isn't already counted as part of the pond
-            ret = list(call.tiles)
-            if call.type not in {"ankan", "kita"}:
-                ret.remove(call.tile)
-            return ret
+        dora_indicators = self.get_visible_dora_indicators()
         visible_calls = [tile for hand in self.hands for call in hand.calls for tile in get_undiscarded_part(call)]
         # visible tiles = all of the above combined
         visible_tiles = pond_tiles + dora_indicators + visible_calls
@@ -462,8 +680,51 @@ class Kyoku:
         if self.result and self.result[0] != "tsumo":
             visible_tiles.remove(self.final_discard)
         return visible_tiles
+    def get_visible_dora_indicators(self) -> List[int]:
+        return [to_dora_indicator(dora, self.num_players) for dora in self.doras if dora not in {51,52,53}][:self.num_dora_indicators_visible]
+    def flip_dora_indicator(self) -> None:
+        """Reveal the next dora indicator"""
+        self.num_dora_indicators_visible += 1
+        dora_indicators = self.get_visible_dora_indicators()
+        if len(dora_indicators) == self.num_dora_indicators_visible:
+            self.visible_counts.add(dora_indicators[-1])
     def get_ukeire(self, seat) -> int:
-        return self.hands[seat].ukeire(self.get_visible_tiles())
+        return self.hands[seat].ukeire(self.visible_counts)
     def get_starting_doras(self) -> List[int]:
         return self.doras[:(3 if self.rules.use_red_fives else 0) + self.rules.starting_doras]
 
+
+def benchmark_hand(num_draws: int = 20000, seed: int = 0) -> Tuple[float, float]:
+    """
+    Time `num_draws` draw/discard pairs on an open hand, and measure the memory used
+    per Hand by keeping every resulting hand. The draws are replayed once beforehand
+    so that any shanten calculated along the way is cached, and only the cost of
+    making the Hands is measured.
+    Returns (draw/discard pairs per second, bytes per Hand)
+    """
+    import random, time, tracemalloc
+    rng = random.Random(seed)
+    tiles = [*range(11,20), *range(21,30), *range(31,40), *range(41,48)]
+    draws = [rng.choice(tiles) for _ in range(num_draws)]
+    chii = CallInfo("chii", 13, Dir.KAMICHA, (11, 12, 13))
+    pon = CallInfo("pon", 47, Dir.TOIMEN, (47, 47, 47))
+    start = Hand((11, 12, 13, 22, 23, 24, 35, 36, 47, 47, 47, 41, 41), [chii, pon], [chii, pon])
+    def replay(hands: Optional[List[Hand]] = None) -> None:
+        hand = start
+        for tile in draws:
+            hand = hand.add(tile)
+            hand = hand.remove(hand.hidden_part[0])
+            if hands is not None:
+                hands.append(hand)
+    replay()
+    now = time.perf_counter()
+    replay()
+    elapsed = time.perf_counter() - now
+    hands: List[Hand] = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    replay(hands)
+    per_hand = (tracemalloc.get_traced_memory()[0] - before) / len(hands)
+    tracemalloc.stop()
+    print(f"{num_draws / elapsed:.0f} draw/discards per second, {per_hand:.0f} bytes per Hand")
+    return num_draws / elapsed, per_hand
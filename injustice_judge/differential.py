@@ -0,0 +1,254 @@
+from typing import *
+
+from .classes import GameRules
+from .classes2 import Hand, Kyoku, Score
+from .constants import Shanten
+from .display import ph
+from . import shanten
+from .utils import normalize_red_fives
+from .yaku import get_yaku_all
+
+# This file implements a differential test harness, to check that a faster
+#   implementation of something gives exactly the same results as the current one.
+#
+# It covers:
+# - shanten (`check_shanten`): the shanten including the iishanten type code,
+#   whether it's an int (chiitoitsu/kokushi) or a float, and the waits
+# - yaku (`check_yaku`): the best Score (han, fu, yaku) for every wait of a tenpai hand
+#
+# The hands checked are every hand in the given games (default: the example logs
+#   plus any tenhou games in cached_games/), every hand one draw and one discard away
+#   from those, and randomly generated hands. The work is split into chunks and checked
+#   by a process pool, and checking stops at the first mismatch, which gets reported.
+#
+# An engine is any picklable callable (i.e. a module-level function) with the same
+#   signature as the reference: `calculate_shanten(hand)` or `get_yaku(hand, ...)`.
+#   Yaku engines can return their Scores under any keys, as long as both engines use the same keys.
+#   The default shanten engines compare the "table" and "reference" shanten engines,
+#   and the default yaku engines compare get_yaku_all called separately for ron and tsumo
+#   with get_yaku_all getting both at once.
+#
+# Example:
+#   from injustice_judge.differential import check_shanten, check_yaku
+#   check_shanten(num_random_hands=1000000)
+#   check_yaku(alternative=my_get_yaku, reference=get_yaku)
+
+DEFAULT_GAMES = ("example_tenhou_game.json", "example_arml_game.json", "cached_games/game-*.json")
+CHUNK_SIZE = 500
+
+# a yaku case is a tenpai hand plus the arguments to get_yaku for it
+YakuCase = Tuple[Hand, Dict[str, Any]]
+# (case, reference result, alternative result)
+Mismatch = Tuple[Any, Any, Any]
+
+###
+### engines
+###
+
+# the persistent cache, shared cache, and chinitsu table that the table engine uses
+#   (the reference engine calculates everything itself, so it uses none of them)
+TABLE_ENGINE_RESULTS = shanten.get_precomputed_results()
+
+def use_shanten_engine(engine: str) -> None:
+    """Switch to the given shanten engine, along with the precomputed results it should use"""
+    if shanten.shanten_engine != engine:
+        shanten.set_precomputed_results(TABLE_ENGINE_RESULTS if engine == "table" else shanten.NO_PRECOMPUTED_RESULTS)
+        shanten.set_shanten_engine(engine)
+
+def reference_shanten(hand: Tuple[int, ...]) -> Shanten:
+    """calculate_shanten using the reference (elimination) engine, with no precomputed or cached results"""
+    use_shanten_engine("reference")
+    return shanten.calculate_shanten(hand)
+
+def table_shanten(hand: Tuple[int, ...]) -> Shanten:
+    """calculate_shanten using the table engine"""
+    use_shanten_engine("table")
+    return shanten.calculate_shanten(hand)
+
+def separate_yaku(hand: Hand, **kwargs: Any) -> Dict[Tuple[int, bool], Score]:
+    """get_yaku_all called once for only ron and once for only tsumo, as {(wait, is_tsumo): Score}"""
+    ron_scores, _ = get_yaku_all(hand, **kwargs, check_tsumos=False)
+    _, tsumo_scores = get_yaku_all(hand, **kwargs, check_rons=False)
+    return {**{(wait, False): score for wait, score in ron_scores.items()},
+            **{(wait, True): score for wait, score in tsumo_scores.items()}}
+
+def single_pass_yaku(hand: Hand, **kwargs: Any) -> Dict[Tuple[int, bool], Score]:
+    """get_yaku_all with both halves at once, as {(wait, is_tsumo): Score}"""
+    ron_scores, tsumo_scores = get_yaku_all(hand, **kwargs)
+    return {**{(wait, False): score for wait, score in ron_scores.items()},
+            **{(wait, True): score for wait, score in tsumo_scores.items()}}
+
+def shanten_key(result: Shanten) -> Tuple[Any, ...]:
+    """What has to match between two shanten results (1 and 1.0 are different, see `_calculate_shanten`)"""
+    return result[0], type(result[0]), tuple(result[1])
+
+def score_key(score: Score) -> Tuple[Any, ...]:
+    """What has to match between two Scores"""
+    return score.han, score.fu, score.tsumo, tuple(sorted(score.yaku))
+
+###
+### collecting hands
+###
+
+def load_games(patterns: Iterable[str] = DEFAULT_GAMES) -> List[List[Kyoku]]:
+    """Parse every tenhou log matching `patterns` (tenhou json, optionally with // comments)"""
+    import glob, json, re
+    from .fetch.tenhou import parse_tenhou
+    games = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            with open(path, "r") as file:
+                game_data = json.loads(re.sub(r"//[^\n]*", "", file.read()))
+            if "log" not in game_data:
+                continue
+            log = game_data.pop("log")
+            kyokus, _, _ = parse_tenhou(log, game_data, None)
+            games.append(kyokus)
+    return games
+
+def get_game_hands(games: List[List[Kyoku]]) -> Set[Tuple[int, ...]]:
+    """Every closed hand that appears in the games, plus every hand one draw and one discard away from those"""
+    seen: Set[Tuple[int, ...]] = set()
+    for kyokus in games:
+        for kyoku in kyokus:
+            hands = [*kyoku.haipai, *kyoku.hands, *(e[4] for e in kyoku.events if e[1] == "shanten_change")]
+            for hand in hands:
+                if len(hand.hidden_part) in {1, 4, 7, 10, 13}:
+                    seen.add(tuple(sorted(normalize_red_fives(hand.hidden_part))))
+    reachable = set(seen)
+    for hand in seen:
+        for draw in (*range(11,20), *range(21,30), *range(31,40), *range(41,48)):
+            if hand.count(draw) == 4:
+                continue
+            for discard in set(hand):
+                new_hand = list(hand)
+                new_hand.remove(discard)
+                new_hand.append(draw)
+                reachable.add(tuple(sorted(new_hand)))
+    return reachable
+
+def get_game_yaku_cases(games: List[List[Kyoku]]) -> List[YakuCase]:
+    """Every tenpai hand in the games, with the arguments get_yaku was (or would be) called with"""
+    cases: List[YakuCase] = []
+    for kyokus in games:
+        for kyoku in kyokus:
+            for i, (seat, event_type, *event_data) in enumerate(kyoku.events):
+                if event_type == "shanten_change" and event_data[1][0] == 0:
+                    cases.append((event_data[2], {"events": kyoku.events[:i+1], "doras": kyoku.doras,
+                                                  "uras": kyoku.uras, "round": kyoku.round, "seat": seat,
+                                                  "is_last_tile": False, "num_players": kyoku.num_players,
+                                                  "rules": kyoku.rules}))
+    return cases
+
+def generate_random_yaku_cases(num_cases: int, seed: int = 0) -> List[YakuCase]:
+    """Random closed tenpai hands (a complete hand minus one tile), with almost no other game state"""
+    import random
+    rng = random.Random(seed)
+    tiles = (*range(11,20), *range(21,30), *range(31,40), *range(41,48))
+    sequence_starts = [tile for tile in tiles if tile < 40 and tile % 10 <= 7]
+    rules = GameRules()
+    cases: List[YakuCase] = []
+    while len(cases) < num_cases:
+        hand = list(2 * (rng.choice(tiles),))
+        for _ in range(4):
+            if rng.random() < 0.6:
+                start = rng.choice(sequence_starts)
+                hand.extend((start, start+1, start+2))
+            else:
+                hand.extend(3 * (rng.choice(tiles),))
+        if any(hand.count(tile) > 4 for tile in hand):
+            continue
+        removed = rng.choice(hand)
+        hand.remove(removed)
+        # pretend we've discarded once, so we don't get tenhou/chiihou on every hand
+        seat = rng.randrange(4)
+        cases.append((Hand(tuple(hand)), {"events": [(seat, "discard", removed)], "doras": [], "uras": [],
+                                          "round": rng.randrange(8), "seat": seat, "is_last_tile": False,
+                                          "num_players": 4, "rules": rules}))
+    return cases
+
+###
+### checking
+###
+
+def _check_shanten_chunk(args: Tuple[Callable, Callable, List[Tuple[int, ...]]]) -> Tuple[int, Optional[Mismatch]]:
+    reference, alternative, hands = args
+    # run each engine over the whole chunk, since switching engines clears their caches
+    expected = [reference(hand) for hand in hands]
+    actual = [alternative(hand) for hand in hands]
+    for hand, e, a in zip(hands, expected, actual):
+        if shanten_key(e) != shanten_key(a):
+            return len(hands), (hand, e, a)
+    return len(hands), None
+
+def _check_yaku_chunk(args: Tuple[Callable, Callable, List[YakuCase]]) -> Tuple[int, Optional[Mismatch]]:
+    reference, alternative, cases = args
+    for case in cases:
+        hand, kwargs = case
+        expected = {wait: score_key(score) for wait, score in reference(hand, **kwargs).items()}
+        actual = {wait: score_key(score) for wait, score in alternative(hand, **kwargs).items()}
+        if expected != actual:
+            return len(cases), (case, expected, actual)
+    return len(cases), None
+
+def _run_chunks(check_chunk: Callable, reference: Callable, alternative: Callable,
+                items: Sequence[Any], processes: Optional[int]) -> Tuple[int, Optional[Mismatch]]:
+    """Check `items` in chunks in parallel, returning the number checked and the first mismatch (if any)"""
+    chunks = [(reference, alternative, list(items[i:i+CHUNK_SIZE])) for i in range(0, len(items), CHUNK_SIZE)]
+    checked = 0
+    if processes == 1:
+        results: Iterable[Tuple[int, Optional[Mismatch]]] = map(check_chunk, chunks)
+        for num_checked, mismatch in results:
+            checked += num_checked
+            if mismatch is not None:
+                return checked, mismatch
+        return checked, None
+    import multiprocessing
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        for num_checked, mismatch in pool.imap(check_chunk, chunks):
+            checked += num_checked
+            if mismatch is not None:
+                pool.terminate()
+                return checked, mismatch
+    return checked, None
+
+def check_shanten(alternative: Callable[[Tuple[int, ...]], Shanten] = table_shanten,
+                  reference: Callable[[Tuple[int, ...]], Shanten] = reference_shanten,
+                  games: Iterable[str] = DEFAULT_GAMES,
+                  num_random_hands: int = 100000,
+                  seed: int = 0,
+                  processes: Optional[int] = None) -> Optional[Mismatch]:
+    """
+    Compare the shanten/waits given by `alternative` with `reference` on every hand
+    reachable in `games` plus `num_random_hands` random hands, in parallel (one process
+    per CPU unless `processes` is given). Returns the first mismatch as (hand, expected, actual)
+    """
+    hands = sorted(get_game_hands(load_games(games)))
+    hands += shanten.generate_random_hands(num_random_hands, seed)
+    checked, mismatch = _run_chunks(_check_shanten_chunk, reference, alternative, hands, processes)
+    if mismatch is None:
+        print(f"shanten: all {checked} hands match")
+    else:
+        hand, expected, actual = mismatch
+        print(f"shanten: mismatch after {checked} hands on {ph(sorted(hand))} {hand}: expected {expected}, got {actual}")
+    return mismatch
+
+def check_yaku(alternative: Callable[..., Dict[Any, Score]] = single_pass_yaku,
+               reference: Callable[..., Dict[Any, Score]] = separate_yaku,
+               games: Iterable[str] = DEFAULT_GAMES,
+               num_random_hands: int = 10000,
+               seed: int = 0,
+               processes: Optional[int] = None) -> Optional[Mismatch]:
+    """
+    Compare the best Scores (e.g. for every wait) given by `alternative` with `reference`, on every
+    tenpai hand in `games` plus `num_random_hands` random tenpai hands, in parallel.
+    Returns the first mismatch as ((hand, get_yaku arguments), expected, actual)
+    """
+    cases = get_game_yaku_cases(load_games(games)) + generate_random_yaku_cases(num_random_hands, seed)
+    checked, mismatch = _run_chunks(_check_yaku_chunk, reference, alternative, cases, processes)
+    if mismatch is None:
+        print(f"yaku: all {checked} tenpai hands match")
+    else:
+        (hand, _), expected, actual = mismatch
+        print(f"yaku: mismatch after {checked} hands on {hand!s}: expected {expected}, got {actual}")
+    return mismatch
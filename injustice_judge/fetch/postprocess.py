@@ -1,8 +1,8 @@
 from ..classes import CallInfo, Dir, GameMetadata, GameRules
-from ..classes2 import Draw, Kyoku, Hand, Ron, Score, Tsumo
+from ..classes2 import Draw, Kyoku, Hand, Ron, Score, Tsumo, get_undiscarded_part
 from ..constants import Event, Shanten, TRANSLATE
 from ..display import round_name
-from ..utils import to_dora
+from ..utils import to_dora, to_tile_mask
 from typing import *
 
 ###
@@ -31,7 +31,7 @@ def postprocess_events(all_events: List[List[Event]],
             if old_shanten != new_shanten:
                 # calculate ukeire/furiten (if not tenpai, gives 0/False)
                 ukeire = kyoku.get_ukeire(seat)
-                kyoku.furiten[seat] = new_shanten[0] == 0 and any(w in kyoku.pond[seat] for w in new_shanten[1])
+                kyoku.furiten[seat] = new_shanten[0] == 0 and to_tile_mask(kyoku.pond[seat]) & kyoku.hands[seat].waits_mask != 0
                 kyoku.events.append((seat, "shanten_change", old_shanten, new_shanten, kyoku.hands[seat], ukeire, kyoku.furiten[seat]))
         for i, (seat, event_type, *event_data) in enumerate(events):
             kyoku.events.append(events[i]) # copy every event we process
@@ -44,6 +44,8 @@ def postprocess_events(all_events: List[List[Event]],
                 kyoku.tiles_in_wall = 70 if kyoku.num_players == 4 else 55
                 kyoku.doras = ([51, 52, 53] if metadata.rules.use_red_fives else []) + [to_dora(d, metadata.num_players) for d in dora_indicators]
                 kyoku.uras = [to_dora(d, metadata.num_players) for d in ura_indicators]
+                for tile in kyoku.get_visible_dora_indicators():
+                    kyoku.visible_counts.add(tile)
             elif event_type == "haipai":
                 # initialize every variable for this seat to its starting value
                 hand = Hand(event_data[0])
@@ -72,6 +74,7 @@ def postprocess_events(all_events: List[List[Event]],
                 kyoku.final_discard = tile
                 kyoku.final_discard_event_index[seat] = len(kyoku.events) - 1
                 kyoku.pond[seat].append(tile)
+                kyoku.visible_counts.add(tile)
                 update_shanten(seat)
                 if event_type == "riichi":
                     kyoku.riichi_sticks += 1
@@ -82,7 +85,10 @@ def postprocess_events(all_events: List[List[Event]],
                 if event_type != "minkan":
                     kyoku.hands[seat] = kyoku.hands[seat].add(called_tile)
                     assert len(kyoku.hands[seat].tiles) == 14
-                kyoku.hands[seat] = kyoku.hands[seat].add_call(CallInfo(event_type, called_tile, call_dir, call_tiles))
+                call = CallInfo(event_type, called_tile, call_dir, call_tiles)
+                kyoku.hands[seat] = kyoku.hands[seat].add_call(call)
+                for tile in get_undiscarded_part(call):
+                    kyoku.visible_counts.add(tile)
             elif event_type in {"ankan", "kakan", "kita"}: # special discards
                 # process a self call (which is like a special discard)
                 called_tile, call_tiles, call_dir = event_data
@@ -96,6 +102,9 @@ def postprocess_events(all_events: List[List[Event]],
                 elif event_type == "kita":
                     kyoku.hands[seat] = kyoku.hands[seat].kita()
                 kyoku.hands[seat] = kyoku.hands[seat].remove(called_tile)
+                # kakan only adds the called tile to the pon, ankan and kita add every tile
+                for tile in ([called_tile] if event_type == "kakan" else get_undiscarded_part(kyoku.hands[seat].calls[-1])):
+                    kyoku.visible_counts.add(tile)
                 update_shanten(seat) # kans may change your wait
                 kyoku.final_discard = called_tile
                 kyoku.final_discard_event_index[seat] = len(kyoku.events) - 1
@@ -106,6 +115,9 @@ def postprocess_events(all_events: List[List[Event]],
                 hand_is_hidden = [len(hand.open_part) == 0 for hand in kyoku.hands]
                 kyoku.result = parse_result(unparsed_result, kyoku.round, metadata.num_players, hand_is_hidden, [h.kita_count for h in kyoku.hands], kyoku.rules)
                 kyoku.events.append((0, "result", *kyoku.result))
+                # the final deal-in tile isn't counted as visible (see `Kyoku.get_visible_tiles`)
+                if kyoku.result[0] != "tsumo" and kyoku.final_discard != 0:
+                    kyoku.visible_counts.remove(kyoku.final_discard)
                 # if tsumo or kyuushu kyuuhai, pop the final tile from the winner's hand
                 if kyoku.result[0] == "tsumo" or (kyoku.result[0] == "draw" and kyoku.result[1].name == "9 terminals draw"):
                     for seat in range(kyoku.num_players):
@@ -115,11 +127,11 @@ def postprocess_events(all_events: List[List[Event]],
             # if the flag is set, we flip kan dora after processing a discard
             if flip_kan_dora_next_discard and event_type in {"discard", "riichi"}:
                 flip_kan_dora_next_discard = False
-                kyoku.num_dora_indicators_visible += 1
+                kyoku.flip_dora_indicator()
             # if this was a kan action, we set the dora flip flag for next discard
             if event_type in {"minkan", "ankan", "kakan"}:
                 if metadata.rules.immediate_kan_dora:
-                    kyoku.num_dora_indicators_visible += 1
+                    kyoku.flip_dora_indicator()
                 else:
                     flip_kan_dora_next_discard = True
         assert len(kyoku.hands) > 0, f"somehow we never initialized the kyoku at index {len(kyokus)}"
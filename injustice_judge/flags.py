@@ -5,9 +5,9 @@ from .constants import Event, Shanten, JIHAI, LIMIT_HANDS, PRED, SUCC, TRANSLATE
 from .display import ph, pt, print_pond, round_name
 from enum import Enum
 from .shanten import to_suits, from_suits, eliminate_all_groups
-from .utils import apply_delta_scores, get_score, get_taatsu_wait, is_mangan, is_safe, normalize_red_five, normalize_red_fives, to_dora_indicator, to_placement, try_remove_all_tiles
+from .utils import TILE_MASK, apply_delta_scores, count_in_tile_mask, from_tile_mask, get_score, get_taatsu_wait, in_tile_mask, is_mangan, is_safe, normalize_red_five, normalize_red_fives, to_dora_indicator, to_placement, to_tile_mask, try_remove_all_tiles, TileCounts
 from .wall import print_wall, get_hidden_dead_wall, get_remaining_draws
-from .yaku import get_final_yaku, get_yaku, get_yakuman_tenpais, get_yakuman_waits
+from .yaku import get_final_yaku, get_yaku, get_yaku_all, get_yakuman_tenpais, get_yakuman_waits
 from typing import *
 from pprint import pprint
 
@@ -160,6 +160,7 @@ class KyokuPlayerState:
     num_players: int
     hand: Hand
     pond: List[int]                                   = field(default_factory=list)
+    pond_mask: int                                    = 0 # tile mask of the pond (see `to_tile_mask`)
     genbutsu: Set[int]                                = field(default_factory=set)
     turn: int                                         = 0
     draws_since_shanten_change: int                   = 0
@@ -176,7 +177,7 @@ class KyokuPlayerState:
     in_riichi: bool                                   = False
     riichi_index: Optional[int]                       = None
     consecutive_off_suit_tiles: List[int]             = field(default_factory=list)
-    past_waits: List[List[int]]                       = field(default_factory=list)
+    past_waits: List[Tuple[List[int], int]]           = field(default_factory=list) # (waits, waits mask)
     dangerous_discards_passed: List[int]              = field(default_factory=list)
     dangerous_draws_after_riichi: List[int]           = field(default_factory=list)
     respects_riichi: List[Optional[bool]]             = field(default_factory=list)
@@ -207,14 +208,19 @@ class KyokuState:
     starting_doras: List[int]       = field(default_factory=list) # TODO 3 starting doras
     current_doras: List[int]        = field(default_factory=list)
     at: List[KyokuPlayerState]      = field(default_factory=list)
-    visible_tiles: List[int]        = field(default_factory=list) # TODO remove
+    visible_counts: TileCounts      = field(default_factory=TileCounts) # counts of every visible tile
     flags: List[List[Flags]]        = field(default_factory=list)
     data: List[List[Any]]           = field(default_factory=list)
     global_flags: List[Flags]       = field(default_factory=list)
     global_data: List[Any]          = field(default_factory=list)
-    def get_visible_tiles(self) -> List[int]:
-        return self.visible_tiles \
-             + [to_dora_indicator(dora, self.num_players) for dora in self.current_doras if dora not in {51,52,53}]
+    def __post_init__(self) -> None:
+        for dora in self.current_doras:
+            self._add_visible_dora(dora)
+    def _add_visible_tile(self, tile: int) -> None:
+        self.visible_counts.add(tile)
+    def _add_visible_dora(self, dora: int) -> None:
+        if dora not in {51,52,53}:
+            self.visible_counts.add(to_dora_indicator(dora, self.num_players))
     def add_flag(self, seat: int, flag: Flags, data: Optional[Dict[str, Any]] = None) -> None:
         self.flags[seat].append(flag)
         self.data[seat].append(data)
@@ -237,16 +243,18 @@ class KyokuState:
 
     def process_haipai(self, i: int, seat: int, event_type: str, hand: Tuple[int, ...]) -> None:
         assert len(self.at) == seat, f"got haipai out of order, expected seat {len(self.at)} but got seat {seat}"
-        self.at.append(KyokuPlayerState(num_players=self.num_players, hand=Hand(hand), nagashi=self.kyoku.rules.nagashi_mangan))
+        # start from the haipai from postprocess_events, which already knows its shanten
+        self.at.append(KyokuPlayerState(num_players=self.num_players, hand=self.kyoku.haipai[seat], nagashi=self.kyoku.rules.nagashi_mangan))
         # check if we have at least 7 terminal/honor tiles
         num_types = len(set(hand) & YAOCHUUHAI) # of terminal/honor tiles
         if num_types >= 7:
             self.add_flag(seat, Flags.SEVEN_TERMINAL_START, {"num_types": num_types})
         # check if we have a iishanten start or better
-        if self.at[seat].hand.shanten[0] <= 1:
+        # (checking shanten_number first skips calculating the iishanten type for worse hands)
+        if self.at[seat].hand.shanten_number <= 1 and self.at[seat].hand.shanten[0] <= 1:
             self.add_flag(seat, Flags.IISHANTEN_START, {"hand": self.at[seat].hand})
         # check if we have a 5 shanten start or worse
-        if self.at[seat].hand.shanten[0] >= 5:
+        if self.at[seat].hand.shanten_number >= 5:
             self.add_flag(seat, Flags.FIVE_SHANTEN_START, {"hand": self.at[seat].hand})
         # check if we started with 3 dora
         starting_dora = sum(hand.count(dora) for dora in self.kyoku.get_starting_doras())
@@ -260,11 +268,11 @@ class KyokuState:
         self.tiles_in_wall -= 1
         self.at[seat].last_draw = tile
         # check if draw would have completed a past wait
-        for wait in self.at[seat].past_waits:
-            if tile in wait:
+        for wait, wait_mask in self.at[seat].past_waits:
+            if in_tile_mask(tile, wait_mask):
                 self.add_flag(seat, Flags.YOU_DREW_PREVIOUSLY_WAITED_TILE, {"tile": tile, "wait": wait, "shanten": self.at[seat].hand.shanten})
         # check if it's been more than 9 draws since we changed shanten
-        if self.at[seat].hand.shanten[0] > 0 and self.at[seat].draws_since_shanten_change >= 9:
+        if self.at[seat].hand.shanten_number > 0 and self.at[seat].draws_since_shanten_change >= 9:
             self.add_flag(seat, Flags.NINE_DRAWS_NO_IMPROVEMENT, {"shanten": self.at[seat].hand.shanten, "draws": self.at[seat].draws_since_shanten_change})
         self.at[seat].draws_since_shanten_change += 1
         # check if we drew what we just discarded
@@ -278,7 +286,7 @@ class KyokuState:
         if majority_suit is not None and tile not in majority_suit | JIHAI:
             honitsu_tiles = majority_suit | JIHAI
             majority_tiles = tuple(tile for tile in self.at[seat].hand.tiles if tile in honitsu_tiles)
-            enough_honitsu_tiles = len(majority_tiles) >= 12 - int(self.at[seat].hand.shanten[0])
+            enough_honitsu_tiles = len(majority_tiles) >= 12 - self.at[seat].hand.shanten_number
             no_off_suit_calls = all(call.tile in honitsu_tiles for call in self.at[seat].hand.calls)
             going_for_honitsu = enough_honitsu_tiles and no_off_suit_calls
         if going_for_honitsu:
@@ -294,7 +302,7 @@ class KyokuState:
         for opponent, at in enumerate(self.at):
             if seat == opponent or not at.in_riichi:
                 continue
-            safe = lambda t: is_safe(t, self.at[opponent].genbutsu, self.get_visible_tiles())
+            safe = lambda t: is_safe(t, self.at[opponent].genbutsu, self.visible_counts)
             if not safe(tile) and not any(safe(t) for t in self.at[seat].hand.hidden_part):
                 self.at[seat].dangerous_draws_after_riichi.append(tile)
                 if len(self.at[seat].dangerous_draws_after_riichi) >= 4:
@@ -409,18 +417,18 @@ class KyokuState:
         # clear all passed calls
         self.at[seat].passed_calls = []
         # check if we're still 4-shanten or worse after the first row of discards
-        if self.at[seat].num_discards == 6 and prev_hand.shanten[0] >= 4:
+        if self.at[seat].num_discards == 6 and prev_hand.shanten_number >= 4:
             self.add_flag(seat, Flags.FOUR_SHANTEN_AFTER_FIRST_ROW, {"shanten": prev_hand.shanten})
         # check if we're iishanten with zero tiles left
         if 1 <= self.at[seat].hand.shanten[0] < 2:
-            ukeire = self.at[seat].hand.ukeire(self.get_visible_tiles())
+            ukeire = self.at[seat].hand.ukeire(self.visible_counts)
             if ukeire == 0:
                 self.add_flag(seat, Flags.IISHANTEN_WITH_ZERO_TILES, {"shanten": self.at[seat].hand.shanten})
         # check if we drew into potential tenpai
         # but every discard that would give us tenpai deals into someone
         if 0 <= prev_hand.shanten[0] < 2:
-            just_reached_tenpai = tile in prev_hand.shanten[1]
-            deals_into_someone = lambda tile: any(at.hand.shanten[0] == 0 and tile in at.hand.shanten[1] for at in self.at)
+            just_reached_tenpai = in_tile_mask(tile, prev_hand.waits_mask)
+            deals_into_someone = lambda tile: any(at.hand.shanten_number == 0 and in_tile_mask(tile, at.hand.waits_mask) for at in self.at)
             for player in range(self.num_players):
                 if player == seat:
                     continue
@@ -430,7 +438,7 @@ class KyokuState:
                         "hand": self.at[seat].hand,
                         "discards": tuple(tenpai_discards.keys()),
                         "just_reached_tenpai": just_reached_tenpai,
-                        "furiten": all(any(tile in self.at[seat].pond for tile in hand.shanten[1]) for hand in tenpai_discards.values())})
+                        "furiten": all(hand.waits_mask & self.at[seat].pond_mask for hand in tenpai_discards.values())})
 
     def process_self_kan(self, i: int, seat: int, event_type: str, called_tile: int, call_tiles: Tuple[int, ...], call_dir: Dir) -> None:
         self.at[seat].turn += 1
@@ -451,7 +459,7 @@ class KyokuState:
         else:
             assert False, f"process_self_kan called with non-self-kan type {event_type}"
         self.at[seat].hand = self.at[seat].hand.remove(called_tile)
-        self.visible_tiles.append(called_tile)
+        self._add_visible_tile(called_tile)
         # check if anyone's tenpai and had their waits erased by ankan
         if event_type == "ankan":
             tile = normalize_red_five(called_tile)
@@ -472,8 +480,9 @@ class KyokuState:
         prev_hand = self.at[seat].hand
         prev_discard = self.at[seat].last_discard
         self.at[seat].hand = self.at[seat].hand.remove(tile)
-        self.visible_tiles.append(tile)
+        self._add_visible_tile(tile)
         self.at[seat].pond.append(tile)
+        self.at[seat].pond_mask |= TILE_MASK[tile]
         self.at[seat].num_discards += 1
         self.at[seat].last_discard = tile
         self.at[seat].last_discard_was_riichi = event_type == "riichi"
@@ -481,7 +490,7 @@ class KyokuState:
         if not self.at[seat].in_riichi:
             self.at[seat].temporary_furiten = None
         # check if this makes us furiten
-        if self.at[seat].hand.shanten[0] == 0 and normalize_red_five(tile) in self.at[seat].hand.shanten[1]:
+        if self.at[seat].hand.shanten_number == 0 and in_tile_mask(tile, self.at[seat].hand.waits_mask):
             self.at[seat].furiten = True
         # check if this ends our nagashi
         if self.at[seat].nagashi and tile not in YAOCHUUHAI:
@@ -517,13 +526,16 @@ class KyokuState:
                 if self.tiles_in_wall <= 3:
                     self.add_flag(seat, Flags.YOU_DEALT_IN_JUST_BEFORE_NOTEN_PAYMENT, {"tile": tile})
             # check if we had no choice but to deal in
-            waits = {player: wait
+            hidden_mask = to_tile_mask(self.at[seat].hand.hidden_part)
+            waits = {player: self.at[player].hand.shanten[1]
                      for player in range(self.num_players)
                      if player != seat
-                     for (shanten, wait) in (self.at[player].hand.shanten,)
-                     if shanten == 0
-                     if any(tile in wait for tile in self.at[seat].hand.hidden_part)}
-            if all(any(tile in wait for wait in waits.values()) for tile in self.at[seat].hand.hidden_part):
+                     if self.at[player].hand.shanten[0] == 0
+                     if self.at[player].hand.waits_mask & hidden_mask}
+            dealt_in_mask = 0
+            for player in waits.keys():
+                dealt_in_mask |= self.at[player].hand.waits_mask
+            if hidden_mask & ~dealt_in_mask == 0:
                 self.add_flag(seat, Flags.YOUR_TILES_ALL_DEAL_IN, {"hand": prev_hand, "waits": waits})
             # check if the tile we discarded last turn was the same tile
             # (i.e. the person calling ron on us _just_ started waiting on that tile)
@@ -552,18 +564,21 @@ class KyokuState:
         # check if this discard respects/disrespects anyone's riichi
         for opponent, at in enumerate(self.at):
             if at.in_riichi and self.at[opponent].respects_riichi[seat] is None: # first discard after opponent's riichi
-                self.at[opponent].respects_riichi[seat] = is_safe(tile, self.at[opponent].genbutsu, self.get_visible_tiles())
+                self.at[opponent].respects_riichi[seat] = is_safe(tile, self.at[opponent].genbutsu, self.visible_counts)
                 if all(self.at[opponent].respects_riichi[player] == False for player in range(self.num_players) if player != opponent):
                     self.add_flag(opponent, Flags.EVERYONE_DISRESPECTED_YOUR_RIICHI)
                 elif all(self.at[opponent].respects_riichi[player] == True for player in range(self.num_players) if player != opponent):
                     self.add_flag(opponent, Flags.EVERYONE_RESPECTED_YOUR_RIICHI)
         # if we're not tenpai and there's a riichi, check if this discard passed
-        if self.at[seat].hand.shanten[0] > 0:
-            riichi_waits = {player: at.hand.shanten[1] for player, at in enumerate(self.at) if at.in_riichi}
-            if len(riichi_waits) > 0 and not any(tile in waits for waits in riichi_waits.values()):
+        if self.at[seat].hand.shanten_number > 0:
+            riichi_players = [player for player, at in enumerate(self.at) if at.in_riichi]
+            riichi_waits_mask = 0
+            for player in riichi_players:
+                riichi_waits_mask |= self.at[player].hand.waits_mask
+            if len(riichi_players) > 0 and not in_tile_mask(tile, riichi_waits_mask):
                 # check if it was dangerous against any of the riichis
                 is_generally_safe = tile in YAOCHUUHAI
-                if not is_generally_safe and any(not is_safe(tile, self.at[player].genbutsu, self.get_visible_tiles()) for player in riichi_waits.keys()):
+                if not is_generally_safe and any(not is_safe(tile, self.at[player].genbutsu, self.visible_counts) for player in riichi_players):
                     self.at[seat].dangerous_discards_passed.append(tile)
                     if len(self.at[seat].dangerous_discards_passed) >= 4:
                         self.add_flag(seat, Flags.PASSED_FOUR_DANGEROUS_DISCARDS, {"discards": self.at[seat].dangerous_discards_passed})
@@ -584,7 +599,7 @@ class KyokuState:
         # check if anyone can ron/tsumo on this discard
         for player, at in enumerate(self.at):
             is_tsumo = player == seat
-            if at.hand.shanten[0] == 0 and normalize_red_five(tile) in at.hand.shanten[1]:
+            if at.hand.shanten_number == 0 and in_tile_mask(tile, at.hand.waits_mask):
                 # check if we were yakuless, which would prevent us from winning
                 yaku = get_yaku(hand = at.hand,
                                 events = self.kyoku.events,
@@ -616,17 +631,15 @@ class KyokuState:
                     flag = Flags.YOU_CAN_CALL_TSUMO if is_tsumo else Flags.YOU_CAN_CALL_RON
                     self.add_flag(player, flag, {"tile": tile, "wait": at.hand.shanten[1], "turns_left": self.tiles_in_wall})
         # check if this discard puts us from not tenpai to tenpai
-        if prev_hand.prev_shanten[0] > 0 and self.at[seat].hand.shanten[0] == 0:
+        if prev_hand.prev_shanten[0] > 0 and self.at[seat].hand.shanten_number == 0:
             # check if we could have discarded something else for a different tenpai wait
             possible_tenpais = prev_hand.get_possible_tenpais()
             other_tenpais: Dict[int, Set[int]] = {} # wait => tiles you could have discarded
             for tile, tenpai_hand in possible_tenpais.items():
-                if self.at[seat].hand.shanten[1] != tenpai_hand.shanten[1]:
-                    for wait in tenpai_hand.shanten[1]:
-                        if wait not in self.at[seat].hand.shanten[1]:
-                            if wait not in other_tenpais:
-                                other_tenpais[wait] = set()
-                            other_tenpais[wait].add(tile)
+                for wait in from_tile_mask(tenpai_hand.waits_mask & ~self.at[seat].hand.waits_mask):
+                    if wait not in other_tenpais:
+                        other_tenpais[wait] = set()
+                    other_tenpais[wait].add(tile)
             # now check if the very next discard would have dealt into one of those tenpai waits
             next_discard = next((event_data[0] for _, event_type, *event_data in self.kyoku.events[i+1:] if event_type in ["discard", "riichi"]), None)
             if next_discard in other_tenpais:
@@ -651,7 +664,7 @@ class KyokuState:
         self.at[seat].ponnable_tiles = {k for k, v in Counter(tiles).items() if v in {2, 3}}
         # record past waits if we've changed from tenpai
         if prev_shanten[0] == 0:
-            self.at[seat].past_waits.append(list(prev_shanten[1]))
+            self.at[seat].past_waits.append((list(prev_shanten[1]), to_tile_mask(prev_shanten[1])))
             if new_shanten[0] > 0:
                 self.add_flag(seat, Flags.YOU_FOLDED_FROM_TENPAI)
                 self.add_global_flag(Flags.SOMEONE_FOLDED_FROM_TENPAI, {"seat": seat})
@@ -670,24 +683,23 @@ class KyokuState:
                     continue
                 if Flags.YOU_REACHED_TENPAI in self.flags[other]:
                     other_data = self.data[other][len(self.flags[other]) - 1 - self.flags[other][::-1].index(Flags.YOU_REACHED_TENPAI)]
-                    visible_tiles = self.get_visible_tiles()
                     self.add_flag(seat, Flags.YOU_CHASED,
                                          {"your_seat": seat,
                                           "your_hand": hand,
-                                          "your_ukeire": hand.ukeire(visible_tiles),
+                                          "your_ukeire": hand.ukeire(self.visible_counts),
                                           "your_furiten": furiten,
                                           "seat": other,
                                           "hand": other_data["hand"],
-                                          "ukeire": other_data["hand"].ukeire(visible_tiles),
+                                          "ukeire": other_data["hand"].ukeire(self.visible_counts),
                                           "furiten": other_data["furiten"]})
                     self.add_flag(other, Flags.YOU_GOT_CHASED,
                                          {"seat": seat,
                                           "hand": hand,
-                                          "ukeire": hand.ukeire(visible_tiles),
+                                          "ukeire": hand.ukeire(self.visible_counts),
                                           "furiten": furiten,
                                           "your_seat": other,
                                           "your_hand": other_data["hand"],
-                                          "your_ukeire": other_data["hand"].ukeire(visible_tiles),
+                                          "your_ukeire": other_data["hand"].ukeire(self.visible_counts),
                                           "your_furiten": other_data["furiten"]})
         self.add_global_flag(Flags.SOMEONE_REACHED_TENPAI,
                              {"seat": seat,
@@ -697,7 +709,7 @@ class KyokuState:
                               "haipai": self.kyoku.haipai[seat]})
         self.add_flag(seat, Flags.YOU_REACHED_TENPAI,
                             {"hand": hand,
-                             "ukeire": hand.ukeire(self.get_visible_tiles()),
+                             "ukeire": hand.ukeire(self.visible_counts),
                              "furiten": furiten,
                              "turn": len(self.at[seat].pond),
                              "haipai": self.kyoku.haipai[seat]})
@@ -734,10 +746,11 @@ class KyokuState:
             "rules": self.kyoku.rules,
         }
         # if no calls, use tsumo score. else, get ron score
+        # (closed hands might also need the ron score, see below, so get both in one pass)
         calls_present = len(get_yaku_args["hand"].calls) > 0  # type: ignore[attr-defined]
-        all_scores = get_yaku(**get_yaku_args, check_rons = calls_present, check_tsumos = not calls_present)  # type: ignore[arg-type]
-        visible_tiles = self.kyoku.get_visible_tiles()
-        formatted_scores = [(score, wait) for wait, score in all_scores.items() if visible_tiles.count(wait) > 0]
+        ron_scores, tsumo_scores = get_yaku_all(**get_yaku_args, check_tsumos = not calls_present)  # type: ignore[arg-type]
+        all_scores = ron_scores if calls_present else tsumo_scores
+        formatted_scores = [(score, wait) for wait, score in all_scores.items() if self.kyoku.visible_counts.count(wait) > 0]
         if len(formatted_scores) > 0: # if wait is not dead
             best_score, takame = max(formatted_scores)
             han = best_score.han
@@ -747,8 +760,7 @@ class KyokuState:
             # recalculate fu for a ron, and return that score if it results in the same limit hand
             recalculate = han in {7, 9, 10, 12} or is_mangan(han-1, fu)
             if recalculate and not calls_present:
-                ron_scores = get_yaku(**get_yaku_args, check_rons = True, check_tsumos = False)  # type: ignore[arg-type]
-                formatted_ron_scores = [(score, wait) for wait, score in ron_scores.items() if visible_tiles.count(wait) > 0]
+                formatted_ron_scores = [(score, wait) for wait, score in ron_scores.items() if self.kyoku.visible_counts.count(wait) > 0]
                 if len(formatted_ron_scores) > 0: # if wait is not dead
                     best_ron_score, ron_takame = max(formatted_ron_scores)
                     ron_han = best_score.han
@@ -772,8 +784,7 @@ class KyokuState:
             # first, do standard yakuman, otherwise, try kazoe yakuman
             yakuman_waits: List[Tuple[str, Set[int]]] = [(y, get_yakuman_waits(self.at[seat].hand, y)) for y in get_yakuman_tenpais(self.at[seat].hand)]
             # only report the yakuman if the waits are not dead
-            visible = self.get_visible_tiles()
-            yakuman_types: Set[str] = {t for t, waits in yakuman_waits if not all(visible.count(wait) == 4 for wait in waits)}
+            yakuman_types: Set[str] = {t for t, waits in yakuman_waits if not all(self.visible_counts.count(wait) == 4 for wait in waits)}
             if len(yakuman_types) > 0:
                 self.add_flag(seat, Flags.YOU_REACHED_YAKUMAN_TENPAI, {"hand": self.at[seat].hand, "types": yakuman_types, "waits": yakuman_waits})
             elif han >= 13 and not any(y in YAKUMAN for y, _ in best_score.yaku):
@@ -815,9 +826,9 @@ class KyokuState:
             winners = {r[0] for r in raw_result[2::2]}
             for i in range(self.num_players):
                 player = (seat+i)%self.num_players
-                if self.at[player].hand.shanten[0] == 0:
+                if self.at[player].hand.shanten_number == 0:
                     # check the dead wall for our waits
-                    in_dead_wall = sum(dead_wall.count(tile) for tile in self.at[player].hand.shanten[1])
+                    in_dead_wall = count_in_tile_mask(dead_wall, self.at[player].hand.waits_mask)
                     ukeire = self.kyoku.get_ukeire(player)
                     if ukeire > 0 and in_dead_wall >= (ukeire+1) // 2:
                         self.add_flag(player, Flags.WAIT_WAS_IN_DEAD_WALL,
@@ -835,7 +846,7 @@ class KyokuState:
                                                     num_kans_kitas=self.num_kans + self.num_kitas)
                         if len(yakuman_tenpais) == 0:
                             draws = draws[:3]
-                        if not set(wait).isdisjoint(set(normalize_red_fives(draws))):
+                        if self.at[player].hand.waits_mask & to_tile_mask(draws):
                             self.add_flag(player, Flags.COULD_HAVE_TSUMOED, {"wait": wait, "draws": draws, "yakuman_tenpais": yakuman_tenpais})
                         # check if a riichi player would have drawn the tile and we could call ron on it
                         if not self.at[player].furiten:
@@ -843,14 +854,13 @@ class KyokuState:
                                 riichi_player = (seat+j)%self.num_players
                                 if player == riichi_player or not self.at[riichi_player].in_riichi:
                                     continue
-                                riichi_wait = self.at[riichi_player].hand.shanten[1]
                                 draws = get_remaining_draws(wall=self.kyoku.wall,
                                                             tiles_in_wall=self.tiles_in_wall - ((j+3)%4),
                                                             sanma=self.num_players == 3,
                                                             num_kans_kitas=self.num_kans + self.num_kitas)
                                 if len(yakuman_tenpais) == 0:
                                     draws = draws[:3]
-                                if not (set(wait) - set(riichi_wait)).isdisjoint(set(normalize_red_fives(draws))):
+                                if self.at[player].hand.waits_mask & ~self.at[riichi_player].hand.waits_mask & to_tile_mask(draws):
                                     self.add_flag(player, Flags.COULD_HAVE_RONNED, {"riichi_player": riichi_player, "wait": wait, "draws": draws, "yakuman_tenpais": yakuman_tenpais})
 
     def process_result(self, i: int, seat: int, event_type: str, result_type: str, *results: Union[Ron, Tsumo, Draw]) -> None:
@@ -979,7 +989,7 @@ class KyokuState:
         elif draw.name in {"9 terminals draw", "4-wind draw"}:
             # check if anyone started with a really good hand
             for seat in range(self.num_players):
-                if self.at[seat].hand.shanten[0] <= 1:
+                if self.at[seat].hand.shanten_number <= 1 and self.at[seat].hand.shanten[0] <= 1:
                     self.add_flag(seat, Flags.IISHANTEN_HAIPAI_ABORTED,
                              {"draw_name": draw.name,
                               "shanten": self.kyoku.haipai[seat].shanten,
@@ -1162,6 +1172,7 @@ class KyokuState:
         if len(self.current_doras) < len(self.kyoku.doras):
             new_dora = self.kyoku.doras[len(self.current_doras)]
             self.current_doras.append(new_dora)
+            self._add_visible_dora(new_dora)
             # check if that just gave us 4 dora
             if list(normalize_red_fives(self.at[seat].hand.tiles_with_kans)).count(new_dora) == 4:
                 self.add_flag(seat, Flags.YOU_FLIPPED_DORA_BOMB, {"doras": self.current_doras.copy(), "call": kan_call, "hand": self.at[seat].hand})
@@ -1223,7 +1234,7 @@ def determine_flags(kyoku: Kyoku) -> Tuple[List[List[Flags]], List[List[Dict[str
                     prev_shanten = prev_shanten,
                     new_shanten = new_shanten,
                     hand = state.at[seat].hand,
-                    ukeire = state.at[seat].hand.ukeire(state.get_visible_tiles()),
+                    ukeire = state.at[seat].hand.ukeire(state.visible_counts),
                     furiten = state.at[seat].furiten)
         elif event_type in {"discard", "riichi"}:
             state.process_discard(i, *event[:3]) # riichi has extra args we don't care about
@@ -1243,7 +1254,7 @@ def determine_flags(kyoku: Kyoku) -> Tuple[List[List[Flags]], List[List[Dict[str
                         prev_shanten = shanten,
                         new_shanten = shanten,
                         hand = state.at[seat].hand,
-                        ukeire = state.at[seat].hand.ukeire(state.get_visible_tiles()),
+                        ukeire = state.at[seat].hand.ukeire(state.visible_counts),
                         furiten = state.at[seat].furiten)
         elif event_type == "end_game":
             state.process_end_game(i, *event)
@@ -1195,8 +1195,7 @@ def you_reached_yakuman_tenpai(flags: List[Flags], data: List[Dict[str, Any]], k
         last_subject = "someone"
     # identify the location of the remaining waits
     all_waits = {wait for _, waits in yakuman_waits for wait in waits}
-    visible_tiles = kyoku.get_visible_tiles()
-    visible_waits = {wait: visible_tiles.count(wait) for wait in all_waits}
+    visible_waits = {wait: kyoku.visible_counts.count(wait) for wait in all_waits}
     held_waits = {wait: [hand.hidden_part.count(wait) for seat in range(kyoku.num_players)] for wait in all_waits}
     total_held_waits = [sum(v[seat] for k, v in held_waits.items()) for seat in range(kyoku.num_players)]
     ukeire = 4 * len(all_waits) - sum(visible_waits.values()) - total_held_waits[player]
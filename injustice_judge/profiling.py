@@ -0,0 +1,152 @@
+from collections import Counter
+from dataclasses import dataclass, field
+import functools
+import heapq
+import time
+from typing import *
+
+from . import shanten, utils
+from .constants import Shanten, SHANTEN_NAMES
+from .display import ph
+
+# This file implements an opt-in profiler for the shanten calculation.
+#
+# Nothing here runs unless profiling is enabled, either by calling
+#   `enable_profiling()` or by setting the environment variable `shanten_profile`
+#   (which also prints the report to stderr on exit).
+# Enabling it replaces the phase functions in shanten.py with timed wrappers,
+#   so when it's disabled the shanten code runs with no extra overhead at all.
+#
+# The report (see `get_profile_report`) contains:
+# - wall time (perf_counter) and call count for each phase
+#   (times are inclusive, so nested phases also count towards their caller)
+# - hit/miss ratios for the caches used by the shanten calculation
+# - histograms of hand length and shanten type for uncached hands
+# - the slowest uncached hands
+# - how many `Hand`s skipped calculating their shanten since the last `reset_hand_counts`
+#   (which `analyze_game` calls for every game)
+
+# functions in shanten.py to time
+PHASES = ("_calculate_shanten", "_calculate_shanten_number",
+          "get_standard_shanten", "get_table_shanten",
+          "eliminate_all_groups", "eliminate_some_taatsus", "get_hand_shanten",
+          "get_shanten_type", "get_tenpai_waits",
+          "calculate_chiitoitsu_shanten", "calculate_kokushi_shanten")
+
+# lru caches whose hit/miss ratios are reported
+CACHES = ((shanten, "_calculate_shanten"), (shanten, "_calculate_shanten_number"),
+          (shanten, "get_suit_decomposition"), (shanten, "_groupless_counts"), (shanten, "_min_floating_counts"),
+          (shanten, "get_pair_shapes"), (shanten, "get_complex_shapes"),
+          (utils, "try_remove_all_tiles"))
+
+NUM_SLOWEST_HANDS = 20
+
+@dataclass
+class ShantenProfile:
+    phase_time: Dict[str, float] = field(default_factory=lambda: {phase: 0.0 for phase in PHASES})
+    phase_calls: Counter[str] = field(default_factory=Counter)
+    hand_lengths: Counter[int] = field(default_factory=Counter)        # lengths of uncached hands
+    shanten_types: Counter[float] = field(default_factory=Counter)     # shanten of uncached hands
+    slowest_hands: List[Tuple[float, Tuple[int, ...], float]] = field(default_factory=list) # min-heap of (time, hand, shanten)
+    originals: Dict[str, Callable] = field(default_factory=dict)       # unwrapped phase functions
+
+profile: Optional[ShantenProfile] = None
+
+def _timed(name: str, f: Callable, prof: ShantenProfile) -> Callable:
+    """Wrap `f` to add its wall time and call count to `prof` under `name`"""
+    @functools.wraps(f)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        now = time.perf_counter()
+        ret = f(*args, **kwargs)
+        prof.phase_time[name] += time.perf_counter() - now
+        prof.phase_calls[name] += 1
+        return ret
+    return _keep_cache_interface(wrapper, f)
+
+def _keep_cache_interface(wrapper: Callable, f: Callable) -> Callable:
+    """If `f` is an lru_cache, let `wrapper` be used like one (e.g. by set_shanten_engine)"""
+    for attr in ("cache_info", "cache_clear"):
+        if hasattr(f, attr):
+            setattr(wrapper, attr, getattr(f, attr))
+    return wrapper
+
+def _timed_calculate_shanten(f: utils.PackedHandCache[Shanten], prof: ShantenProfile) -> Callable:
+    """Like _timed, but also records the hand if it wasn't already in the cache"""
+    @functools.wraps(f)
+    def wrapper(starting_hand: Tuple[int, ...]) -> Any:
+        misses = f.cache_info().misses
+        now = time.perf_counter()
+        ret = f(starting_hand)
+        elapsed = time.perf_counter() - now
+        prof.phase_time["_calculate_shanten"] += elapsed
+        prof.phase_calls["_calculate_shanten"] += 1
+        if f.cache_info().misses > misses:
+            prof.hand_lengths[len(starting_hand)] += 1
+            prof.shanten_types[ret[0]] += 1
+            entry = (elapsed, starting_hand, ret[0])
+            if len(prof.slowest_hands) < NUM_SLOWEST_HANDS:
+                heapq.heappush(prof.slowest_hands, entry)
+            else:
+                heapq.heappushpop(prof.slowest_hands, entry)
+        return ret
+    return _keep_cache_interface(wrapper, f)
+
+def enable_profiling(print_at_exit: bool = False) -> ShantenProfile:
+    """Start profiling the shanten calculation, returning the (new) profile"""
+    global profile
+    disable_profiling()
+    profile = ShantenProfile()
+    for name in PHASES:
+        f = getattr(shanten, name)
+        profile.originals[name] = f
+        if name == "_calculate_shanten":
+            setattr(shanten, name, _timed_calculate_shanten(f, profile))
+        else:
+            setattr(shanten, name, _timed(name, f, profile))
+    if print_at_exit:
+        import atexit, sys
+        atexit.register(lambda: print(get_profile_report(), file=sys.stderr))
+    return profile
+
+def disable_profiling() -> None:
+    """Stop profiling and restore the original shanten functions (the last profile is kept for reporting)"""
+    if profile is not None:
+        for name, f in profile.originals.items():
+            setattr(shanten, name, f)
+        profile.originals.clear()
+
+def get_profile_report() -> str:
+    """Summarize the current profile as a printable string"""
+    if profile is None:
+        return "shanten profiling is disabled (set the shanten_profile environment variable or call enable_profiling())"
+    lines = ["Shanten profile:"]
+    lines.append(f"{'phase':<30} {'calls':>9} {'total (s)':>10} {'per call (us)':>14}")
+    for name in sorted(PHASES, key=lambda name: -profile.phase_time[name]):
+        calls = profile.phase_calls[name]
+        if calls > 0:
+            total = profile.phase_time[name]
+            lines.append(f"{name:<30} {calls:>9} {total:>10.3f} {1000000*total/calls:>14.1f}")
+
+    lines.append("")
+    lines.append(f"{'cache':<30} {'hits':>9} {'misses':>10} {'hit ratio':>14}")
+    for module, name in CACHES:
+        info = getattr(module, name).cache_info()
+        total = info.hits + info.misses
+        ratio = f"{info.hits/total:.1%}" if total > 0 else "-"
+        lines.append(f"{name:<30} {info.hits:>9} {info.misses:>10} {ratio:>14}")
+
+    lines.append("")
+    lines.append("Uncached hands by length: " + ", ".join(f"{length}: {count}" for length, count in sorted(profile.hand_lengths.items())))
+    lines.append("Uncached hands by shanten:")
+    for shanten_value, count in sorted(profile.shanten_types.items()):
+        lines.append(f"  {SHANTEN_NAMES.get(shanten_value, shanten_value)!s:<36} ({shanten_value}): {count}")
+
+    lines.append("")
+    lines.append("Slowest uncached hands:")
+    for elapsed, hand, shanten_value in sorted(profile.slowest_hands, reverse=True):
+        lines.append(f"  {1000*elapsed:8.2f}ms {ph(hand)} ({SHANTEN_NAMES.get(shanten_value, shanten_value)})")
+
+    from . import classes2 # classes2 imports shanten, which imports this file
+    lines.append("")
+    lines.append(f"Hands: {classes2.hand_counts}")
+    return "\n".join(lines)
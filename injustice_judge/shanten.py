@@ -1,9 +1,9 @@
 import functools
 import itertools
-from .classes import Interpretation
-from .constants import Shanten, PRED, SUCC, TANYAOHAI, YAOCHUUHAI
+from .classes import generate_all_interpretations
+from .constants import Shanten, PRED, PRED2, PRED3, SUCC, SUCC2, SUCC3, TANYAOHAI, TILE_TYPES, YAOCHUUHAI
 from .display import ph, pt
-from .utils import get_taatsu_wait, get_waits, get_waits_taatsus, normalize_red_five, normalize_red_fives, sorted_hand, try_remove_all_tiles
+from .utils import get_taatsu_wait, get_waits, get_waits_taatsus, TAATSU_TABLE, normalize_red_five, normalize_red_fives, pack_hand, packed_hand_cache, remove_all_tiles, sorted_hand, try_remove_all_tiles, unpack_hand
 
 from typing import *
 from pprint import pprint
@@ -18,17 +18,8 @@ from pprint import pprint
 # 
 # See `_calculate_shanten` for more info.
 
-# Timers used for profiling shanten.
 # This algorithm is slow, so the program spends most of its time here.
-import time
-timers = {
-    "calculate_hands": 0.0,
-    "remove_some_taatsus": 0.0,
-    "get_hand_shanten": 0.0,
-    "get_shanten_type": 0.0,
-    "get_tenpai_waits": 0.0,
-    "total": 0.0,
-}
+# To profile it, set the environment variable `shanten_profile` (see profiling.py).
 
 ###
 ### ukeire and shanten calculations
@@ -52,6 +43,40 @@ def from_suits(suits: Suits) -> Iterator[Tuple[int, ...]]:
     return ((*(10+v for v in a), *(20+v for v in b), *(30+v for v in c), *(40+v for v in d))
         for a in suits[0] for b in suits[1] for c in suits[2] for d in suits[3])
 
+@functools.lru_cache(maxsize=65536)
+def _eliminate_from_suit(hand: Tuple[int, ...], keep_some: bool,
+                         sequences_to_check: Callable[[int], Tuple[Tuple[int, ...], ...]],
+                         multiples_to_check: int, do_sequences: bool) -> Tuple[FrozenSet[Tuple[int, ...]], int]:
+    """
+    eliminate_from_suits for a single suit (cached, since the same suit shows up across many hands)
+    Also returns the work done (the number of shapes visited), which the caller spends from
+    the work budget, so that a cache hit costs as much as a miss.
+    """
+    max_length = len(hand)
+    results: Dict[Tuple[int, ...], Set[Tuple[int, ...]]] = {} # rec(hand) for every hand seen so far
+    def rec(hand: Tuple[int, ...]) -> Set[Tuple[int, ...]]:
+        nonlocal max_length
+        if hand in results:
+            return results[hand]
+        max_length = min(max_length, len(hand))
+        candidates = set()
+        for i, tile in enumerate(hand):
+            # check pair/triplet
+            if multiples_to_check > 0 and i + (multiples_to_check-1) < len(hand) and all(tile == hand[i+n] for n in range(1, multiples_to_check)):
+                candidates.add((*hand[:i],*hand[i+multiples_to_check:]))
+            if do_sequences:
+                for sequence in sequences_to_check(tile):
+                    sequence_removed = remove_all_tiles(hand, sequence)
+                    if len(sequence_removed) < len(hand):
+                        candidates.add(sequence_removed)
+        if len(candidates) > 0:
+            results[hand] = set.union(*map(rec, candidates)) | ({hand} if keep_some else set())
+        else:
+            results[hand] = {hand}
+        return results[hand]
+    shapes = frozenset(rec(hand) if keep_some else filter(lambda h: len(h) == max_length, rec(hand)))
+    return shapes, len(results)
+
 def eliminate_from_suits(suits: Suits, keep_some: bool,
                          sequences_to_check: Callable[[int], Tuple[Tuple[int, ...], ...]],
                          multiples_to_check: int = 0) -> Suits:
@@ -65,33 +90,27 @@ def eliminate_from_suits(suits: Suits, keep_some: bool,
     If keep_some is True, the returned hands will contain all possibilities of removing
       one or more instances of the pattern from the hand
     """
-    def remove(hand: Tuple[int, ...], do_sequences: bool = True) -> Set[Tuple[int, ...]]:
-        max_length = len(hand)
-        def rec(hand: Tuple[int, ...]) -> Set[Tuple[int, ...]]:
-            nonlocal max_length
-            max_length = min(max_length, len(hand))
-            candidates = set()
-            for i, tile in enumerate(hand):
-                # check pair/triplet
-                if multiples_to_check > 0 and i + (multiples_to_check-1) < len(hand) and all(tile == hand[i+n] for n in range(1, multiples_to_check)):
-                    candidates.add((*hand[:i],*hand[i+multiples_to_check:]))
-                if do_sequences:
-                    for sequence in sequences_to_check(tile):
-                        sequence_removed = try_remove_all_tiles(hand, sequence)
-                        if len(sequence_removed) < len(hand):
-                            candidates.add(sequence_removed)
-            if len(candidates) > 0:
-                return set.union(*map(rec, candidates)) | ({hand} if keep_some else set())
-            else:
-                return {hand}
-        return rec(hand) if keep_some else set(filter(lambda h: len(h) == max_length, rec(hand)))
+    result, work = count_eliminate_from_suits(suits, keep_some, sequences_to_check, multiples_to_check)
+    work_budget.spend(work)
+    return result
 
-    return (
+def count_eliminate_from_suits(suits: Suits, keep_some: bool,
+                               sequences_to_check: Callable[[int], Tuple[Tuple[int, ...], ...]],
+                               multiples_to_check: int = 0) -> Tuple[Suits, int]:
+    """Same as eliminate_from_suits, but returns the work done rather than spending it from the work budget"""
+    work = 0
+    def remove(s: Tuple[int, ...], do_sequences: bool = True) -> FrozenSet[Tuple[int, ...]]:
+        nonlocal work
+        shapes, suit_work = _eliminate_from_suit(s, keep_some, sequences_to_check, multiples_to_check, do_sequences)
+        work += suit_work
+        return shapes
+    result = (
         set().union(*(remove(s) for s in suits[0])),
         set().union(*(remove(s) for s in suits[1])),
         set().union(*(remove(s) for s in suits[2])),
         suits[3] if multiples_to_check == 0 else set().union(*(remove(s, do_sequences=False) for s in suits[3]))
     )
+    return result, work
 
 to_none = lambda tile: ()
 to_sequences = lambda tile: ((tile+2, tile+1, tile),)
@@ -103,8 +122,15 @@ eliminate_all_taatsus  = lambda suits: eliminate_from_suits(suits, False, to_taa
 eliminate_some_pairs   = lambda suits: eliminate_from_suits(suits, True,  to_none, 2)
 
 def get_tenpai_waits(hand: Tuple[int, ...]) -> Set[int]:
-    """Given a tenpai hand, get all its waits"""
-    return {wait for i in Interpretation(hand).generate_all_interpretations() for wait in i.get_waits()}
+    """Given a (standard) tenpai hand, get all its waits"""
+    if shanten_engine == "table":
+        # every tile that completes the hand (see `is_complete_hand`)
+        if chinitsu_table is not None and len(hand) in {1, 4, 7, 10, 13}:
+            normalized_hand = tuple(sorted(normalize_red_fives(hand)))
+            if normalized_hand[0]//10 == normalized_hand[-1]//10 != 4:
+                return chinitsu_table.get_completing_tiles(normalized_hand)
+        return get_completing_tiles(hand)
+    return {wait for i in generate_all_interpretations(hand) for wait in i.get_waits()}
 
 def get_hand_shanten(suits: Suits, groups_needed: int) -> int:
     """Return the shanten of a given hand that has all of its groups, ryanmens, and kanchans removed"""
@@ -131,6 +157,225 @@ def get_hand_shanten(suits: Suits, groups_needed: int) -> int:
         shanten = min(shanten, get_shanten(sum(floating) + extra_floating, True))
     return shanten
 
+###
+### table-driven shanten engine
+###
+
+# The above functions (eliminate_from_suits + get_hand_shanten) are the reference
+#   engine: they enumerate every way to remove groups and taatsus from the whole
+#   hand. But everything they compute is actually independent per suit, so the
+#   table engine instead looks up a decomposition for each suit separately
+#   and adds the four results together.
+#
+# Each suit is represented by a count vector, e.g. 1123m is (2,1,1,0,0,0,0,0,0)
+#   and 1122z is (2,2,0,0,0,0,0). For each count vector the table stores:
+#   - the maximum number of groups removable from the suit
+#   - the shapes left after removing that many groups (i.e. eliminate_all_groups)
+#   - the fewest floating tiles left after also removing some taatsus
+#   - the same, but only counting shapes that still contain a pair (99 if none)
+# Entries are computed once per count vector and never evicted. There are
+#   finitely many suits of at most 14 tiles, so the table is bounded.
+
+SuitCounts = Tuple[int, ...]
+# (groups, groupless shapes, floating, floating with pair)
+SuitDecomposition = Tuple[int, FrozenSet[Tuple[int, ...]], int, int]
+
+# Which engine `_calculate_shanten` uses to get the shanten number:
+#   "table" (the default) or "reference" (the original elimination algorithm).
+# Both give identical results; see `test_shanten_engines` in tests/test_shanten.py.
+import os
+shanten_engine: str = os.getenv("shanten_engine") or "table"
+# optional persistent cache for _calculate_shanten, see shanten_cache.py
+from .shanten_cache import ShantenCache, open_shanten_cache
+shanten_cache: Optional[ShantenCache] = open_shanten_cache(os.getenv("shanten_cache", "")) if os.getenv("shanten_cache") else None
+# precomputed results for every single-suit hand, see chinitsu_table.py
+#   (set the environment variable `chinitsu_table` to 0 to calculate them instead)
+from .chinitsu_table import ChinitsuTable, DEFAULT_PATH as CHINITSU_TABLE_PATH, encode_record as encode_chinitsu_record, open_chinitsu_table, save_chinitsu_table
+chinitsu_table: Optional[ChinitsuTable] = open_chinitsu_table() if os.getenv("chinitsu_table") != "0" else None
+# optional cache shared with other processes (e.g. a process pool), see shared_shanten_cache.py
+#   (if the block is gone or stale, this warns and goes without)
+from .shared_shanten_cache import SharedShantenCache, attach_shared_shanten_cache
+shared_shanten_cache: Optional[SharedShantenCache] = attach_shared_shanten_cache(os.getenv("shanten_shared_cache", "")) if os.getenv("shanten_shared_cache") else None
+
+def set_shanten_cache(cache: Optional[ShantenCache]) -> None:
+    """Use `cache` (or nothing, if None) as the persistent cache for `_calculate_shanten`"""
+    global shanten_cache
+    shanten_cache = cache
+
+def set_shared_shanten_cache(cache: Optional[SharedShantenCache]) -> None:
+    """Use `cache` (or nothing, if None) as the shared cache for `_calculate_shanten`"""
+    global shared_shanten_cache
+    shared_shanten_cache = cache
+
+def set_chinitsu_table(table: Optional[ChinitsuTable]) -> None:
+    """Use `table` (or nothing, if None) for single-suit hands in `_calculate_shanten` and `get_tenpai_waits`"""
+    global chinitsu_table
+    chinitsu_table = table
+    _calculate_shanten.cache_clear()
+    _calculate_shanten_number.cache_clear()
+
+# (persistent cache, shared cache, chinitsu table): everything `_calculate_shanten` looks up
+#   instead of calculating. Tests and benchmarks set these to NO_PRECOMPUTED_RESULTS,
+#   since otherwise e.g. every single-suit hand is just a chinitsu table lookup
+PrecomputedResults = Tuple[Optional[ShantenCache], Optional[SharedShantenCache], Optional[ChinitsuTable]]
+NO_PRECOMPUTED_RESULTS: PrecomputedResults = (None, None, None)
+
+def get_precomputed_results() -> PrecomputedResults:
+    """Get the persistent cache, shared cache, and chinitsu table currently in use"""
+    return shanten_cache, shared_shanten_cache, chinitsu_table
+
+def set_precomputed_results(results: PrecomputedResults) -> None:
+    """Use the given persistent cache, shared cache, and chinitsu table (see `get_precomputed_results`)"""
+    set_shanten_cache(results[0])
+    set_shared_shanten_cache(results[1])
+    set_chinitsu_table(results[2])
+
+# Complexity budget
+# `get_shanten_type` goes through every breakdown of the hand, which takes exponentially
+#   long for some shapes. To bound the time spent on any single hand, we count the work
+#   it does (removals in `_eliminate_from_suit`, hands from `get_other_tiles`, and calls
+#   to `add_hand`) and give up once that exceeds the budget. Cached results count the
+#   work it took to calculate them, so whether a hand goes over depends only on the hand.
+#   `_calculate_shanten` then falls back to plain iishanten (1.0) with the waits from `get_fallback_iishanten_waits`,
+#   and records the hand in `approximate_hands` so it can be added to a regression corpus.
+#   (It's also appended to the file given by the environment variable `shanten_budget_log`.)
+# Set the environment variable `shanten_budget` to change the budget (0 means no limit).
+DEFAULT_SHANTEN_BUDGET = 10000
+
+class ShantenBudgetExceeded(Exception):
+    pass
+
+class WorkBudget:
+    """Counts the work done for the current hand, raising ShantenBudgetExceeded past the limit"""
+    __slots__ = ("limit", "spent", "active")
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.spent = 0
+        self.active = False
+    def start(self) -> None:
+        self.spent = 0
+        self.active = self.limit > 0
+    def stop(self) -> None:
+        self.active = False
+    def spend(self, amount: int = 1) -> None:
+        if self.active:
+            self.spent += amount
+            if self.spent > self.limit:
+                raise ShantenBudgetExceeded(f"spent {self.spent} out of {self.limit}")
+
+work_budget = WorkBudget(int(os.getenv("shanten_budget") or DEFAULT_SHANTEN_BUDGET))
+approximate_hands: Set[Tuple[int, ...]] = set()
+
+def to_counts(suit: Tuple[int, ...], length: int = 9) -> SuitCounts:
+    """Convert a sorted suit like (1,1,2,3) to its count vector (2,1,1,0,0,0,0,0,0)"""
+    counts = [0] * length
+    for tile in suit:
+        counts[tile-1] += 1
+    return tuple(counts)
+
+def from_counts(counts: SuitCounts) -> Tuple[int, ...]:
+    """Convert a count vector like (2,1,1,0,0,0,0,0,0) back into a sorted suit (1,1,2,3)"""
+    return tuple(i+1 for i, count in enumerate(counts) for _ in range(count))
+
+def _remove_counts(counts: SuitCounts, *ixs: int) -> SuitCounts:
+    ret = list(counts)
+    for i in ixs:
+        ret[i] -= 1
+    return tuple(ret)
+
+@functools.cache
+def _groupless_counts(counts: SuitCounts, is_honors: bool) -> FrozenSet[SuitCounts]:
+    """All the shapes reachable by removing groups until no more groups can be removed"""
+    candidates = [_remove_counts(counts, i, i, i) for i, count in enumerate(counts) if count >= 3]
+    if not is_honors:
+        candidates += [_remove_counts(counts, i, i+1, i+2) for i in range(7) if counts[i] and counts[i+1] and counts[i+2]]
+    if len(candidates) == 0:
+        return frozenset({counts})
+    return frozenset().union(*(_groupless_counts(c, is_honors) for c in candidates))
+
+@functools.cache
+def _min_floating_counts(counts: SuitCounts) -> Tuple[int, int]:
+    """
+    Remove any number of ryanmen/kanchan taatsus from a groupless shape, and return
+    the fewest floating tiles left, and the fewest floating tiles left in a shape with a pair
+    """
+    floating = counts.count(1)
+    pair_floating = floating if 2 in counts else 99
+    for i in range(8):
+        for j in (i+1, i+2):
+            if j < 9 and counts[i] and counts[j]:
+                f, pf = _min_floating_counts(_remove_counts(counts, i, j))
+                floating, pair_floating = min(floating, f), min(pair_floating, pf)
+    return floating, pair_floating
+
+@functools.cache
+def get_suit_decomposition(counts: SuitCounts, is_honors: bool) -> SuitDecomposition:
+    """Look up (or compute once) the table entry for a single suit's count vector"""
+    dead_ends = _groupless_counts(counts, is_honors)
+    # only keep the shapes where we removed the most groups
+    min_length = min(map(sum, dead_ends))
+    groupless = frozenset(c for c in dead_ends if sum(c) == min_length)
+    groups = (sum(counts) - min_length) // 3
+    if is_honors:
+        # honors never form taatsus, and every groupless shape is the same
+        floating = min(c.count(1) for c in groupless)
+        pair_floating = min((c.count(1) for c in groupless if 2 in c), default=99)
+    else:
+        floating, pair_floating = map(min, zip(*map(_min_floating_counts, groupless)))
+    return groups, frozenset(map(from_counts, groupless)), floating, pair_floating
+
+HandCounts = Tuple[SuitCounts, SuitCounts, SuitCounts, SuitCounts]
+# (counts for each suit, decomposition for each suit), kept by Hand for incremental updates
+ShantenState = Tuple[HandCounts, Tuple[SuitDecomposition, ...]]
+
+def get_hand_counts(hand: Iterable[int]) -> HandCounts:
+    """Get the count vector of each suit (man, pin, sou, honors) for a normalized hand"""
+    counts: List[List[int]] = [[0]*9, [0]*9, [0]*9, [0]*7]
+    for tile in hand:
+        counts[tile//10 - 1][tile%10 - 1] += 1
+    return tuple(map(tuple, counts)) # type: ignore[return-value]
+
+def combine_suit_decompositions(num_tiles: int, decompositions: Tuple[SuitDecomposition, ...]) -> Tuple[int, Suits, int]:
+    """
+    Given the decomposition of every suit of a `num_tiles` tile hand, return
+    (shanten, groupless hands, groups needed) just like `get_table_shanten`
+    """
+    groups_needed = (num_tiles - 3 * sum(d[0] for d in decompositions) - 1) // 3
+    total_floating = sum(d[2] for d in decompositions)
+    def get_shanten(total_floating: int, pair_exists: bool) -> int:
+        # same formula as in get_hand_shanten
+        needs_pair = 1 if not pair_exists and groups_needed > total_floating else 0
+        must_discard_taatsu = 1 if groups_needed >= 3 and total_floating <= 1 else 0
+        return needs_pair + must_discard_taatsu + (groups_needed + total_floating - 1) // 2
+    shanten = get_shanten(total_floating, False)
+    extra_floating = min(d[3] - d[2] for d in decompositions)
+    if extra_floating < 50:
+        shanten = min(shanten, get_shanten(total_floating + extra_floating, True))
+    groupless_hands: Suits = tuple(set(d[1]) for d in decompositions)
+    return shanten, groupless_hands, groups_needed
+
+def get_table_shanten(hand: Tuple[int, ...]) -> Tuple[int, Suits, int]:
+    """
+    Table engine equivalent of `eliminate_all_groups` followed by `get_hand_shanten`.
+    Returns (shanten, groupless hands, groups needed)
+    """
+    return combine_suit_decompositions(len(hand), get_shanten_state(hand)[1])
+
+def get_shanten_state(hand: Iterable[int]) -> ShantenState:
+    """Get the per-suit counts and decompositions of a normalized hand"""
+    counts = get_hand_counts(hand)
+    return counts, tuple(get_suit_decomposition(c, i == 3) for i, c in enumerate(counts))
+
+def update_shanten_state(state: ShantenState, tile: int, delta: int) -> ShantenState:
+    """Add `delta` copies of `tile` to the hand described by `state`, redoing only that tile's suit"""
+    counts, decompositions = state
+    tile = normalize_red_five(tile)
+    suit, ix = tile//10 - 1, tile%10 - 1
+    suit_counts = (*counts[suit][:ix], counts[suit][ix] + delta, *counts[suit][ix+1:])
+    new_counts: HandCounts = (*counts[:suit], suit_counts, *counts[suit+1:]) # type: ignore[assignment]
+    new_decompositions = (*decompositions[:suit], get_suit_decomposition(suit_counts, suit == 3), *decompositions[suit+1:])
+    return new_counts, new_decompositions
+
 # when the wait is any tile except the ones we have a pair of already
 # e.g. tenpai with one triplet
 # e.g. iishanten with two triplets
@@ -157,56 +402,53 @@ def calculate_kokushi_shanten(starting_hand: Tuple[int, ...], ctr: Counter[int])
     waits = () if shanten > 1 else sorted_hand(YAOCHUUHAI if not has_pair else YAOCHUUHAI.difference(starting_hand))
     return shanten, waits
 
-# Caches for removing pairs or complex shapes from a given suit
+# Tables for removing pairs or complex shapes from a given suit
+# Whether a suit contains a given pair or complex shape only depends on the counts
+#   of the tiles in that shape, so we precompute the shapes starting at each tile
+#   along with the counts they need. Looking up a suit is then just a comparison
+#   against each candidate shape, cached with a fixed size.
 
-# pair_shapes[shape] = {(pair, shape without pair), ...}
-pair_shapes: Dict[Tuple[int, ...], Set[Tuple[Tuple[int, ...], Tuple[int, ...]]]] = {}
-# complex_shapes[shape] = {(complex shape, shape without complex shape), ...}
-complex_shapes: Dict[Tuple[int, ...], Set[Tuple[Tuple[int, ...], Tuple[int, ...]]]] = {}
+ShapeRemovals = FrozenSet[Tuple[Tuple[int, ...], Tuple[int, ...]]]
 
-def add_pair_shape(hand: Tuple[int, ...], recursed: bool = False) -> None:
-    """Used to add an entry to pair_shapes"""
-    global pair_shapes
-    pair_shapes.setdefault(hand, set())
-    for tile in hand:
-        if hand.count(tile) >= 2:
-            ix = hand.index(tile)
-            pair = hand[ix:ix+2]
-            remaining_hand = (*hand[:ix], *hand[ix+2:])
-            pair_shapes[hand].add((pair, remaining_hand))
-            if not recursed:
-                add_complex_shape(remaining_hand, recursed=True)
-                add_pair_shape(remaining_hand, recursed=True)
-
-def add_complex_shape(hand: Tuple[int, ...], recursed: bool = False) -> None:
-    """Used to add an entry to complex_shapes"""
-    global complex_shapes
-    complex_shapes.setdefault(hand, set())
-    for tile in hand[:-2]:
-        to_complex_shapes = lambda t1: (t2:=t1+1, t3:=t1+2, t5:=t1+4, ((t1,t1,t2),(t1,t2,t2),(t1,t1,t3),(t1,t3,t3),(t1,t3,t5)))[-1]
-        for shape in to_complex_shapes(tile):
-            remaining_hand = try_remove_all_tiles(hand, shape)
-            if len(remaining_hand) < len(hand):
-                complex_shapes[hand].add((shape, remaining_hand))
-                if True: # we want multiple complex shapes; no need to stop when recursed once
-                    add_complex_shape(remaining_hand, recursed=True)
-                    add_pair_shape(remaining_hand, recursed=True)
+# PAIR_SHAPES_AT[tile] = ((pair, counts needed for the pair),)
+PAIR_SHAPES_AT: Tuple[Tuple[Tuple[Tuple[int, ...], SuitCounts], ...], ...] = \
+    ((),) + tuple((((t,t), to_counts((t,t))),) for t in range(1, 10))
+# COMPLEX_SHAPES_AT[tile] = ((complex shape, counts needed for the complex shape), ...)
+# complex shapes are 112, 122, 113, 133, 135 (relative to the starting tile)
+COMPLEX_SHAPES_AT: Tuple[Tuple[Tuple[Tuple[int, ...], SuitCounts], ...], ...] = \
+    ((),) + tuple(tuple((shape, to_counts(shape))
+                        for shape in ((t,t,t+1),(t,t+1,t+1),(t,t,t+2),(t,t+2,t+2),(t,t+2,t+4))
+                        if shape[-1] <= 9)
+                  for t in range(1, 10))
+
+def _get_shape_removals(hand: Tuple[int, ...], shapes_at: Tuple[Tuple[Tuple[Tuple[int, ...], SuitCounts], ...], ...]) -> ShapeRemovals:
+    counts = to_counts(hand)
+    return frozenset((shape, from_counts(tuple(c - n for c, n in zip(counts, needed))))
+                     for tile in set(hand)
+                     for shape, needed in shapes_at[tile]
+                     if all(c >= n for c, n in zip(counts, needed)))
+
+@functools.lru_cache(maxsize=32768)
+def get_pair_shapes(hand: Tuple[int, ...]) -> ShapeRemovals:
+    """Return {(pair, shape without pair), ...} for a single suit"""
+    return _get_shape_removals(hand, PAIR_SHAPES_AT)
+
+@functools.lru_cache(maxsize=32768)
+def get_complex_shapes(hand: Tuple[int, ...]) -> ShapeRemovals:
+    """Return {(complex shape, shape without complex shape), ...} for a single (non-honor) suit"""
+    return _get_shape_removals(hand, COMPLEX_SHAPES_AT)
 
 def identify_pairs_and_complex(suits: Suits) -> Tuple[Suits, Suits]:
-    global pair_shapes
-    global complex_shapes
     pair_hands: Suits = (set(()),set(()),set(()),set(()))
     complex_hands: Suits = (set(()),set(()),set(()),set(()))
     for i, suit in enumerate(suits):
         for hand in suit:
             # check if there's a pair
-            add_pair_shape(hand)
-            if len(pair_shapes[hand]) > 0:
+            if len(get_pair_shapes(hand)) > 0:
                 pair_hands[i].add(hand)
             if i < 3:
                 # check if there's any complex shapes
-                add_complex_shape(hand)
-                if len(complex_shapes[hand]) > 0:
+                if len(get_complex_shapes(hand)) > 0:
                     complex_hands[i].add(hand)
     return pair_hands, complex_hands
 
@@ -218,62 +460,82 @@ def get_other_tiles(hand_size: int, suits: Suits,
     # such that adding them to (*hand, *hand2) makes it length == hand_size
     # i is the suit for hand1, j is the suit for hand2, k is the suit for hand3
     # i/j/k = -1 means to ignore hand1/hand2/hand3 argument
-    return ((*(tuple(10+tile for tile in a) if 0 not in (i,j,k) else ()),
-             *(tuple(20+tile for tile in b) if 1 not in (i,j,k) else ()),
-             *(tuple(30+tile for tile in c) if 2 not in (i,j,k) else ()),
-             *(tuple(40+tile for tile in d) if 3 not in (i,j,k) else ()))
-            for a in ({hand1} if i == 0 else {hand2} if j == 0 else {hand3} if k == 0 else suits[0])
-            for b in ({hand1} if i == 1 else {hand2} if j == 1 else {hand3} if k == 0 else suits[1])
-            for c in ({hand1} if i == 2 else {hand2} if j == 2 else {hand3} if k == 0 else suits[2])
-            for d in ({hand1} if i == 3 else {hand2} if j == 3 else {hand3} if k == 0 else suits[3])
-            if len(a)+len(b)+len(c)+len(d) == hand_size)
-
-def extract_unique_groups(groups: Tuple[int, ...]) -> Tuple[List[Tuple[int, int, int]], List[Tuple[int, int, int]]]:
+    # rather than taking the cross product of every suit and filtering by length,
+    #   group each suit's hands by length, and only combine lengths that can add up to hand_size
+    choices: List[Dict[int, Set[Tuple[int, ...]]]] = []
+    for suit in range(4):
+        hands = {hand1} if i == suit else {hand2} if j == suit else {hand3} if k == 0 else suits[suit]
+        by_length: Dict[int, Set[Tuple[int, ...]]] = {}
+        for hand in hands:
+            # the hands for suits i/j/k only count towards the length
+            by_length.setdefault(len(hand), set()).add(() if suit in (i,j,k) else tuple(10*(suit+1)+tile for tile in hand))
+        choices.append(by_length)
+    # min/max length of the tiles from suits s..3
+    min_length = [0] * 5
+    max_length = [0] * 5
+    for suit in reversed(range(4)):
+        min_length[suit] = min(choices[suit].keys(), default=0) + min_length[suit+1]
+        max_length[suit] = max(choices[suit].keys(), default=0) + max_length[suit+1]
+    def combine(suit: int, length: int, tiles: Tuple[int, ...]) -> Iterator[Tuple[int, ...]]:
+        if suit == 4:
+            work_budget.spend()
+            yield tiles
+            return
+        for suit_length, suit_hands in choices[suit].items():
+            if length + suit_length + min_length[suit+1] <= hand_size <= length + suit_length + max_length[suit+1]:
+                for hand in suit_hands:
+                    yield from combine(suit+1, length + suit_length, (*tiles, *hand))
+    if any(len(by_length) == 0 for by_length in choices):
+        return iter(())
+    return combine(0, 0, ())
+
+@functools.lru_cache(maxsize=4096)
+def extract_unique_groups(groups: Tuple[int, ...]) -> Tuple[FrozenSet[Tuple[int, int, int]], FrozenSet[Tuple[int, int, int]]]:
     sequences: List[Tuple[int, ...]] = []
     triplets: List[Tuple[int, ...]] = []
-    for interpretation in Interpretation((*groups, 1)).generate_all_interpretations():
+    for interpretation in generate_all_interpretations((*groups, 1)):
         sequences.extend(list(interpretation.sequences))
         triplets.extend(list(interpretation.triplets))
-    return cast(List[Tuple[int, int, int]], list(set(sequences))), \
-           cast(List[Tuple[int, int, int]], list(set(triplets)))
+    return cast(FrozenSet[Tuple[int, int, int]], frozenset(sequences)), \
+           cast(FrozenSet[Tuple[int, int, int]], frozenset(triplets))
 
-to_sequence = lambda tile: (tile, SUCC[tile], SUCC[SUCC[tile]])
+to_sequence = lambda tile: (tile, SUCC[tile], SUCC2[tile])
 to_triplet = lambda tile: (tile, tile, tile)
 def calculate_wait_extensions(groups: Tuple[int, ...], waits: Set[int]) -> List[Tuple[Set[int], int, Tuple[int, int, int]]]:
     sequences, triplets = extract_unique_groups(groups)
     # only sequence extensions apply
     left_extensions = []
-    left_extensions.extend([({PRED[PRED[PRED[tile]]]}, tile, to_sequence(PRED[PRED[tile]])) for tile in waits if PRED[PRED[PRED[tile]]] != 0 if to_sequence(PRED[PRED[tile]]) in sequences])
-    left_extensions.extend([({PRED[PRED[PRED[tile]]]}, SUCC[SUCC[SUCC[tile]]], to_sequence(PRED[PRED[tile]])) for ([tile], _, _) in left_extensions if PRED[PRED[PRED[tile]]] != 0 if to_sequence(PRED[PRED[tile]]) in sequences])
+    left_extensions.extend([({PRED3[tile]}, tile, to_sequence(PRED2[tile])) for tile in waits if PRED3[tile] != 0 if to_sequence(PRED2[tile]) in sequences])
+    left_extensions.extend([({PRED3[tile]}, SUCC3[tile], to_sequence(PRED2[tile])) for ([tile], _, _) in left_extensions if PRED3[tile] != 0 if to_sequence(PRED2[tile]) in sequences])
     right_extensions = []
-    right_extensions.extend([({SUCC[SUCC[SUCC[tile]]]}, tile, to_sequence(tile)) for tile in waits if SUCC[SUCC[SUCC[tile]]] != 0 if to_sequence(tile) in sequences])
-    right_extensions.extend([({SUCC[SUCC[SUCC[tile]]]}, PRED[PRED[PRED[tile]]], to_sequence(tile)) for ([tile], _, _) in right_extensions if SUCC[SUCC[SUCC[tile]]] != 0 if to_sequence(tile) in sequences])
+    right_extensions.extend([({SUCC3[tile]}, tile, to_sequence(tile)) for tile in waits if SUCC3[tile] != 0 if to_sequence(tile) in sequences])
+    right_extensions.extend([({SUCC3[tile]}, PRED3[tile], to_sequence(tile)) for ([tile], _, _) in right_extensions if SUCC3[tile] != 0 if to_sequence(tile) in sequences])
     return left_extensions + right_extensions
 
 def calculate_tanki_wait_extensions(groups: Tuple[int, ...], waits: Set[int]) -> List[Tuple[Set[int], int, Tuple[int, int, int]]]:
     sequences, triplets = extract_unique_groups(groups)
     # sequence extensions
     left_extensions = []
-    left_extensions.extend([({PRED[PRED[PRED[tile]]]}, tile, to_sequence(PRED[PRED[tile]])) for tile in waits if PRED[PRED[PRED[tile]]] != 0 if to_sequence(PRED[PRED[tile]]) in sequences])
-    left_extensions.extend([({PRED[PRED[PRED[tile]]]}, SUCC[SUCC[SUCC[tile]]], to_sequence(PRED[PRED[tile]])) for ([tile], _, _) in left_extensions if PRED[PRED[PRED[tile]]] != 0 if to_sequence(PRED[PRED[tile]]) in sequences])
+    left_extensions.extend([({PRED3[tile]}, tile, to_sequence(PRED2[tile])) for tile in waits if PRED3[tile] != 0 if to_sequence(PRED2[tile]) in sequences])
+    left_extensions.extend([({PRED3[tile]}, SUCC3[tile], to_sequence(PRED2[tile])) for ([tile], _, _) in left_extensions if PRED3[tile] != 0 if to_sequence(PRED2[tile]) in sequences])
     left_adj_extensions = []
-    left_adj_extensions.extend([({PRED[PRED[PRED[tile]]]}, tile, to_sequence(PRED[PRED[PRED[tile]]])) for tile in waits if PRED[PRED[PRED[tile]]] != 0 if to_sequence(PRED[PRED[PRED[tile]]]) in sequences])
-    left_adj_extensions.extend([({PRED[PRED[PRED[tile]]]}, SUCC[SUCC[SUCC[tile]]], to_sequence(PRED[PRED[PRED[tile]]])) for ([tile], _, _) in left_adj_extensions if PRED[PRED[PRED[tile]]] != 0 if to_sequence(PRED[PRED[PRED[tile]]]) in sequences])
+    left_adj_extensions.extend([({PRED3[tile]}, tile, to_sequence(PRED3[tile])) for tile in waits if PRED3[tile] != 0 if to_sequence(PRED3[tile]) in sequences])
+    left_adj_extensions.extend([({PRED3[tile]}, SUCC3[tile], to_sequence(PRED3[tile])) for ([tile], _, _) in left_adj_extensions if PRED3[tile] != 0 if to_sequence(PRED3[tile]) in sequences])
     right_extensions = []
-    right_extensions.extend([({SUCC[SUCC[SUCC[tile]]]}, tile, to_sequence(tile)) for tile in waits if SUCC[SUCC[SUCC[tile]]] != 0 if to_sequence(tile) in sequences])
-    right_extensions.extend([({SUCC[SUCC[SUCC[tile]]]}, PRED[PRED[PRED[tile]]], to_sequence(tile)) for ([tile], _, _) in right_extensions if SUCC[SUCC[SUCC[tile]]] != 0 if to_sequence(tile) in sequences])
+    right_extensions.extend([({SUCC3[tile]}, tile, to_sequence(tile)) for tile in waits if SUCC3[tile] != 0 if to_sequence(tile) in sequences])
+    right_extensions.extend([({SUCC3[tile]}, PRED3[tile], to_sequence(tile)) for ([tile], _, _) in right_extensions if SUCC3[tile] != 0 if to_sequence(tile) in sequences])
     right_adj_extensions = []
-    right_adj_extensions.extend([({SUCC[SUCC[SUCC[tile]]]}, tile, to_sequence(SUCC[tile])) for tile in waits if SUCC[SUCC[SUCC[tile]]] != 0 if to_sequence(SUCC[tile]) in sequences])
-    right_adj_extensions.extend([({SUCC[SUCC[SUCC[tile]]]}, PRED[PRED[PRED[tile]]], to_sequence(SUCC[tile])) for ([tile], _, _) in right_adj_extensions if SUCC[SUCC[SUCC[tile]]] != 0 if to_sequence(SUCC[tile]) in sequences])
+    right_adj_extensions.extend([({SUCC3[tile]}, tile, to_sequence(SUCC[tile])) for tile in waits if SUCC3[tile] != 0 if to_sequence(SUCC[tile]) in sequences])
+    right_adj_extensions.extend([({SUCC3[tile]}, PRED3[tile], to_sequence(SUCC[tile])) for ([tile], _, _) in right_adj_extensions if SUCC3[tile] != 0 if to_sequence(SUCC[tile]) in sequences])
     # triplet extensions
     triplet_extensions = []
     for tile in waits:
         # 3335, 4445, 5666, 5777
         possible_triplet_extensions = [
-            ({PRED[tile]}, to_triplet(PRED[PRED[tile]])),
-            ({PRED[PRED[tile]], SUCC[tile]}, to_triplet(PRED[tile])),
-            ({PRED[tile], SUCC[SUCC[tile]]}, to_triplet(SUCC[tile])),
-            ({SUCC[tile]}, to_triplet(SUCC[SUCC[tile]])),
+            ({PRED[tile]}, to_triplet(PRED2[tile])),
+            ({PRED2[tile], SUCC[tile]}, to_triplet(PRED[tile])),
+            ({PRED[tile], SUCC2[tile]}, to_triplet(SUCC[tile])),
+            ({SUCC[tile]}, to_triplet(SUCC2[tile])),
         ]
         for tiles, triplet in possible_triplet_extensions:
             tiles = set(tile for tile in tiles if tile > 0)
@@ -321,12 +583,19 @@ def determine_kuttsuki_headless_tiles(shanten_int: int, groups_needed: int, grou
         headless_tiles = set()
     return kuttsuki_tiles, headless_tiles, pair_tiles
 
-def get_headless_taatsus_waits(headless_tiles: Iterable[int]) -> Tuple[Tuple[Tuple[int, int], ...], Set[int], Tuple[int, ...]]:
-    tiles_list: List[int] = list(sorted(headless_tiles))
+def get_headless_taatsus_waits(headless_tiles: Iterable[int]) -> Tuple[Tuple[Tuple[int, int], ...], FrozenSet[int], Tuple[int, ...]]:
+    result, work = _get_headless_taatsus_waits(tuple(sorted(headless_tiles)))
+    work_budget.spend(work) # (even if cached, see `work_budget`)
+    return result
+
+@functools.lru_cache(maxsize=16384)
+def _get_headless_taatsus_waits(tiles_tuple: Tuple[int, ...]) -> Tuple[Tuple[Tuple[Tuple[int, int], ...], FrozenSet[int], Tuple[int, ...]], int]:
+    tiles_list: List[int] = list(tiles_tuple)
     taatsus: Set[Tuple[int, int]] = set()
     floating_tiles: Tuple[int, ...] = ()
     added_as_taatsu: List[bool] = [False] * len(tiles_list)
-    tile_possibilities: Set[Tuple[int, ...]] = {tuple(tiles_list)} | set(from_suits(eliminate_all_groups(to_suits(tuple(tiles_list)))))
+    groupless_hands, work = count_eliminate_from_suits(to_suits(tuple(tiles_list)), False, to_sequences, 3)
+    tile_possibilities: Set[Tuple[int, ...]] = {tuple(tiles_list)} | set(from_suits(groupless_hands))
     tiles = [0]
     for t in tile_possibilities:
         tiles.extend([*t, 0])
@@ -335,13 +604,13 @@ def get_headless_taatsus_waits(headless_tiles: Iterable[int]) -> Tuple[Tuple[Tup
             continue
         is_pair = t2 == t1
         is_ryanmen = t2 == SUCC[t1]
-        is_kanchan = t2 == SUCC[SUCC[t1]]
+        is_kanchan = t2 == SUCC2[t1]
         if is_ryanmen and (PRED[t1] in tiles[1:-1] or SUCC[t2] in tiles[1:-1]):
             # skip sequences (they should not be passed in, but we use this function for non-headless hands too)
             continue
         pair_side = l != 0 and r != 0 and (t1 == l or r == t2)
         ryanmen_side = l != 0 and r != 0 and (t1 == SUCC[l] or r == SUCC[t2])
-        kanchan_side = l != 0 and r != 0 and (t1 == SUCC[SUCC[l]] or r == SUCC[SUCC[t2]])
+        kanchan_side = l != 0 and r != 0 and (t1 == SUCC2[l] or r == SUCC2[t2])
         # we ignore kanchans if there is a ryanmen on either side that would provide the same wait
         ignore_kanchan = ryanmen_side
         # we ignore pairs if it's a triplet, or if there is a kanchan/ryanmen on either side
@@ -356,19 +625,19 @@ def get_headless_taatsus_waits(headless_tiles: Iterable[int]) -> Tuple[Tuple[Tup
         if not in_taatsu:
             floating_tiles = (*floating_tiles, tile)
     waits = set().union(*map(get_taatsu_wait, taatsus))
-    return tuple(sorted(taatsus)), waits, tuple(sorted(floating_tiles))
+    return (tuple(sorted(taatsus)), frozenset(waits), tuple(sorted(floating_tiles))), work
 
-def get_taatsus_waits(hand: Iterable[int]) -> Iterator[Tuple[Tuple[Tuple[int, int], ...], Set[int], Tuple[int, ...]]]:
+def get_taatsus_waits(hand: Iterable[int]) -> Iterator[Tuple[Tuple[Tuple[int, int], ...], AbstractSet[int], Tuple[int, ...]]]:
     # get all possible taatsu waits, including pair waits
     tiles: Tuple[int, ...] = tuple(sorted(hand))
     for tile, amt in Counter(tiles).items():
         if amt >= 2:
             pair = (tile, tile)
-            remaining = try_remove_all_tiles(tiles, pair)
+            remaining = remove_all_tiles(tiles, pair)
             assert len(remaining) < len(tiles)
             for taatsus, waits, floating_tiles in get_taatsus_waits(remaining):
                 taatsus = (*taatsus, pair)
-                waits = waits.copy() | {tile}
+                waits = waits | {tile} # (makes a new set)
                 yield taatsus, waits, floating_tiles
     yield get_headless_taatsus_waits(tiles)
 
@@ -422,12 +691,12 @@ def get_shanten_type(shanten_int: int, starting_hand: Tuple[int, ...], groupless
             is_headless_or_kutsuki = True
             # for each kuttsuki tile, its waits are {tile-2,tile-1,tile,tile+1,tile+2}
             for tile in kuttsuki_tiles:
-                kuttsuki_tanki_waits |= {PRED[PRED[tile]], PRED[tile], tile, SUCC[tile], SUCC[SUCC[tile]]} - {0}
+                kuttsuki_tanki_waits |= {PRED2[tile], PRED[tile], tile, SUCC[tile], SUCC2[tile]} - {0}
             # the pair tile also contributes to the wait
             waits |= kuttsuki_pair_tiles
             # so do the waits of the remaining taatsu
             for hand in from_suits(groupless_hands):
-                remaining = try_remove_all_tiles(hand, tuple([*kuttsuki_tiles, *kuttsuki_pair_tiles, *kuttsuki_pair_tiles]))
+                remaining = remove_all_tiles(hand, tuple([*kuttsuki_tiles, *kuttsuki_pair_tiles, *kuttsuki_pair_tiles]))
                 taatsus, taatsu_waits, floating_tiles = get_headless_taatsus_waits(remaining)
                 kuttsuki_taatsus |= set(taatsus)
                 kuttsuki_taatsu_waits |= taatsu_waits
@@ -451,7 +720,7 @@ def get_shanten_type(shanten_int: int, starting_hand: Tuple[int, ...], groupless
             #   so all six of the taatsu tiles are tanki waits
             taatsus, headless_taatsu_waits, floating_tiles = get_headless_taatsus_waits(headless_tiles)
             headless_tanki_waits = headless_tiles if len(taatsus) >= shanten_int+1 else set(floating_tiles)
-            extensions = calculate_tanki_wait_extensions(try_remove_all_tiles(starting_hand, tuple(headless_tiles)), headless_tanki_waits)
+            extensions = calculate_tanki_wait_extensions(remove_all_tiles(starting_hand, tuple(headless_tiles)), headless_tanki_waits)
             extended_waits = set(wait for waits, _, _ in extensions for wait in waits)
             waits |= headless_taatsu_waits | headless_tanki_waits | extended_waits
             debug_info["headless_taatsus"] = taatsus
@@ -466,6 +735,7 @@ def get_shanten_type(shanten_int: int, starting_hand: Tuple[int, ...], groupless
     has_complete_hand = False
     has_floating_hand = False
     debug_info["simple_hands"] = []
+    added_hands: Set[Tuple[Tuple[int, ...], Tuple[int, ...], Tuple[int, ...]]] = set()
     def add_hand(complex_hand: Tuple[int, ...], pair_shape: Tuple[int, ...], other_tiles: Tuple[int, ...]) -> None:
         # populate complete_waits with all possible complex waits arising from this breakdown of the hand
         nonlocal waits
@@ -473,6 +743,11 @@ def get_shanten_type(shanten_int: int, starting_hand: Tuple[int, ...], groupless
         nonlocal has_complete_hand
         nonlocal has_floating_hand
         nonlocal debug_info
+        work_budget.spend()
+        # the loops below can produce the same breakdown more than once, which wouldn't change anything
+        if (complex_hand, pair_shape, other_tiles) in added_hands:
+            return
+        added_hands.add((complex_hand, pair_shape, other_tiles))
         is_pair = lambda h: len(h) == 2 and h[0] == h[1]
         is_ryanmen = lambda h: len(h) == 2 and SUCC[h[0]] == h[1] and h[0] not in {11,18,21,28,31,38}
         h = (*complex_hand, *pair_shape, *other_tiles)
@@ -487,7 +762,7 @@ def get_shanten_type(shanten_int: int, starting_hand: Tuple[int, ...], groupless
                 queue.remove(empty_hand)
             while len(queue) > 0:
                 cx_hand, all_cx_shapes = queue.pop()
-                removed = complex_shapes.get(cx_hand, set())
+                removed = get_complex_shapes(cx_hand)
                 if len(removed) == 0:
                     remaining_tiles = (*add_i(cx_hand), *other_tiles)
                     for taatsus, taatsu_waits, floating in get_taatsus_waits(remaining_tiles):
@@ -524,7 +799,7 @@ def get_shanten_type(shanten_int: int, starting_hand: Tuple[int, ...], groupless
                 has_floating_hand = True
 
             # calculate wait extensions
-            extensions = calculate_wait_extensions(try_remove_all_tiles(starting_hand, h), simple_waits | complex_waits)
+            extensions = calculate_wait_extensions(remove_all_tiles(starting_hand, h), simple_waits | complex_waits)
             extended_waits = set(wait for waits, _, _ in extensions for wait in waits)
             waits |= simple_waits | complex_waits | extended_waits
             debug_info["simple_hands"].append({
@@ -548,7 +823,7 @@ def get_shanten_type(shanten_int: int, starting_hand: Tuple[int, ...], groupless
     for i, suit in enumerate(pair_hands):
         add_i = lambda h: tuple(10*(i+1)+tile for tile in h)
         for pair_hand in suit:
-            for pair_shape, remaining in pair_shapes[pair_hand]:
+            for pair_shape, remaining in get_pair_shapes(pair_hand):
                 # check if we broke a set for this pair shape
                 pair_broke_set = pair_hand not in groupless_suits[i]
                 # if we broke a set and don't have enough sets originally
@@ -567,11 +842,13 @@ def get_shanten_type(shanten_int: int, starting_hand: Tuple[int, ...], groupless
                     # remove the maximum number of groups
                     groupless_complex_suits = tuple({hand for hand in suit if len(hand) == min(map(len, suit))} for suit in eliminate_all_groups(complex_suits))
                     for j, suit2 in enumerate(complex_suits):
-                        queue: Set[Any] = suit2.copy()
+                        # (this used to be a queue that also got (tiles, remaining) pairs,
+                        #  but those never had an entry in complex_shapes, so only the
+                        #  shapes initially in the suit ever get checked)
+                        shapes_to_check = suit2.copy()
                         suit2.clear()
-                        while len(queue) > 0:
-                            tiles = queue.pop()
-                            for complex_shape, remaining2 in complex_shapes.get(tiles, set()):
+                        for tiles in shapes_to_check:
+                            for complex_shape, remaining2 in get_complex_shapes(tiles):
                                 # check if we broke a set for this complex shape
                                 cx_broke_set = tiles not in groupless_complex_suits[j]
                                 # if i != j:
@@ -586,7 +863,6 @@ def get_shanten_type(shanten_int: int, starting_hand: Tuple[int, ...], groupless
                                     continue
                                 # print(pair_hand, tiles, pair_shape, complex_shape)
                                 suit2.add(tiles)
-                                queue.add((tiles, remaining2))
                     # print(i, complex_suits)
 
                     all_complex_shapes: List[List[Tuple[int, ...]]] = []
@@ -628,7 +904,58 @@ def get_shanten_type(shanten_int: int, starting_hand: Tuple[int, ...], groupless
 
 #     return round(shanten, 3), waits, debug_info
 
-@functools.lru_cache(maxsize=65536)
+def get_standard_shanten(starting_hand: Tuple[int, ...]) -> Tuple[int, Suits, int]:
+    """
+    Return the integer shanten of the hand ignoring chiitoitsu and kokushi,
+    plus the groupless hands and number of groups needed (used to get the iishanten type)
+    """
+    if shanten_engine == "table":
+        shanten_int, groupless_hands, groups_needed = get_table_shanten(starting_hand)
+    else:
+        suits = to_suits(starting_hand)
+        groupless_hands = eliminate_all_groups(suits)
+        groups_needed = (len(next(from_suits(groupless_hands))) - 1) // 3
+
+        # calculate shanten for every combination of groups removed
+        removed_taatsus = eliminate_some_taatsus(groupless_hands)
+        shanten_int = get_hand_shanten(removed_taatsus, groups_needed)
+    return shanten_int, groupless_hands, groups_needed
+
+def get_fallback_iishanten_waits(starting_hand: Tuple[int, ...]) -> Set[int]:
+    """
+    Return every tile that brings a (standard) iishanten hand to tenpai, using just the
+    shanten number after each draw and discard. Used when get_shanten_type is over budget.
+    """
+    state = get_shanten_state(starting_hand)
+    waits = set()
+    for tile in TANYAOHAI | YAOCHUUHAI:
+        if starting_hand.count(tile) == 4:
+            continue
+        drawn = update_shanten_state(state, tile, 1)
+        if any(combine_suit_decompositions(len(starting_hand), update_shanten_state(drawn, discard, -1)[1])[0] == 0
+               for discard in set(starting_hand)):
+            waits.add(tile)
+    return waits
+
+def record_approximate_hand(starting_hand: Tuple[int, ...]) -> None:
+    """Remember a hand whose shanten type was over budget (see `work_budget`)"""
+    approximate_hands.add(starting_hand)
+    if os.getenv("shanten_budget_log"):
+        with open(os.getenv("shanten_budget_log", ""), "a") as file:
+            file.write(f"{starting_hand!r}\n")
+
+def is_approximate_shanten(starting_hand: Iterable[int]) -> bool:
+    """Whether the shanten type and waits of this hand were approximated (see `work_budget`)"""
+    return tuple(sorted(normalize_red_fives(starting_hand))) in approximate_hands
+
+def set_shanten_budget(limit: int) -> None:
+    """Change the work budget for a single hand (0 means no limit), clearing any results that depended on it"""
+    work_budget.limit = limit
+    approximate_hands.clear()
+    _calculate_shanten.cache_clear()
+    _calculate_shanten_number.cache_clear()
+
+@packed_hand_cache(maxsize=65536)
 def _calculate_shanten(starting_hand: Tuple[int, ...]) -> Shanten:
     """
     Return the shanten of the hand, plus its waits (if tenpai or iishanten).
@@ -643,21 +970,18 @@ def _calculate_shanten(starting_hand: Tuple[int, ...]) -> Shanten:
     # 4. If iishanten or tenpai, calculate the waits
     # 5. Do 2-4 for chiitoitsu and kokushi
 
-    suits = to_suits(starting_hand)
-    start_time = now = time.time()
-    groupless_hands = eliminate_all_groups(suits)
-    timers["calculate_hands"] += time.time() - now
-    groups_needed = (len(next(from_suits(groupless_hands))) - 1) // 3
-
-    # calculate shanten for every combination of groups removed
-    now = time.time()
-    removed_taatsus = eliminate_some_taatsus(groupless_hands)
-    timers["remove_some_taatsus"] += time.time() - now
-
-    now = time.time()
-    shanten_int: int = get_hand_shanten(removed_taatsus, groups_needed)
+    if chinitsu_table is not None and starting_hand[0]//10 == starting_hand[-1]//10 != 4:
+        return chinitsu_table.get(starting_hand)
+    if shanten_cache is not None:
+        cached = shanten_cache.get(starting_hand)
+        if cached is not None:
+            return cached
+    if shared_shanten_cache is not None:
+        cached = shared_shanten_cache.get(starting_hand)
+        if cached is not None:
+            return cached
+    shanten_int, groupless_hands, groups_needed = get_standard_shanten(starting_hand)
     shanten: float = float(shanten_int)
-    timers["get_hand_shanten"] += time.time() - now
     assert shanten >= 0, f"somehow calculated negative shanten for {ph(sorted_hand(starting_hand))}"
 
     # if iishanten, get the type of iishanten based on tiles remaining after removing some number of taatsus
@@ -665,16 +989,19 @@ def _calculate_shanten(starting_hand: Tuple[int, ...]) -> Shanten:
     waits: Set[int] = set()
     if shanten == 1:
         assert groups_needed in {1,2}, f"{ph(sorted_hand(starting_hand))} is somehow iishanten with {4-groups_needed} groups"
-        now = time.time()
-        shanten, waits, _ = get_shanten_type(shanten_int, starting_hand, groupless_hands, groups_needed)
-        timers["get_shanten_type"] += time.time() - now
+        work_budget.start()
+        try:
+            shanten, waits, _ = get_shanten_type(shanten_int, starting_hand, groupless_hands, groups_needed)
+        except ShantenBudgetExceeded:
+            shanten, waits = 1.0, get_fallback_iishanten_waits(starting_hand)
+            record_approximate_hand(starting_hand)
+        finally:
+            work_budget.stop()
         # assert shanten != 1, f"somehow failed to detect type of iishanten for iishanten hand {ph(sorted_hand(starting_hand))}"
 
     # if tenpai, get the waits
     elif shanten == 0:
-        now = time.time()
         waits = get_tenpai_waits(starting_hand)
-        timers["get_tenpai_waits"] += time.time() - now
         assert len(waits) > 0, f"tenpai hand {ph(sorted_hand(starting_hand))} has no waits?"
 
     # compare with chiitoitsu and kokushi shanten
@@ -716,9 +1043,334 @@ def _calculate_shanten(starting_hand: Tuple[int, ...]) -> Shanten:
             waits = (TANYAOHAI | YAOCHUUHAI) - {k for k, v in ctr.items() if v >= 3}
 
     assert all(red not in waits for red in {51,52,53}), f"somehow returned a waits list with red five: {ph(sorted_hand(waits))}"
-    timers["total"] += time.time() - start_time
-    return round(shanten, 4), sorted_hand(waits)
+    result = round(shanten, 4), sorted_hand(waits)
+    if starting_hand not in approximate_hands:
+        if shanten_cache is not None:
+            shanten_cache.add(starting_hand, result)
+        if shared_shanten_cache is not None:
+            shared_shanten_cache.add(starting_hand, result)
+    return result
 
 def calculate_shanten(starting_hand: Iterable[int]) -> Shanten:
     """This just converts the input to a sorted tuple so it can be serialized as a cache key"""
     return _calculate_shanten(tuple(sorted(normalize_red_fives(starting_hand))))
+
+@packed_hand_cache(maxsize=65536)
+def _calculate_shanten_number(starting_hand: Tuple[int, ...]) -> int:
+    """
+    Return just the integer shanten of the hand, i.e. int(_calculate_shanten(hand)[0]),
+    without calculating the iishanten type or the waits.
+    """
+    assert len(starting_hand) in {1, 4, 7, 10, 13}, f"calculate_shanten_number() was passed a {len(starting_hand)} tile hand: {ph(starting_hand)}"
+    ctr = Counter(starting_hand)
+    # if we have all four of a tile, a tenpai or iishanten hand might only be waiting on
+    # that tile, which makes it tanki iishanten (1.3) instead. this needs the waits,
+    # so just do the full calculation (this is rare)
+    if 4 in ctr.values():
+        return int(_calculate_shanten(starting_hand)[0])
+    shanten, _, _ = get_standard_shanten(starting_hand)
+    if len(starting_hand) == 13:
+        shanten = min(shanten,
+                      int(calculate_chiitoitsu_shanten(starting_hand, ctr)[0]),
+                      int(calculate_kokushi_shanten(starting_hand, ctr)[0]))
+    return shanten
+
+def calculate_shanten_incremental(starting_hand: Tuple[int, ...], state: ShantenState) -> Shanten:
+    """
+    Same as `calculate_shanten`, but takes the hand's ShantenState (see `update_shanten_state`).
+    For 2+ shanten hands the result comes straight from the per-suit decompositions,
+    so we skip `_calculate_shanten` entirely. Otherwise we need the type and waits,
+    so this falls back to `calculate_shanten`.
+    """
+    if shanten_engine == "table":
+        shanten_int, _, _ = combine_suit_decompositions(len(starting_hand), state[1])
+        if shanten_int >= 2:
+            # compare with chiitoitsu and kokushi shanten, same as in _calculate_shanten
+            shanten: float = float(shanten_int)
+            if len(starting_hand) == 13:
+                ctr = Counter(normalize_red_fives(starting_hand))
+                c_shanten = calculate_chiitoitsu_shanten(starting_hand, ctr)[0]
+                k_shanten = calculate_kokushi_shanten(starting_hand, ctr)[0]
+                if c_shanten < 2 or k_shanten < 2:
+                    return calculate_shanten(starting_hand)
+                if c_shanten < shanten:
+                    shanten = c_shanten
+                if k_shanten < shanten:
+                    shanten = k_shanten
+            return round(shanten, 4), ()
+    return calculate_shanten(starting_hand)
+
+def calculate_shanten_number(starting_hand: Iterable[int]) -> int:
+    """Like `calculate_shanten`, but returns only the integer shanten (no iishanten type or waits)"""
+    return _calculate_shanten_number(tuple(sorted(normalize_red_fives(starting_hand))))
+
+# Chinitsu table
+# Hands in a single suit are the slowest to calculate, since they have the most
+#   overlapping ways to break them down. But there are only about 132k single-suit hands
+#   of 1/4/7/10/13 tiles per suit, so the results for all of them ship with the package
+#   (see chinitsu_table.py), and `_calculate_shanten` and `get_tenpai_waits` just look them up.
+# The table has to match what this file calculates, so if the shanten code changes,
+#   run `build_chinitsu_table` (this takes a while) and then `test_chinitsu_table` in tests/test_shanten.py.
+
+def get_single_suit_hands(suit: int, lengths: Iterable[int] = (1, 4, 7, 10, 13)) -> Iterator[Tuple[int, ...]]:
+    """Yield every sorted hand with the given lengths using only tiles of `suit` (1-3)"""
+    def rec(tile: int, length: int) -> Iterator[Tuple[int, ...]]:
+        if length == 0:
+            yield ()
+        elif tile <= 9:
+            for count in range(min(4, length), -1, -1):
+                for rest in rec(tile + 1, length - count):
+                    yield (*[10*suit + tile] * count, *rest)
+    for length in lengths:
+        yield from rec(1, length)
+
+def build_chinitsu_table(path: str = CHINITSU_TABLE_PATH) -> int:
+    """
+    Calculate every single-suit hand from scratch and save the results to `path`.
+    There's no work budget, so every iishanten type is exact.
+    Returns the number of hands calculated. (This takes a few minutes per suit.)
+    """
+    old_results, old_limit = get_precomputed_results(), work_budget.limit
+    try:
+        set_precomputed_results(NO_PRECOMPUTED_RESULTS)
+        set_shanten_budget(0)
+        records = [encode_chinitsu_record(_calculate_shanten(hand), get_completing_tiles(hand))
+                   for suit in (1, 2, 3) for hand in get_single_suit_hands(suit)]
+    finally:
+        set_precomputed_results(old_results)
+        set_shanten_budget(old_limit)
+    save_chinitsu_table(path, records)
+    return len(records)
+
+def benchmark_chinitsu_tenpais(suit: int = 1) -> Tuple[int, float, float]:
+    """
+    Time calculate_shanten and get_tenpai_waits on every 13-tile tenpai hand in `suit`,
+    with cold caches, with and without the chinitsu table, checking that both give the same results.
+    Returns (number of hands, time without the table, time with the table).
+    """
+    import time
+    hands = [hand for hand in get_single_suit_hands(suit, (13,)) if get_standard_shanten(hand)[0] == 0]
+    def run() -> Tuple[List[Tuple[Shanten, Set[int]]], float]:
+        _calculate_shanten.cache_clear()
+        now = time.perf_counter()
+        results = [(_calculate_shanten(hand), get_tenpai_waits(hand)) for hand in hands]
+        return results, time.perf_counter() - now
+    table = chinitsu_table
+    assert table is not None, "the chinitsu table isn't loaded"
+    try:
+        set_chinitsu_table(None)
+        expected, time_without_table = run()
+    finally:
+        set_chinitsu_table(table)
+    actual, time_with_table = run()
+    assert actual == expected, "the chinitsu table doesn't match calculate_shanten (try building it again)"
+    return len(hands), time_without_table, time_with_table
+
+# Evaluating 14-tile hands
+# To see what each discard does to a 2/5/8/11/14-tile hand, we take the per-suit
+#   decompositions of the whole hand once, and for each distinct tile in the hand
+#   redo only the decomposition of that tile's suit (see `update_shanten_state`).
+#   The full `calculate_shanten` (for the iishanten type or waits) only runs for
+#   discards that leave us tenpai or iishanten.
+
+def _get_discards(starting_hand: Iterable[int]) -> Iterator[Tuple[int, Tuple[int, ...], ShantenState]]:
+    """Yield (discard, resulting hand, resulting ShantenState) for each distinct tile in the hand"""
+    hand = tuple(sorted(normalize_red_fives(starting_hand)))
+    assert len(hand) in {2, 5, 8, 11, 14}, f"tried to get discards for a {len(hand)} tile hand: {ph(hand)}"
+    state = get_shanten_state(hand)
+    for i, tile in enumerate(hand):
+        if i > 0 and hand[i-1] == tile:
+            continue
+        yield tile, (*hand[:i], *hand[i+1:]), update_shanten_state(state, tile, -1)
+
+def calculate_discard_shanten(starting_hand: Iterable[int]) -> Dict[int, Shanten]:
+    """
+    For a 2/5/8/11/14-tile hand, return {discard: shanten and waits after discarding it}
+    for each distinct tile in the hand (red fives are normalized).
+    """
+    return {tile: calculate_shanten_incremental(hand, state) for tile, hand, state in _get_discards(starting_hand)}
+
+def calculate_discard_shanten_numbers(starting_hand: Iterable[int]) -> Dict[int, int]:
+    """Same as `calculate_discard_shanten`, but only returns the integer shanten of each discard"""
+    ret: Dict[int, int] = {}
+    for tile, hand, state in _get_discards(starting_hand):
+        # same as _calculate_shanten_number, including the special case for quads
+        if shanten_engine != "table" or any(4 in counts for counts in state[0]):
+            ret[tile] = _calculate_shanten_number(hand)
+            continue
+        shanten, _, _ = combine_suit_decompositions(len(hand), state[1])
+        if len(hand) == 13:
+            ctr = Counter(hand)
+            shanten = min(shanten,
+                          int(calculate_chiitoitsu_shanten(hand, ctr)[0]),
+                          int(calculate_kokushi_shanten(hand, ctr)[0]))
+        ret[tile] = shanten
+    return ret
+
+def is_complete_standard_hand(num_tiles: int, decompositions: Tuple[SuitDecomposition, ...]) -> bool:
+    """Check if the 2/5/8/11/14-tile hand with these suit decompositions is a complete standard hand"""
+    # every suit's decomposition already has the most groups we can remove from it,
+    # so it's a standard hand if that's every group, and the two tiles left are a pair
+    if sum(d[0] for d in decompositions) == num_tiles // 3:
+        leftovers = [d[1] for d in decompositions if d[1] != {()}]
+        return len(leftovers) == 1 and any(len(shape) == 2 and shape[0] == shape[1] for shape in leftovers[0])
+    return False
+
+def is_complete_hand(starting_hand: Iterable[int]) -> bool:
+    """Check if a 2/5/8/11/14-tile hand is complete (standard, chiitoitsu, or kokushi), without looking at interpretations"""
+    hand = tuple(sorted(normalize_red_fives(starting_hand)))
+    assert len(hand) in {2, 5, 8, 11, 14}, f"is_complete_hand() was passed a {len(hand)} tile hand: {ph(hand)}"
+    counts, decompositions = get_shanten_state(hand)
+    if is_complete_standard_hand(len(hand), decompositions):
+        return True
+    if len(hand) == 14:
+        nonzero_counts = [count for suit in counts for count in suit if count > 0]
+        if nonzero_counts == [2] * 7:
+            return True
+        if set(hand) == YAOCHUUHAI:
+            return True
+    return False
+
+def get_completing_tiles(starting_hand: Tuple[int, ...]) -> Set[int]:
+    """
+    Get every tile that completes the given normalized 1/4/7/10/13-tile hand as a standard hand,
+    which for a tenpai hand is exactly its waits (including tiles we have all four of)
+    """
+    state = get_shanten_state(starting_hand)
+    return {tile for tile in TILE_TYPES if is_complete_standard_hand(len(starting_hand) + 1, update_shanten_state(state, tile, 1)[1])}
+
+def calculate_shanten_batch(hands: Iterable[Iterable[int]]) -> List[Shanten]:
+    """
+    Same as [calculate_shanten(hand) for hand in hands], but faster for lots of hands.
+    Requires numpy.
+
+    The hands are encoded as an (N, 34) count matrix, and the standard, chiitoitsu,
+    and kokushi shanten are calculated for every row at once. Only the rows that
+    come out tenpai or iishanten (which need a type and waits) go through calculate_shanten.
+    """
+    import numpy as np
+    # (make a list first, since we go through the hands more than once)
+    hand_list: List[Tuple[int, ...]] = [tuple(sorted(normalize_red_fives(hand))) for hand in hands]
+    if len(hand_list) == 0:
+        return []
+    for hand in hand_list:
+        assert len(hand) in {1, 4, 7, 10, 13}, f"calculate_shanten_batch() was passed a {len(hand)} tile hand: {ph(hand)}"
+
+    # encode every hand as a row of counts, where tile 11 is column 0, 12 is column 1, ... 47 is column 33
+    tiles = np.fromiter((tile for hand in hand_list for tile in hand), dtype=np.int64)
+    rows = np.repeat(np.arange(len(hand_list)), [len(hand) for hand in hand_list])
+    columns = 9 * (tiles // 10 - 1) + tiles % 10 - 1
+    counts = np.bincount(rows * 34 + columns, minlength=34 * len(hand_list)).reshape(len(hand_list), 34)
+    num_tiles = counts.sum(axis=1)
+
+    # look up the decomposition of each distinct suit shape (see get_suit_decomposition),
+    # then gather them back into (groups, floating, floating with pair) per row and suit
+    groups = np.zeros((len(hand_list), 4), dtype=np.int64)
+    floating = np.zeros((len(hand_list), 4), dtype=np.int64)
+    floating_with_pair = np.zeros((len(hand_list), 4), dtype=np.int64)
+    for suit, (start, end) in enumerate(((0, 9), (9, 18), (18, 27), (27, 34))):
+        suit_counts = counts[:, start:end]
+        shape_ids = suit_counts @ (5 ** np.arange(end - start))
+        unique_ids, first_row, inverse = np.unique(shape_ids, return_index=True, return_inverse=True)
+        decompositions = [get_suit_decomposition(tuple(map(int, suit_counts[row])), suit == 3) for row in first_row]
+        groups[:, suit] = np.array([d[0] for d in decompositions])[inverse.ravel()]
+        floating[:, suit] = np.array([d[2] for d in decompositions])[inverse.ravel()]
+        floating_with_pair[:, suit] = np.array([d[3] for d in decompositions])[inverse.ravel()]
+
+    # combine the suits, same as in combine_suit_decompositions
+    groups_needed = (num_tiles - 3 * groups.sum(axis=1) - 1) // 3
+    total_floating = floating.sum(axis=1)
+    def get_shanten(total_floating: Any, pair_exists: bool) -> Any:
+        # (cast the comparisons to ints, since adding two bool arrays is an OR)
+        needs_pair = 0 if pair_exists else (groups_needed > total_floating).astype(np.int64)
+        must_discard_taatsu = ((groups_needed >= 3) & (total_floating <= 1)).astype(np.int64)
+        return needs_pair + must_discard_taatsu + (groups_needed + total_floating - 1) // 2
+    extra_floating = (floating_with_pair - floating).min(axis=1)
+    standard_shanten = np.where(extra_floating < 50,
+                                np.minimum(get_shanten(total_floating, False), get_shanten(total_floating + extra_floating, True)),
+                                get_shanten(total_floating, False))
+
+    # chiitoitsu and kokushi shanten, same as calculate_chiitoitsu_shanten and calculate_kokushi_shanten
+    is_13_tiles = num_tiles == 13
+    tiles_needed = 7 - (counts >= 2).sum(axis=1)
+    useless_tiles = (counts == 3).sum(axis=1) + 2 * (counts == 4).sum(axis=1)
+    chiitoitsu_shanten = np.maximum(useless_tiles, tiles_needed - 1)
+    yaochuuhai_columns = [9 * (tile // 10 - 1) + tile % 10 - 1 for tile in sorted(YAOCHUUHAI)]
+    has_pair = (counts > 1).any(axis=1)
+    kokushi_shanten = np.where(has_pair, 12, 13) - (counts[:, yaochuuhai_columns] > 0).sum(axis=1)
+
+    # tenpai/iishanten by any measure needs the full calculation
+    needs_full = (standard_shanten < 2) | (is_13_tiles & ((chiitoitsu_shanten < 2) | (kokushi_shanten < 2)))
+    ret: List[Shanten] = []
+    for i, hand in enumerate(hand_list):
+        if needs_full[i]:
+            ret.append(calculate_shanten(hand))
+            continue
+        # same comparison as in _calculate_shanten: chiitoitsu/kokushi shanten are ints
+        shanten: float = float(standard_shanten[i])
+        if is_13_tiles[i]:
+            if chiitoitsu_shanten[i] < shanten:
+                shanten = int(chiitoitsu_shanten[i])
+            if kokushi_shanten[i] < shanten:
+                shanten = int(kokushi_shanten[i])
+        ret.append((round(shanten, 4), ()))
+    return ret
+
+def set_shanten_engine(engine: str) -> None:
+    """Switch `_calculate_shanten` between the "table" and "reference" engines"""
+    global shanten_engine
+    assert engine in {"table", "reference"}, f"unknown shanten engine {engine}"
+    shanten_engine = engine
+    _calculate_shanten.cache_clear()
+    _calculate_shanten_number.cache_clear()
+
+def generate_random_hands(num_hands: int, seed: int = 0) -> List[Tuple[int, ...]]:
+    """Generate random 1/4/7/10/13-tile hands for testing, some of them single-suit"""
+    import random
+    rng = random.Random(seed)
+    wall = [tile for tile in (*range(11,20), *range(21,30), *range(31,40), *range(41,48)) for _ in range(4)]
+    chinitsu_walls = [[tile for tile in wall if tile//10 == suit] for suit in (1,2,3)]
+    return [tuple(rng.sample(rng.choice([wall, *chinitsu_walls]), rng.choice([1,4,7,10,13]))) for _ in range(num_hands)]
+
+# some of the slowest iishanten hands for get_shanten_type (mostly chinitsu), with their expected results
+WORST_SHANTEN_TYPE_HANDS: Tuple[Tuple[Tuple[int, ...], Shanten], ...] = (
+    ((21, 21, 22, 23, 23, 23, 25, 26, 26, 27, 27, 27, 28), (1.032, (21, 22, 23, 24, 27))),
+    ((31, 31, 32, 33, 34, 35, 35, 36, 36, 36, 37, 38, 38), (1.032, (31, 33, 34, 35, 36, 37, 38, 39))),
+    ((32, 33, 33, 35, 35, 36, 36, 37, 37, 37, 37, 38, 38), (1.003, (31, 33, 34, 35, 36, 38, 39))),
+    ((11, 11, 12, 12, 12, 13, 14, 14, 15, 16, 17, 18, 18), (1.033, (11, 12, 13, 14, 15, 16, 18, 19))),
+    ((22, 22, 23, 24, 25, 25, 25, 26, 27, 27, 27, 28, 28), (1.033, (21, 22, 24, 25, 26, 27, 28, 29))),
+    ((21, 22, 22, 23, 24, 25, 25, 26, 27, 27, 28, 29, 29), (1.032, (21, 22, 23, 24, 25, 26, 27, 28, 29))),
+    ((32, 32, 33, 34, 34, 34, 35, 36, 36, 36, 37, 37, 38), (1.033, (31, 32, 33, 34, 35, 36, 37, 38, 39))),
+    ((12, 13, 14, 14, 14, 15, 15, 16, 17, 18, 18, 19, 19), (1.013, (11, 12, 13, 14, 15, 16, 17, 18, 19))),
+    ((11, 11, 11, 13, 13, 13, 14, 15, 15, 16, 16, 18, 19), (1.012, (13, 14, 15, 16, 17, 18, 19))),
+    ((21, 21, 22, 22, 23, 24, 25, 25, 26, 27, 27, 27, 28), (1.012, (21, 22, 23, 24, 25, 26, 27, 28, 29))),
+)
+
+def benchmark_shanten_type(repeat: int = 5) -> float:
+    """
+    Time calculate_shanten on WORST_SHANTEN_TYPE_HANDS with cold caches (and no chinitsu table),
+    checking that the iishanten types and waits are unchanged. Returns the best time in seconds
+    """
+    import time
+    caches = (_calculate_shanten, _eliminate_from_suit, extract_unique_groups, _get_headless_taatsus_waits,
+              get_pair_shapes, get_complex_shapes, get_suit_decomposition, try_remove_all_tiles)
+    best = float("inf")
+    old_results = get_precomputed_results()
+    try:
+        set_precomputed_results(NO_PRECOMPUTED_RESULTS)
+        for _ in range(repeat):
+            for cache in caches:
+                cache.cache_clear()
+            now = time.perf_counter()
+            for hand, expected in WORST_SHANTEN_TYPE_HANDS:
+                actual = _calculate_shanten(hand)
+                assert actual == expected, f"got {actual} but expected {expected} for {ph(hand)}"
+            best = min(best, time.perf_counter() - now)
+    finally:
+        set_precomputed_results(old_results)
+    return best
+
+# opt-in profiling, see profiling.py
+if os.getenv("shanten_profile"):
+    from .profiling import enable_profiling
+    enable_profiling(print_at_exit=True)
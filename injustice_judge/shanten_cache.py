@@ -0,0 +1,144 @@
+import atexit
+import hashlib
+import mmap
+import os
+import struct
+from typing import *
+
+from .constants import Shanten
+
+# This file implements an optional on-disk cache for `calculate_shanten`,
+#   so that a restarted process doesn't start with a cold cache.
+#
+# To use it, set the environment variable `shanten_cache` to a file path.
+#   On startup, the file is memory-mapped read-only and looked up with a
+#   binary search. Results calculated during this run are kept in memory,
+#   and get merged into the file when the process exits.
+#
+# File format (all little-endian):
+# - header: magic b"IJSC", format version (u32), code stamp (16 bytes), number of records (u32)
+# - records, sorted by key:
+#   - key: the normalized sorted hand, one byte per tile, padded with zeros to 13 bytes
+#   - shanten: round(shanten * 10000) (u16)
+#   - whether the shanten is an int rather than a float (u8), since chiitoitsu/kokushi shanten are ints
+#   - waits: bitmask where bit (tile - 10) is set for every tile in the waits (u64)
+#
+# The code stamp is a hash of the files that determine the shanten result.
+#   If they change, the stamp changes and the existing file is ignored
+#   (and overwritten on exit).
+
+HEADER = struct.Struct("<4sI16sI")
+RECORD = struct.Struct("<13sHBQ")
+MAGIC = b"IJSC"
+FORMAT_VERSION = 1
+STAMPED_FILES = ("shanten.py", "classes.py", "utils.py", "constants.py")
+
+def get_code_stamp() -> bytes:
+    """Hash the source of every file that affects the result of `calculate_shanten`"""
+    h = hashlib.sha256(FORMAT_VERSION.to_bytes(4, "little"))
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for filename in STAMPED_FILES:
+        with open(os.path.join(directory, filename), "rb") as file:
+            h.update(file.read())
+    return h.digest()[:16]
+
+def encode_key(hand: Tuple[int, ...]) -> bytes:
+    return bytes(hand).ljust(13, b"\0")
+
+def encode_shanten(shanten: Shanten) -> Tuple[int, int, int]:
+    return round(shanten[0] * 10000), isinstance(shanten[0], int), sum(1 << (tile - 10) for tile in shanten[1])
+
+def decode_shanten(shanten: int, is_int: int, waits: int) -> Shanten:
+    return (shanten // 10000 if is_int else round(shanten / 10000, 4)), tuple(i + 10 for i in range(waits.bit_length()) if waits >> i & 1)
+
+class ShantenCache:
+    """Read-only memory-mapped shanten results, plus the results calculated this run"""
+    def __init__(self, path: str):
+        self.path = path
+        self.stamp = get_code_stamp()
+        self.new_entries: Dict[bytes, Tuple[int, int, int]] = {}
+        self.file: Optional[BinaryIO] = None
+        self.data: Optional[mmap.mmap] = None
+        self.num_records = 0
+        self._open()
+
+    def _open(self) -> None:
+        path = self.path
+        if os.path.isfile(path) and os.path.getsize(path) >= HEADER.size:
+            self.file = open(path, "rb")
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, stamp, num_records = HEADER.unpack_from(self.data, 0)
+            if magic == MAGIC and version == FORMAT_VERSION and stamp == self.stamp \
+               and len(self.data) == HEADER.size + num_records * RECORD.size:
+                self.num_records = num_records
+            else:
+                # stale or corrupt cache: ignore it (it gets overwritten on save)
+                self.close()
+
+    def _key_at(self, i: int) -> bytes:
+        assert self.data is not None
+        offset = HEADER.size + i * RECORD.size
+        return self.data[offset:offset+13]
+
+    def _find(self, key: bytes) -> Optional[Tuple[int, int, int]]:
+        """Binary search the memory-mapped records for `key`"""
+        if self.num_records == 0:
+            return None
+        lo, hi = 0, self.num_records
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.num_records and self._key_at(lo) == key:
+            _, shanten, is_int, waits = RECORD.unpack_from(self.data, HEADER.size + lo * RECORD.size) # type: ignore[arg-type]
+            return shanten, is_int, waits
+        return None
+
+    def get(self, hand: Tuple[int, ...]) -> Optional[Shanten]:
+        """Look up a normalized sorted hand, returning None if it's not cached"""
+        key = encode_key(hand)
+        entry = self.new_entries.get(key) or self._find(key)
+        return None if entry is None else decode_shanten(*entry)
+
+    def add(self, hand: Tuple[int, ...], shanten: Shanten) -> None:
+        """Record a newly calculated result, to be written out by `save`"""
+        self.new_entries[encode_key(hand)] = encode_shanten(shanten)
+
+    def save(self) -> None:
+        """Merge the new entries into the cache file"""
+        if len(self.new_entries) == 0:
+            return
+        records: Dict[bytes, Tuple[int, int, int]] = {}
+        if self.data is not None:
+            for i in range(self.num_records):
+                key, *entry = RECORD.unpack_from(self.data, HEADER.size + i * RECORD.size)
+                records[key] = tuple(entry) # type: ignore[assignment]
+        records.update(self.new_entries)
+        keys = sorted(records.keys())
+        # write to a temporary file first, so that other processes reading the cache
+        # never see a partially written file
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, self.stamp, len(keys)))
+            file.write(b"".join(RECORD.pack(key, *records[key]) for key in keys))
+        self.close()
+        os.replace(tmp_path, self.path)
+        self.new_entries = {}
+        self._open()
+
+    def close(self) -> None:
+        if self.data is not None:
+            self.data.close()
+        if self.file is not None:
+            self.file.close()
+        self.data = None
+        self.file = None
+        self.num_records = 0
+
+def open_shanten_cache(path: str) -> ShantenCache:
+    """Open the cache at `path` and save new entries to it when the process exits"""
+    cache = ShantenCache(path)
+    atexit.register(cache.save)
+    return cache
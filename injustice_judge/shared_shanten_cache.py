@@ -0,0 +1,156 @@
+from multiprocessing import shared_memory
+import struct
+import zlib
+from typing import *
+
+from .constants import Shanten
+from .shanten_cache import MAGIC, encode_shanten, decode_shanten, get_code_stamp
+from .utils import pack_hand
+
+# This file implements an optional shanten cache shared between processes,
+#   so that workers in a process pool don't each calculate the same common hands.
+#
+# The cache is a fixed-size open-addressing hash table in a
+#   `multiprocessing.shared_memory` block. The parent process creates it with
+#   `create_shared_shanten_cache` and gives its name to the workers, which attach
+#   to it with `SharedShantenCache(name)` (or the environment variable
+#   `shanten_shared_cache`, see shanten.py). Nothing is ever evicted: once a probe
+#   sequence is full, new results for those hands just aren't shared.
+#
+# There's no lock. Every slot carries a checksum of its contents, and a slot
+#   whose checksum doesn't match (because another process is writing to it, or two
+#   processes wrote to it at once) is treated as free by writers and skipped by readers.
+#   At worst a result is lost and calculated again; a wrong result is never returned.
+#
+# Memory layout (all little-endian):
+# - header: magic b"IJSC", format version (u32), code stamp (16 bytes), number of slots (u32)
+# - slots:
+#   - key: the packed hand (see `pack_hand`), 16 bytes, all zero if the slot is empty
+#   - shanten, whether it's an int, waits: same as in the persistent cache (see shanten_cache.py)
+#   - crc32 of all of the above (u32)
+
+HEADER = struct.Struct("<4sI16sI")
+SLOT = struct.Struct("<16sHBQI")
+FORMAT_VERSION = 2 # the persistent cache is version 1
+MAX_PROBES = 16
+EMPTY_KEY = bytes(16)
+
+class SharedShantenCache:
+    """Shanten results in shared memory, readable and writable by every process that attaches to it"""
+    def __init__(self, name: str, create: bool = False, num_slots: int = 0):
+        self.stamp = get_code_stamp()
+        if create:
+            self.memory = shared_memory.SharedMemory(name=name or None, create=True, size=HEADER.size + num_slots * SLOT.size)
+            self.buf[:HEADER.size] = HEADER.pack(MAGIC, FORMAT_VERSION, self.stamp, num_slots)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            # unless we're a child process (which shares its parent's resource tracker), our
+            # resource tracker would unlink the block when we exit, even though the process
+            # that created it may still be using it
+            import multiprocessing
+            if multiprocessing.parent_process() is None:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(self.memory._name, "shared_memory") # type: ignore[attr-defined]
+        self.name = self.memory.name
+        self.is_owner = create
+        magic, version, stamp, self.num_slots = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or stamp != self.stamp:
+            self.memory.close()
+            raise ValueError(f"shared memory block {name} is not a shanten cache for this version of the code")
+
+    @property
+    def buf(self) -> memoryview:
+        """The shared memory block's contents"""
+        assert self.memory.buf is not None, "the shared shanten cache was closed"
+        return self.memory.buf
+
+    def _slots(self, key: bytes) -> Iterator[int]:
+        """Offsets of the slots to probe for `key`"""
+        # packed hands have lots of zero bits in the same places, so don't just take them mod num_slots
+        start = zlib.crc32(key) % self.num_slots
+        for i in range(min(MAX_PROBES, self.num_slots)):
+            yield HEADER.size + ((start + i) % self.num_slots) * SLOT.size
+
+    def get(self, hand: Tuple[int, ...]) -> Optional[Shanten]:
+        """Look up a normalized sorted hand, returning None if it's not cached"""
+        key = pack_hand(hand).to_bytes(16, "little")
+        buf = self.buf
+        for offset in self._slots(key):
+            record = bytes(buf[offset:offset+SLOT.size])
+            slot_key, shanten, is_int, waits, crc = SLOT.unpack(record)
+            if slot_key == EMPTY_KEY:
+                return None
+            if slot_key == key and zlib.crc32(record[:-4]) == crc:
+                return decode_shanten(shanten, is_int, waits)
+        return None
+
+    def add(self, hand: Tuple[int, ...], shanten: Shanten) -> None:
+        """Share a newly calculated result (unless its probe sequence is full)"""
+        key = pack_hand(hand).to_bytes(16, "little")
+        buf = self.buf
+        for offset in self._slots(key):
+            slot_key, *_, crc = SLOT.unpack_from(buf, offset)
+            is_valid = zlib.crc32(bytes(buf[offset:offset+SLOT.size-4])) == crc
+            if is_valid and slot_key == key:
+                return
+            if slot_key == EMPTY_KEY or not is_valid:
+                record = SLOT.pack(key, *encode_shanten(shanten), 0)
+                buf[offset:offset+SLOT.size] = record[:-4] + zlib.crc32(record[:-4]).to_bytes(4, "little")
+                return
+
+    def close(self) -> None:
+        """Detach from the shared memory, freeing it if this process created it"""
+        self.memory.close()
+        if self.is_owner:
+            self.memory.unlink()
+
+def attach_shared_shanten_cache(name: str) -> Optional[SharedShantenCache]:
+    """Attach to the shared cache `name`, or return None (with a warning) if it's gone or stale"""
+    try:
+        return SharedShantenCache(name)
+    except (OSError, ValueError) as e:
+        import warnings
+        warnings.warn(f"not using the shared shanten cache: {e}")
+        return None
+
+def create_shared_shanten_cache(num_slots: int = 1 << 18, name: str = "") -> SharedShantenCache:
+    """Create a new shared cache (about 31 bytes per slot). Pass its `.name` to the processes that should use it"""
+    return SharedShantenCache(name, create=True, num_slots=num_slots)
+
+def benchmark_shared_cache(paths: Sequence[str], worker_counts: Sequence[int] = (1, 4, 8), num_slots: int = 1 << 18) -> Dict[Tuple[int, bool], float]:
+    """
+    Analyze the cached tenhou games at `paths` (e.g. cached_games/game-*.json) with a pool
+    of each size in `worker_counts`, with and without a shared cache, printing the times.
+    Returns {(workers, shared): seconds}
+    """
+    import multiprocessing, time
+    results: Dict[Tuple[int, bool], float] = {}
+    for num_workers in worker_counts:
+        for shared in (False, True):
+            cache = create_shared_shanten_cache(num_slots) if shared else None
+            try:
+                now = time.perf_counter()
+                with multiprocessing.get_context("spawn").Pool(num_workers, _init_benchmark_worker, (cache and cache.name,)) as pool:
+                    pool.map(_analyze_cached_game, paths, chunksize=1)
+                results[num_workers, shared] = time.perf_counter() - now
+            finally:
+                if cache is not None:
+                    cache.close()
+            print(f"{num_workers} worker(s), {'shared' if shared else 'separate'} cache: {results[num_workers, shared]:.2f}s")
+    return results
+
+def _init_benchmark_worker(name: Optional[str]) -> None:
+    from . import shanten
+    if name is not None:
+        shanten.set_shared_shanten_cache(SharedShantenCache(name))
+
+def _analyze_cached_game(path: str) -> None:
+    import json
+    from .fetch.tenhou import parse_tenhou
+    from .injustices import evaluate_game
+    with open(path, "r") as file:
+        game_data = json.load(file)
+    log = game_data.pop("log")
+    kyokus, metadata, _ = parse_tenhou(log, game_data, None)
+    for kyoku in kyokus:
+        evaluate_game(kyoku, set(range(metadata.num_players)), metadata.name, {"injustice", "skill"})
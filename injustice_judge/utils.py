@@ -1,20 +1,29 @@
 import functools
 import itertools
-from .constants import MANZU, PINZU, SOUZU, JIHAI, PRED, SUCC, DORA, DORA_INDICATOR, TOGGLE_RED_FIVE, TRANSLATE, OYA_TSUMO_SCORE, KO_TSUMO_SCORE, OYA_RON_SCORE, KO_RON_SCORE
+from .constants import MANZU, PINZU, SOUZU, JIHAI, PRED, PRED2, SUCC, SUCC2, DORA, DORA_INDICATOR, IS_RED_FIVE, NORMALIZE_RED_FIVE, TILE_INDEX, TILE_TYPES, TOGGLE_RED_FIVE, TRANSLATE, OYA_TSUMO_SCORE, KO_TSUMO_SCORE, OYA_RON_SCORE, KO_RON_SCORE
 from typing import *
 
 # This file contains a bunch of utility functions that don't really belong anywhere else.
 
-normalize_red_five = lambda tile: TOGGLE_RED_FIVE[tile] if tile in {51,52,53} else tile
-normalize_red_fives = lambda hand: map(normalize_red_five, hand)
+normalize_red_five: Callable[[int], int] = NORMALIZE_RED_FIVE.__getitem__
+normalize_red_fives = lambda hand: map(NORMALIZE_RED_FIVE.__getitem__, hand)
 sorted_hand = lambda hand: tuple(sorted(hand, key=normalize_red_five))
 is_mangan = lambda han, fu: han == 5 or (han >= 4 and fu >= 40) or (han >= 3 and fu >= 70)
 
-@functools.cache
-def try_remove_all_tiles(hand: Tuple[int, ...], tiles: Tuple[int, ...]) -> Tuple[int, ...]:
+def to_tile_index(tile: int) -> Tuple[int, bool]:
+    """Get the dense index (0-33) of a tile, plus whether it's a red five (see TILE_INDEX)"""
+    return TILE_INDEX[tile], IS_RED_FIVE[tile]
+
+def from_tile_index(index: int, is_red: bool = False) -> int:
+    """Inverse of `to_tile_index`"""
+    tile = TILE_TYPES[index]
+    return TOGGLE_RED_FIVE[tile] if is_red else tile
+
+def remove_all_tiles(hand: Tuple[int, ...], tiles: Tuple[int, ...]) -> Tuple[int, ...]:
     """
     Tries to remove all of `tiles` from `hand`. If it can't, returns `hand` unchanged
-    On profiling a long game, the cache missed 430578/2219864 calls (19.397%)
+    This is O(len(tiles) * len(hand)), which for hands is cheaper than hashing them
+    for a cache lookup, so hot loops should call this directly.
     """
     orig_hand = hand
     for tile in tiles:
@@ -25,6 +34,98 @@ def try_remove_all_tiles(hand: Tuple[int, ...], tiles: Tuple[int, ...]) -> Tuple
             return orig_hand
     return hand
 
+@functools.lru_cache(maxsize=8192)
+def try_remove_all_tiles(hand: Tuple[int, ...], tiles: Tuple[int, ...]) -> Tuple[int, ...]:
+    """Cached version of `remove_all_tiles`, with a bounded cache so long-running processes don't grow forever"""
+    return remove_all_tiles(hand, tiles)
+
+# Packed hands
+# A normalized hand is determined by how many of each of the 34 tile types it has,
+#   so it can be packed into a single int with 3 bits per tile type (102 bits).
+#   These are much smaller than tuples and take constant time to hash,
+#   so caches of normalized hands use them as keys (see `packed_hand_cache`).
+_PACKED_TILE = tuple(1 << 3*i if i >= 0 else 0 for i in TILE_INDEX)
+
+def pack_hand(hand: Iterable[int]) -> int:
+    """Pack a hand into an int, ignoring red fives and the order of the tiles"""
+    return sum(map(_PACKED_TILE.__getitem__, hand))
+
+def unpack_hand(packed: int) -> Tuple[int, ...]:
+    """Inverse of `pack_hand`, returning a normalized sorted hand"""
+    hand: List[int] = []
+    for tile in TILE_TYPES:
+        if packed == 0:
+            break
+        hand.extend((tile,) * (packed & 7))
+        packed >>= 3
+    return tuple(hand)
+
+T_co = TypeVar("T_co", covariant=True)
+class PackedHandCache(Protocol[T_co]):
+    """A function decorated with `packed_hand_cache`"""
+    def __call__(self, hand: Tuple[int, ...]) -> T_co: ...
+    def cache_info(self) -> "functools._CacheInfo": ...
+    def cache_clear(self) -> None: ...
+
+def packed_hand_cache(maxsize: int) -> Callable[[Callable[[Tuple[int, ...]], T_co]], PackedHandCache[T_co]]:
+    """
+    Like `functools.lru_cache(maxsize)`, but for functions taking a single normalized sorted hand,
+    which get keyed by `pack_hand(hand)` instead of by the tuple. Supports cache_info and cache_clear.
+    """
+    def decorator(f: Callable[[Tuple[int, ...]], T_co]) -> PackedHandCache[T_co]:
+        cached = functools.lru_cache(maxsize=maxsize)(lambda packed: f(unpack_hand(packed)))
+        @functools.wraps(f)
+        def wrapper(hand: Tuple[int, ...]) -> T_co:
+            return cached(pack_hand(hand))
+        wrapper.cache_info = cached.cache_info # type: ignore[attr-defined]
+        wrapper.cache_clear = cached.cache_clear # type: ignore[attr-defined]
+        return cast(PackedHandCache[T_co], wrapper)
+    return decorator
+
+# Tile masks
+# A set of tile types (like the waits of a hand) can also be represented as a 34-bit int,
+#   with bit i set if TILE_TYPES[i] is in the set. Red fives count as their normal five.
+#   This makes checks like "is any wait in the pond" a single `&`.
+TILE_MASK = tuple(1 << i if i >= 0 else 0 for i in TILE_INDEX)
+
+def to_tile_mask(tiles: Iterable[int]) -> int:
+    """Get the mask of all tile types in `tiles`"""
+    mask = 0
+    for tile in tiles:
+        mask |= TILE_MASK[tile]
+    return mask
+
+def from_tile_mask(mask: int) -> Tuple[int, ...]:
+    """Inverse of `to_tile_mask`, returning the sorted tile types in the mask"""
+    return tuple(tile for i, tile in enumerate(TILE_TYPES) if mask >> i & 1)
+
+def in_tile_mask(tile: int, mask: int) -> bool:
+    return TILE_MASK[tile] & mask != 0
+
+def count_in_tile_mask(tiles: Iterable[int], mask: int) -> int:
+    """Count how many of `tiles` are of a tile type in the mask"""
+    return sum(1 for tile in tiles if TILE_MASK[tile] & mask)
+
+# Tile counts
+# `Kyoku` and `KyokuState` keep a count of every visible tile type, updated on every
+#   discard, call and dora flip, so that `Hand.ukeire` and `is_safe` can look up how many
+#   copies of a tile are visible instead of counting them in a list of every visible tile.
+class TileCounts:
+    """Number of tiles of each tile type (red fives count as their normal five), indexed by TILE_INDEX"""
+    __slots__ = ("counts",)
+    def __init__(self, tiles: Iterable[int] = ()):
+        self.counts = [0] * len(TILE_TYPES)
+        for tile in tiles:
+            self.counts[TILE_INDEX[tile]] += 1
+    def add(self, tile: int, amount: int = 1) -> None:
+        self.counts[TILE_INDEX[tile]] += amount
+    def remove(self, tile: int) -> None:
+        assert self.counts[TILE_INDEX[tile]] > 0, f"tried to remove {tile} from tile counts that don't have it"
+        self.counts[TILE_INDEX[tile]] -= 1
+    def count(self, tile: int) -> int:
+        """Same as list.count, if this were a list of tiles with red fives normalized"""
+        return self.counts[TILE_INDEX[tile]]
+
 def get_score(han: int, fu: int, is_dealer: bool, is_tsumo: bool, num_players: int) -> int:
     """
     Calculate the score given han and fu.
@@ -54,34 +155,93 @@ def get_taatsu_wait(taatsu: Tuple[int, ...]) -> Set[int]:
     to cast from Tuple[int, ...] to Tuple[int, int] every time you use this function.
     """
     t1, t2 = normalize_red_fives(taatsu)
-    return {PRED[t1], SUCC[t2]} - {0} if SUCC[t1] == t2 else {SUCC[t1]} if SUCC[SUCC[t1]] == t2 else set()
+    return {PRED[t1], SUCC[t2]} - {0} if SUCC[t1] == t2 else {SUCC[t1]} if SUCC2[t1] == t2 else set()
+
+# Table of waits and taatsus for every single-suit shape, used by `get_waits_taatsus`.
+# A shape is a tuple of counts for ranks 1-9 (or 1-7 for honors, which only form pairs).
+# Each entry is (pairs, completions) where:
+# - pairs is the set of ranks that form a pair at any point while removing taatsus from the shape
+# - completions[k] is None if taatsus can't be removed until k tiles remain,
+#   otherwise the union of (wait ranks, taatsu rank pairs) over all ways to do so
+# Shapes of up to TAATSU_TABLE_PRECOMPUTE_TILES tiles are filled in on import, and larger shapes
+# the first time they're seen (there's finitely many, so the table never needs evicting).
+SuitTaatsuEntry = Tuple[FrozenSet[int], Tuple[Optional[Tuple[FrozenSet[int], FrozenSet[Tuple[int, int]]]], ...]]
+TAATSU_TABLE: Dict[Tuple[bool, Tuple[int, ...]], SuitTaatsuEntry] = {}
+TAATSU_TABLE_PRECOMPUTE_TILES = 5
+
+def _get_suit_taatsu_entry(is_honors: bool, counts: Tuple[int, ...]) -> SuitTaatsuEntry:
+    key = (is_honors, counts)
+    if key in TAATSU_TABLE:
+        return TAATSU_TABLE[key]
+    total = sum(counts)
+    pairs = {rank for rank, count in enumerate(counts, start=1) if count >= 2}
+    completions: List[Optional[Tuple[FrozenSet[int], FrozenSet[Tuple[int, int]]]]] = [None, None]
+    if total <= 1:
+        completions[total] = (frozenset(), frozenset())
+    else:
+        # try to remove every pair, ryanmen, and kanchan
+        for i, count in enumerate(counts):
+            removals: List[Tuple[Tuple[int, ...], Optional[Tuple[int, int]]]] = []
+            if count >= 2: # pairs don't count as taatsus
+                removals.append(((i, i), None))
+            if not is_honors:
+                for j in (i+1, i+2):
+                    if count >= 1 and j < len(counts) and counts[j] >= 1:
+                        removals.append(((i, j), (i+1, j+1)))
+            for removed, taatsu in removals:
+                remaining = list(counts)
+                for ix in removed:
+                    remaining[ix] -= 1
+                sub_pairs, sub_completions = _get_suit_taatsu_entry(is_honors, tuple(remaining))
+                pairs |= sub_pairs
+                for k, completion in enumerate(sub_completions):
+                    if completion is None:
+                        continue
+                    waits, taatsus = completion
+                    if taatsu is not None:
+                        t1, t2 = taatsu
+                        waits = waits | ({t1-1, t2+1} - {0, 10} if t2 == t1+1 else {t1+1})
+                        taatsus = taatsus | {taatsu}
+                    if completions[k] is not None:
+                        waits = waits | completions[k][0] # type: ignore[index]
+                        taatsus = taatsus | completions[k][1] # type: ignore[index]
+                    completions[k] = (waits, taatsus)
+    entry = (frozenset(pairs), tuple(completions))
+    TAATSU_TABLE[key] = entry
+    return entry
+
+def _fill_taatsu_table(max_tiles: int) -> None:
+    for is_honors, num_ranks in ((False, 9), (True, 7)):
+        for num_tiles in range(max_tiles+1):
+            for ranks in itertools.combinations_with_replacement(range(num_ranks), num_tiles):
+                counts = tuple(ranks.count(rank) for rank in range(num_ranks))
+                if max(counts, default=0) <= 4:
+                    _get_suit_taatsu_entry(is_honors, counts)
+_fill_taatsu_table(TAATSU_TABLE_PRECOMPUTE_TILES)
 
-@functools.lru_cache(maxsize=2048)
 def get_waits_taatsus(hand: Tuple[int, ...]) -> Tuple[Set[int], Set[Tuple[int, int]]]:
-    """Get all waits and taatsus in a hand full of taatsus and no floating tiles, excluding pair waits"""
-    hand = sorted_hand(hand)
-
-    # parse out all the taatsus
-    waits = set()
-    all_taatsus = set()
-    to_update: Set[Tuple[Tuple[int, ...], Tuple[Tuple[int, int], ...]]] = {(hand, ())}
-    while len(to_update) > 0:
-        hand, taatsus = to_update.pop()
-        if len(hand) <= 1: # done
-            all_taatsus |= set(taatsus)
-            waits |= set().union(*map(get_taatsu_wait, taatsus))
+    """
+    Get all waits and taatsus in a hand full of taatsus and no floating tiles, excluding pair waits.
+    Looks up each suit in TAATSU_TABLE, then combines the ways each suit can be split
+    into taatsus such that at most one tile is left over in the whole hand.
+    """
+    suit_counts: Dict[int, List[int]] = {}
+    for tile in normalize_red_fives(hand):
+        suit_counts.setdefault(tile // 10, [0]*(7 if tile >= 40 else 9))[tile % 10 - 1] += 1
+    suits = [(10*suit, _get_suit_taatsu_entry(suit == 4, tuple(counts))) for suit, counts in suit_counts.items()]
+
+    waits: Set[int] = set()
+    all_taatsus: Set[Tuple[int, int]] = set()
+    for offset, (pairs, _) in suits:
+        all_taatsus |= {(offset+rank, offset+rank) for rank in pairs}
+    # either every suit leaves no tiles, or exactly one suit leaves one tile
+    for leftover_suit in (None, *range(len(suits))):
+        completions = [suit_completions[int(i == leftover_suit)] for i, (_, (_, suit_completions)) in enumerate(suits)]
+        if None in completions:
             continue
-        # try to find pairs, ryanmens, and kanchans, using every tile in the hand
-        for i, tile in enumerate(hand):
-            if tile in (*hand[:i], *hand[i+1:]): # pair, ignore
-                all_taatsus.add((tile, tile))
-                to_update.add((try_remove_all_tiles(hand, (tile, tile)), taatsus))
-            if SUCC[tile] in hand:
-                taatsu = (tile, SUCC[tile])
-                to_update.add((try_remove_all_tiles(hand, taatsu), (*taatsus, taatsu)))
-            if SUCC[SUCC[tile]] in hand:
-                taatsu = (tile, SUCC[SUCC[tile]])
-                to_update.add((try_remove_all_tiles(hand, taatsu), (*taatsus, taatsu)))
+        for (offset, _), (suit_waits, suit_taatsus) in zip(suits, completions): # type: ignore[misc]
+            waits |= {offset+rank for rank in suit_waits}
+            all_taatsus |= {(offset+t1, offset+t2) for t1, t2 in suit_taatsus}
     return waits, all_taatsus
 
 def get_waits(hand: Tuple[int, ...]) -> Set[int]:
@@ -106,8 +266,11 @@ def to_dora_indicator(dora: int, num_players: int) -> int:
 
 SUJI_VALUES = {1: (4,), 2: (5,), 3: (6,), 4: (1,7), 5: (2,8), 6: (3,9), 7: (4,), 8: (5,), 9: (6,)}
 SUJI = {k+n: tuple(x+n for x in v) for k, v in SUJI_VALUES.items() for n in {10,20,30}}
-def is_safe(tile: int, opponent_genbutsu: Set[int], visible_tiles: List[int]) -> bool:
-    """Returns true if the tile is any of genbutsu/suji/one-chance."""
+def is_safe(tile: int, opponent_genbutsu: Set[int], visible_tiles: Union[List[int], TileCounts]) -> bool:
+    """
+    Returns true if the tile is any of genbutsu/suji/one-chance.
+    `visible_tiles` is either a list of the visible tiles or their `TileCounts`.
+    """
     # genbutsu
     if tile in opponent_genbutsu:
         return True
@@ -118,7 +281,7 @@ def is_safe(tile: int, opponent_genbutsu: Set[int], visible_tiles: List[int]) ->
         # one-chance
         # check all possible taatsu waiting on this tile
         # if every taatsu is one-chance or no-chance then consider it safe
-        possible_taatsus = ((PRED[PRED[tile]], PRED[tile]), (PRED[tile], SUCC[tile]), (SUCC[tile], SUCC[SUCC[tile]]))
+        possible_taatsus = ((PRED2[tile], PRED[tile]), (PRED[tile], SUCC[tile]), (SUCC[tile], SUCC2[tile]))
         if all(any(visible_tiles.count(tile) >= 3 for tile in taatsu) for taatsu in possible_taatsus if 0 not in taatsu):
             return True
     else:
@@ -1,5 +1,6 @@
+import functools
 from typing import *
-from .classes import CallInfo, GameRules, Interpretation
+from .classes import CallInfo, GameRules, Interpretation, generate_all_interpretations
 from .classes2 import Kyoku, Hand, Score
 from .constants import Event, Shanten, YakuForWait, DOUBLE_YAKUMAN, LIMIT_HANDS, YAOCHUUHAI
 from .display import ph, pt, round_name, shanten_name
@@ -10,7 +11,8 @@ from pprint import pprint
 # It's used in `fetch.py` and `flags.py` to calculate some information that will be
 #   included in their event list and flags list respectively.
 # 
-# Every single yaku is handled by get_yaku, but the logic is split up:
+# Every single yaku is handled by get_yaku_all (which gets the ron and tsumo
+# scores separately in one go, and which get_yaku wraps), but the logic is split up:
 # 
 # - get_stateless_yaku checks for all yaku which only require a look at hand
 #   composition (tanyao, honroutou, toitoi, honitsu, chinitsu, pinfu, iitsu,
@@ -427,6 +429,9 @@ is_suukantsu = lambda hand: list(map(lambda call: "kan" in call.type, hand.calls
 
 # note: evaluating {suukantsu, tenhou, chiihou, kazoe} requires information outside of the hand
 
+# note: these get cached on the hand's tiles and calls only (see `get_yakuman_tenpais`), so they
+#   must only look at those and what's derived from them (e.g. closed_part), not at e.g.
+#   ordered_calls, kita_count, or shanten
 CHECK_YAKUMAN = {"daisangen": is_daisangen,
                  "kokushi musou": is_kokushi,
                  "suuankou": is_suuankou,
@@ -437,7 +442,17 @@ CHECK_YAKUMAN = {"daisangen": is_daisangen,
                  "chinroutou": is_chinroutou,
                  "chuurenpoutou": is_chuuren,
                  "suukantsu": is_suukantsu}
-get_yakuman_tenpais = lambda hand: {name for name, func in CHECK_YAKUMAN.items() if func(hand)}
+def get_yakuman_tenpais(hand: Hand) -> FrozenSet[str]:
+    """Get the names of all the yakuman the given tenpai hand is tenpai for"""
+    # this gets called for every interpretation of every hand passed to get_yaku, so cache it
+    # (on tiles and calls rather than the hand itself: comparing hands compares their prev_shanten,
+    #  and the cache shouldn't keep interned hands alive)
+    return _get_yakuman_tenpais(hand.tiles, hand.calls)
+@functools.lru_cache(maxsize=2048)
+def _get_yakuman_tenpais(tiles: Tuple[int, ...], calls: Tuple[CallInfo, ...]) -> FrozenSet[str]:
+    # this hand is missing everything but tiles and calls, which is all CHECK_YAKUMAN looks at
+    hand = Hand(tiles, calls)
+    return frozenset(name for name, func in CHECK_YAKUMAN.items() if func(hand))
 def get_yakuman_waits(hand: Hand, name: str) -> Set[int]:
     """
     Get all the waits that lead to a given yakuman hand.
@@ -525,7 +540,7 @@ def add_yakuman(yaku_for_wait: YakuForWait,
     waits = set(hand.shanten[1])
     is_dealer = seat == round % 4
 
-    yakumans = get_yakuman_tenpais(hand)
+    yakumans = set(get_yakuman_tenpais(hand))
 
     # tenhou, chiihou: tsumo, and we never discarded + no calls happened
     # renhou: same, but not tsumo
@@ -604,6 +619,38 @@ def add_yakuman(yaku_for_wait: YakuForWait,
 ### entry points
 ###
 
+def get_yakuhai(round: int, seat: int, num_players: int, rules: GameRules) -> Tuple[int, ...]:
+    """Get the yakuhai tiles for the given seat, with a tile appearing twice if it's worth double fu as a pair"""
+    yakuhai: Tuple[int, ...] = (45,46,47,(round//4)+41,((seat-(round%4))%num_players)+41)
+    if rules.double_round_wind:
+        yakuhai = (*yakuhai, ((round//4)+2)+41)
+    if not rules.double_wind_4_fu:
+        yakuhai = tuple(set(yakuhai)) # remove duplicates
+    return yakuhai
+
+def get_shanpon_fu(interpretation: Interpretation, waits: Iterable[int]) -> Dict[int, int]:
+    """Get the ron fu for completing the shanpon wait of this interpretation (times 2 for tsumo), for each wait"""
+    # if `interpretations.hand` is a pair, it's a shanpon wait
+    # if it's a terminal pair then it's +4 fu for ron and +8 for tsumo
+    # otherwise it's +2 fu for ron and +4 for tsumo
+    is_pair = lambda hand: len(hand) == 2 and normalize_red_five(hand[0]) == normalize_red_five(hand[1])
+    shanpon_fu = {wait: 0 for wait in waits}
+    if is_pair(interpretation.hand):
+        assert interpretation.pair is not None, "somehow got a shanpon tenpai hand without a pair"
+        for tile in normalize_red_fives((interpretation.hand[0], interpretation.pair[0])):
+            shanpon_fu[tile] = 4 if tile in YAOCHUUHAI else 2
+    return shanpon_fu
+
+round_fu = lambda fu: (((fu-1)//10)+1)*10
+
+def add_best_score(best_score: Dict[int, Score], wait: int, new_score: Score) -> None:
+    """Record `new_score` for `wait` if it's better than the current best_score[wait]"""
+    assert (new_score.han, new_score.fu) != (0, 0), f"somehow got a zero score: {new_score})"
+    if wait not in best_score:
+        best_score[wait] = new_score
+    else:
+        best_score[wait] = max(best_score[wait], new_score)
+
 def get_yaku(hand: Hand,
              events: List[Event],
              doras: List[int],
@@ -615,83 +662,72 @@ def get_yaku(hand: Hand,
              rules: GameRules,
              check_rons: bool = True,
              check_tsumos: bool = True) -> Dict[int, Score]:
+    """
+    Get the best Score for every wait, out of the ron Scores (if `check_rons`)
+    and the tsumo Scores (if `check_tsumos`). See `get_yaku_all` to get both separately.
+    """
+    ron_scores, tsumo_scores = get_yaku_all(hand, events, doras, uras, round, seat, is_last_tile, num_players, rules, check_rons, check_tsumos)
+    best_score: Dict[int, Score] = ron_scores
+    for wait, score in tsumo_scores.items():
+        add_best_score(best_score, wait, score)
+    return best_score
+
+def get_yaku_all(hand: Hand,
+                 events: List[Event],
+                 doras: List[int],
+                 uras: List[int],
+                 round: int,
+                 seat: int,
+                 is_last_tile: bool,
+                 num_players: int,
+                 rules: GameRules,
+                 check_rons: bool = True,
+                 check_tsumos: bool = True) -> Tuple[Dict[int, Score], Dict[int, Score]]:
+    """
+    Get the best ron Score and the best tsumo Score for every wait as (ron_scores, tsumo_scores),
+    in one pass over the interpretations of the hand.
+    If `check_rons` or `check_tsumos` is False, that half is skipped and returned empty.
+    """
     if hand.shanten[0] != 0:
-        return {}
+        return {}, {}
 
     waits = set(hand.shanten[1])
     assert len(waits) > 0, f"hand {hand!s} is tenpai, but has no waits?"
 
-    # best_score[wait] = the Score value representing the best interpretation for that wait
-    best_score: Dict[int, Score] = {}
-    def add_best_score(wait: int, new_score: Score) -> None:
-        nonlocal best_score
-        assert (new_score.han, new_score.fu) != (0, 0), f"somehow got a zero score: {new_score})"
-        if wait not in best_score:
-            best_score[wait] = new_score
-        else:
-            best_score[wait] = max(best_score[wait], new_score)
-
-    # we want to get the best yaku for each wait
-    # each hand interpretation gives han and fu for some number of waits
-    # get the best han and fu for each wait across all interpretations
-    yakuhai: Tuple[int, ...] = (45,46,47,(round//4)+41,((seat-(round%4))%num_players)+41)
-    if rules.double_round_wind:
-        yakuhai = (*yakuhai, ((round//4)+2)+41)
-    if not rules.double_wind_4_fu:
-        yakuhai = tuple(set(yakuhai)) # remove duplicates
+    ron_scores: Dict[int, Score] = {}
+    tsumo_scores: Dict[int, Score] = {}
+    yakuhai = get_yakuhai(round, seat, num_players, rules)
     is_closed_hand = len(hand.closed_part) == 13
+    is_dealer = seat == round%4
 
-    def process_interpretation(interpretation: Interpretation):
-        # print("========")
-        # for k, v in best_score.items():
-        #     print(f"{pt(k)}, {v.hand!s}, {v.yaku}")
+    for interpretation in generate_all_interpretations(hand.hidden_part, tuple(hand.calls), yakuhai, is_closed_hand):
         yaku_for_wait: YakuForWait = get_stateless_yaku(interpretation, hand.shanten, is_closed_hand)
-        # pprint(yaku_for_wait)
         yaku_for_wait = add_stateful_yaku(yaku_for_wait, hand, events, doras, uras, round, seat, yakuhai, is_last_tile)
-        # print(round_name(round, 0), yaku_for_wait)
-        # pprint([(a, b) for a, b, *_ in events])
+        tsumo_yaku: YakuForWait = {}
+        ron_yaku: YakuForWait = {}
         if check_tsumos:
-            tsumo_yaku = add_tsumo_yaku(yaku_for_wait.copy(), interpretation, is_closed_hand)
-            tsumo_yaku = add_yakuman(yaku_for_wait, hand, events, round, seat, is_tsumo=True, use_renhou=rules.renhou)
-            # pprint(tsumo_yaku)
-        yaku_for_wait = add_yakuman(yaku_for_wait, hand, events, round, seat, is_tsumo=False, use_renhou=rules.renhou)
-
-        # if `interpretations.hand` is a pair, it's a shanpon wait
-        # if it's a terminal pair then it's +4 fu for ron and +8 for tsumo
-        # otherwise it's +2 fu for ron and +4 for tsumo
-        is_pair = lambda hand: len(hand) == 2 and normalize_red_five(hand[0]) == normalize_red_five(hand[1])
-        shanpon_fu = {wait: 0 for wait in yaku_for_wait.keys()} # times 2 for tsumo
-        if is_pair(interpretation.hand):
-            assert interpretation.pair is not None, "somehow got a shanpon tenpai hand without a pair"
-            for tile in normalize_red_fives((interpretation.hand[0], interpretation.pair[0])):
-                shanpon_fu[tile] = 4 if tile in YAOCHUUHAI else 2
+            # add_tsumo_yaku modifies the yaku lists, so give it copies
+            tsumo_yaku = add_tsumo_yaku({wait: yaku.copy() for wait, yaku in yaku_for_wait.items()}, interpretation, is_closed_hand)
+            tsumo_yaku = add_yakuman(tsumo_yaku, hand, events, round, seat, is_tsumo=True, use_renhou=rules.renhou)
+        if check_rons:
+            ron_yaku = add_yakuman(yaku_for_wait, hand, events, round, seat, is_tsumo=False, use_renhou=rules.renhou)
+        # add_yakuman can add waits, so the two might not have the same waits
+        shanpon_fu = get_shanpon_fu(interpretation, {*ron_yaku.keys(), *tsumo_yaku.keys()})
 
         # now total up the fu for each wait
-        round_fu = lambda fu: (((fu-1)//10)+1)*10
-        for wait in yaku_for_wait.keys():
-            fixed_fu = 25 if ("chiitoitsu", 2) in yaku_for_wait[wait] else None
-            if check_rons:
-                han = sum(b for _, b in yaku_for_wait[wait])
-                ron_fu = interpretation.ron_fu + shanpon_fu[wait]
-                fixed_fu = fixed_fu or (30 if ron_fu == 20 else None) # open pinfu ron = 30
-                add_best_score(wait, Score(yaku_for_wait[wait], han, fixed_fu or round_fu(ron_fu), seat == round%4, False, num_players, rules, interpretation, hand))
-            if check_tsumos:
-                han = sum(b for _, b in tsumo_yaku[wait])
-                if is_closed_hand:
-                    tsumo_fu = interpretation.tsumo_fu + 2*shanpon_fu[wait]
-                    fixed_fu = fixed_fu or (20 if ("pinfu", 1) in tsumo_yaku[wait] else None) # closed pinfu tsumo = 20
-                    add_best_score(wait, Score(tsumo_yaku[wait], han, fixed_fu or round_fu(tsumo_fu), seat == round%4, True, num_players, rules, interpretation, hand))
-                else:
-                    tsumo_fu = interpretation.tsumo_fu + 2*shanpon_fu[wait]
-                    add_best_score(wait, Score(tsumo_yaku[wait], han, fixed_fu or round_fu(tsumo_fu), seat == round%4, True, num_players, rules, interpretation, hand))
-        # for k, v in best_score.items():
-        #     print(f"{pt(k)}, {v!s}")
-        # print("========")
-
-    for interpretation in Interpretation(hand.hidden_part, calls=tuple(hand.calls)) \
-            .generate_all_interpretations(yakuhai=yakuhai, is_closed_hand=is_closed_hand):
-        process_interpretation(interpretation)
-    return best_score
+        for wait in ron_yaku.keys():
+            han = sum(b for _, b in ron_yaku[wait])
+            ron_fu = interpretation.ron_fu + shanpon_fu[wait]
+            fixed_fu = 25 if ("chiitoitsu", 2) in ron_yaku[wait] else (30 if ron_fu == 20 else None) # open pinfu ron = 30
+            add_best_score(ron_scores, wait, Score(ron_yaku[wait], han, fixed_fu or round_fu(ron_fu), is_dealer, False, num_players, rules, interpretation, hand))
+        for wait in tsumo_yaku.keys():
+            han = sum(b for _, b in tsumo_yaku[wait])
+            tsumo_fu = interpretation.tsumo_fu + 2*shanpon_fu[wait]
+            fixed_fu = 25 if ("chiitoitsu", 2) in tsumo_yaku[wait] else None
+            if is_closed_hand:
+                fixed_fu = fixed_fu or (20 if ("pinfu", 1) in tsumo_yaku[wait] else None) # closed pinfu tsumo = 20
+            add_best_score(tsumo_scores, wait, Score(tsumo_yaku[wait], han, fixed_fu or round_fu(tsumo_fu), is_dealer, True, num_players, rules, interpretation, hand))
+    return ron_scores, tsumo_scores
 
 def get_final_yaku(kyoku: Kyoku,
                    seat: int,
@@ -26,8 +26,13 @@ def main():
     # print("\n".join(asyncio.run(analyze_game(link, players, look_for={"skill"}))))
     # print("\n".join(asyncio.run(analyze_game(link, players))))
 
-    # from injustice_judge.shanten import pair_shapes, complex_shapes
-    # print(len(pair_shapes), len(complex_shapes))
+    # from injustice_judge.shanten import get_pair_shapes, get_complex_shapes
+    # print(get_pair_shapes.cache_info(), get_complex_shapes.cache_info())
+
+    # # differential tests (see injustice_judge/differential.py), run offline
+    # from injustice_judge.differential import check_shanten, check_yaku
+    # check_shanten(num_random_hands=1000000)
+    # check_yaku()
 
     # from injustice_judge.yaku import test_get_yakuman_tenpais
     # test_get_yakuman_tenpais()
@@ -109,11 +114,17 @@ def main():
     # assert calculate_shanten((13,16,18,19,27,28,31,35,38,42,44,45,46))[0] == 6   # 3689m78p158s2456z  6-shanten
     # assert calculate_shanten((12,15,51,23,25,33,39,41,42,44,45,45,46))[0] == 4   # 150m25p39s124556z  4-shanten for chiitoitsu
 
+    # from injustice_judge.shanten import benchmark_shanten_type
+    # print(f"worst iishanten hands: {benchmark_shanten_type():.3f}s")
+    # from injustice_judge.shanten import benchmark_chinitsu_tenpais # set `chinitsu_table` to compare with the table
+    # print("%d chinitsu tenpai hands: %.3fs without table, %.3fs with table" % benchmark_chinitsu_tenpais())
+    # from injustice_judge.classes2 import benchmark_hand
+    # benchmark_hand()
+
     # from injustice_judge.shanten import _calculate_shanten
     # print(_calculate_shanten.cache_info())
-    # from injustice_judge.shanten import timers
-    # from pprint import pprint
-    # pprint(timers)
+    # from injustice_judge.profiling import get_profile_report # needs `shanten_profile` set, or enable_profiling()
+    # print(get_profile_report())
 
     # unused:
     # this is perfect headless, but we don't rly count it as such
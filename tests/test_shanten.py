@@ -0,0 +1,118 @@
+import random
+from typing import *
+
+import pytest
+
+from injustice_judge import shanten
+from injustice_judge.display import ph, pt
+from injustice_judge.shanten import DEFAULT_SHANTEN_BUDGET, NO_PRECOMPUTED_RESULTS, _calculate_shanten, calculate_discard_shanten, calculate_discard_shanten_numbers, calculate_shanten, calculate_shanten_batch, calculate_shanten_number, generate_random_hands, get_completing_tiles, get_precomputed_results, get_single_suit_hands, is_approximate_shanten, is_complete_hand, set_chinitsu_table, set_precomputed_results, set_shanten_budget, set_shanten_engine
+from injustice_judge.utils import normalize_red_fives, sorted_hand
+
+NUM_HANDS = 2000
+
+def test_shanten_engines() -> None:
+    """
+    Check that the table engine agrees with the reference engine on random 1/4/7/10/13-tile hands,
+    and that calculate_shanten_number agrees with calculate_shanten
+    """
+    hands = generate_random_hands(NUM_HANDS)
+    old_engine, old_results = shanten.shanten_engine, get_precomputed_results()
+    try:
+        set_precomputed_results(NO_PRECOMPUTED_RESULTS)
+        set_shanten_engine("reference")
+        expected = list(map(calculate_shanten, hands))
+        set_shanten_engine("table")
+        for hand, result in zip(hands, expected):
+            actual = calculate_shanten(hand)
+            assert actual == result, f"table engine gave {actual} but reference engine gave {result} for {ph(sorted_hand(hand))}"
+            assert calculate_shanten_number(hand) == int(result[0]), f"calculate_shanten_number gave {calculate_shanten_number(hand)} for {ph(sorted_hand(hand))}, expected {int(result[0])}"
+    finally:
+        set_shanten_engine(old_engine)
+        set_precomputed_results(old_results)
+
+def test_calculate_shanten_batch() -> None:
+    """Check that calculate_shanten_batch agrees with calculate_shanten on random hands"""
+    pytest.importorskip("numpy")
+    hands = generate_random_hands(NUM_HANDS)
+    old_results = get_precomputed_results()
+    try:
+        set_precomputed_results(NO_PRECOMPUTED_RESULTS)
+        for hand, result in zip(hands, calculate_shanten_batch(hands)):
+            expected = calculate_shanten(hand)
+            assert (result, type(result[0])) == (expected, type(expected[0])), f"calculate_shanten_batch gave {result} but calculate_shanten gave {expected} for {ph(sorted_hand(hand))}"
+    finally:
+        set_precomputed_results(old_results)
+
+def test_discard_shanten() -> None:
+    """
+    Check calculate_discard_shanten(_numbers) against calculate_shanten for every discard,
+    and is_complete_hand against the waits of tenpai hands
+    """
+    for hand in generate_random_hands(NUM_HANDS):
+        hand = tuple(sorted(normalize_red_fives(hand)))
+        result = calculate_shanten(hand)
+        # add a wait (or any tile) to get a 2/5/8/11/14-tile hand
+        for tile in (result[1] if result[0] == 0 else (*result[1][:1], 46)):
+            if hand.count(tile) == 4:
+                continue
+            full_hand = (*hand, tile)
+            assert is_complete_hand(full_hand) == (result[0] == 0), f"is_complete_hand gave {is_complete_hand(full_hand)} for {ph(sorted_hand(full_hand))}"
+            discard_shanten = calculate_discard_shanten(full_hand)
+            discard_shanten_numbers = calculate_discard_shanten_numbers(full_hand)
+            for i, discard in enumerate(full_hand):
+                expected = calculate_shanten((*full_hand[:i], *full_hand[i+1:]))
+                assert discard_shanten[discard] == expected, f"discarding {pt(discard)} from {ph(sorted_hand(full_hand))} gave {discard_shanten[discard]}, expected {expected}"
+                assert discard_shanten_numbers[discard] == int(expected[0]), f"discarding {pt(discard)} from {ph(sorted_hand(full_hand))} gave {discard_shanten_numbers[discard]}, expected {int(expected[0])}"
+
+def test_shanten_budget() -> None:
+    """
+    Check that no random hand goes over the default budget, and that with a tiny budget
+    the hands going over are flagged as approximate but keep their shanten number
+    """
+    hands = generate_random_hands(NUM_HANDS)
+    old_limit = shanten.work_budget.limit
+    try:
+        set_shanten_budget(DEFAULT_SHANTEN_BUDGET)
+        expected = list(map(calculate_shanten, hands))
+        assert len(shanten.approximate_hands) == 0, f"{len(shanten.approximate_hands)} hands went over the default budget, e.g. {ph(next(iter(shanten.approximate_hands)))}"
+        set_shanten_budget(1)
+        for hand, result in zip(hands, expected):
+            actual = calculate_shanten(hand)
+            assert int(actual[0]) == int(result[0]), f"over budget hand {ph(sorted_hand(hand))} has shanten {actual[0]}, expected {result[0]}"
+            if is_approximate_shanten(hand):
+                assert 1 <= result[0] < 2, f"{ph(sorted_hand(hand))} is not iishanten but went over budget"
+        assert len(shanten.approximate_hands) > 0, "no hands went over a budget of 1"
+        # which hands go over shouldn't depend on what's cached: go through the hands
+        # again in reverse, with the per-suit caches warm from the first time
+        set_shanten_budget(20)
+        forward = list(map(calculate_shanten, hands))
+        assert len(shanten.approximate_hands) > 0, "no hands went over a budget of 20"
+        set_shanten_budget(20)
+        backward = list(map(calculate_shanten, reversed(hands)))[::-1]
+        for hand, result1, result2 in zip(hands, forward, backward):
+            assert result1 == result2, f"{ph(sorted_hand(hand))} gave {result1} and then {result2} with a budget of 20"
+    finally:
+        set_shanten_budget(old_limit)
+
+def test_chinitsu_table() -> None:
+    """
+    Check the chinitsu table against calculating random single-suit hands from scratch
+    (with no work budget, like `build_chinitsu_table`)
+    """
+    rng = random.Random(0)
+    hands = rng.sample([hand for suit in (1, 2, 3) for hand in get_single_suit_hands(suit)], NUM_HANDS)
+    table = shanten.chinitsu_table
+    if table is None:
+        pytest.skip("the chinitsu table isn't loaded")
+    old_limit = shanten.work_budget.limit
+    try:
+        set_chinitsu_table(None)
+        set_shanten_budget(0)
+        for hand in hands:
+            expected = _calculate_shanten(hand)
+            actual = table.get(hand)
+            assert (actual, type(actual[0])) == (expected, type(expected[0])), f"the chinitsu table has {actual} for {ph(hand)}, expected {expected}"
+            assert table.get_completing_tiles(hand) == get_completing_tiles(hand), f"the chinitsu table has waits {ph(table.get_completing_tiles(hand))} for {ph(hand)}, expected {ph(get_completing_tiles(hand))}"
+    finally:
+        set_chinitsu_table(table)
+        set_shanten_budget(old_limit)
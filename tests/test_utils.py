@@ -0,0 +1,44 @@
+import random
+from typing import *
+
+from injustice_judge.constants import SUCC, SUCC2
+from injustice_judge.display import ph
+from injustice_judge.shanten import generate_random_hands
+from injustice_judge.utils import get_taatsu_wait, get_waits_taatsus, normalize_red_fives, pack_hand, remove_all_tiles, unpack_hand
+
+NUM_HANDS = 2000
+
+def test_packed_hands() -> None:
+    """Check that pack_hand/unpack_hand round-trip, and that packing ignores tile order and red fives"""
+    for hand in generate_random_hands(NUM_HANDS):
+        normalized = tuple(sorted(normalize_red_fives(hand)))
+        assert unpack_hand(pack_hand(hand)) == normalized, f"{ph(normalized)} unpacked to {ph(unpack_hand(pack_hand(hand)))}"
+        red_hand = tuple({15: 51, 25: 52, 35: 53}.get(tile, tile) for tile in reversed(hand))
+        assert pack_hand(red_hand) == pack_hand(hand), f"{ph(red_hand)} and {ph(hand)} packed differently"
+
+def test_waits_taatsus() -> None:
+    """Check get_waits_taatsus (which uses TAATSU_TABLE) against a search over every way to remove taatsus"""
+    def search(hand: Tuple[int, ...]) -> Tuple[Set[int], Set[Tuple[int, int]]]:
+        waits: Set[int] = set()
+        all_taatsus: Set[Tuple[int, int]] = set()
+        to_update: Set[Tuple[Tuple[int, ...], Tuple[Tuple[int, int], ...]]] = {(hand, ())}
+        while len(to_update) > 0:
+            hand, taatsus = to_update.pop()
+            if len(hand) <= 1:
+                all_taatsus |= set(taatsus)
+                waits |= set().union(*map(get_taatsu_wait, taatsus))
+                continue
+            for i, tile in enumerate(hand):
+                if tile in (*hand[:i], *hand[i+1:]):
+                    all_taatsus.add((tile, tile))
+                    to_update.add((remove_all_tiles(hand, (tile, tile)), taatsus))
+                for taatsu in ((tile, SUCC[tile]), (tile, SUCC2[tile])):
+                    if taatsu[1] in hand:
+                        to_update.add((remove_all_tiles(hand, taatsu), (*taatsus, taatsu))) # type: ignore[arg-type]
+        return waits, all_taatsus
+    rng = random.Random(0)
+    tiles = (*range(11,20), *range(21,30), *range(31,40), *range(41,48))
+    for _ in range(NUM_HANDS):
+        pool = rng.choice((tiles, tiles[:9], tiles[9:18] + tiles[27:]))
+        hand = tuple(sorted(rng.choice(pool) for _ in range(rng.randint(2, 8))))
+        assert get_waits_taatsus(hand) == search(hand), f"got {get_waits_taatsus(hand)} for {ph(hand)}, expected {search(hand)}"